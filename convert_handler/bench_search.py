@@ -0,0 +1,128 @@
+"""关键词检索基准：ILIKE 全表扫描 vs pg_trgm / 中文分词索引。
+
+在本地 PostgreSQL 中建一张与 questions 检索列结构相同的 bench_questions 表，
+灌入合成题目数据（默认 100 万行），然后对若干关键词分别用 EXPLAIN ANALYZE 比较：
+  - ilike：     旧写法，三列 OR ILIKE '%kw%'
+  - trgm：      search_text ILIKE '%kw%'（GIN gin_trgm_ops）
+  - tsv：       search_tsv @@ question_search_query(kw)（GIN；应用中只用于 1~2 字关键词）
+
+需要先执行 migrate.py（用到 pg_trgm 与 question_search_tsv / question_search_query 函数）。
+
+用法: python convert_handler/bench_search.py [行数] [--keep]
+      --keep  保留 bench_questions 表，下次运行跳过灌数据
+"""
+import io
+import random
+import sys
+import time
+
+import db
+
+BATCH_SIZE = 50_000
+VOCAB = [
+    "函数", "导数", "三角形", "概率", "数列", "不等式", "向量", "方程", "集合", "圆",
+    "抛物线", "椭圆", "双曲线", "直线", "平面", "几何体", "统计", "复数", "对数", "指数",
+    "已知", "求", "证明", "的", "值", "范围", "最大值", "最小值", "如图", "所示",
+    "设", "若", "则", "且", "满足", "条件", "面积", "体积", "周长", "角度",
+]
+LATEX_SNIPPETS = [r"$f(x)=x^2+1$", r"$\sin\theta$", r"$a_n=2n-1$", r"$\frac{1}{2}$", r"$\sqrt{3}$", r"$x_1+x_2$"]
+KEYWORDS = ["函数", "圆", "最大值", "抛物线", "sin", r"x_1", "不存在的词"]
+
+
+def synth_text(rng, n_words):
+    words = rng.choices(VOCAB, k=n_words)
+    for _ in range(rng.randint(0, 3)):
+        words.insert(rng.randrange(len(words) + 1), rng.choice(LATEX_SNIPPETS))
+    return "".join(words)
+
+
+def seed(conn, n_rows):
+    with conn.cursor() as cur:
+        cur.execute("DROP TABLE IF EXISTS bench_questions")
+        cur.execute("""
+            CREATE TABLE bench_questions (
+                id serial PRIMARY KEY,
+                title text,
+                content_md text,
+                content_latex text,
+                search_text text GENERATED ALWAYS AS (
+                    coalesce(title, '') || ' ' || coalesce(content_md, '') || ' ' || coalesce(content_latex, '')
+                ) STORED,
+                search_tsv tsvector GENERATED ALWAYS AS (
+                    question_search_tsv(coalesce(title, '') || ' ' || coalesce(content_md, '') || ' ' || coalesce(content_latex, ''))
+                ) STORED
+            )
+        """)
+    conn.commit()
+
+    rng = random.Random(42)
+    t0 = time.perf_counter()
+    for start in range(0, n_rows, BATCH_SIZE):
+        buf = io.StringIO()
+        for _ in range(min(BATCH_SIZE, n_rows - start)):
+            title = synth_text(rng, 4)
+            md = synth_text(rng, rng.randint(20, 80))
+            latex = synth_text(rng, rng.randint(10, 40))
+            buf.write(f"{title}\t{md}\t{latex}\n".replace("\\", "\\\\"))
+        buf.seek(0)
+        with conn.cursor() as cur:
+            cur.copy_expert("COPY bench_questions (title, content_md, content_latex) FROM STDIN", buf)
+        conn.commit()
+        print(f"  已写入 {min(start + BATCH_SIZE, n_rows)}/{n_rows} 行")
+    print(f"灌数据耗时 {time.perf_counter() - t0:.1f}s，开始建索引...")
+
+    t0 = time.perf_counter()
+    with conn.cursor() as cur:
+        cur.execute("CREATE INDEX ON bench_questions USING gin (search_text gin_trgm_ops)")
+        cur.execute("CREATE INDEX ON bench_questions USING gin (search_tsv)")
+        cur.execute("ANALYZE bench_questions")
+    conn.commit()
+    print(f"建索引耗时 {time.perf_counter() - t0:.1f}s")
+
+
+def explain_ms(cur, sql, params):
+    cur.execute("EXPLAIN (ANALYZE, FORMAT JSON) " + sql, params)
+    plan = cur.fetchone()[0][0]
+    return plan["Execution Time"], plan["Plan"].get("Actual Rows", 0)
+
+
+def run(conn):
+    queries = {
+        "ilike": ("SELECT id FROM bench_questions WHERE title ILIKE %(kw)s OR content_md ILIKE %(kw)s "
+                  "OR content_latex ILIKE %(kw)s ORDER BY id DESC LIMIT 20", lambda k: {"kw": f"%{k}%"}),
+        "trgm": ("SELECT id FROM bench_questions WHERE search_text ILIKE %(kw)s ESCAPE '\\' ORDER BY id DESC LIMIT 20",
+                 lambda k: {"kw": "%" + k.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"}),
+        "tsv": ("SELECT id FROM bench_questions WHERE search_tsv @@ question_search_query(%(kw)s) "
+                "ORDER BY id DESC LIMIT 20", lambda k: {"kw": k}),
+    }
+    print(f"\n{'关键词':<10}" + "".join(f"{name:>14}" for name in queries))
+    with conn.cursor() as cur:
+        cur.execute("SET max_parallel_workers_per_gather = 0")  # 单进程对比，结果更稳定
+        for kw in KEYWORDS:
+            cells = []
+            for sql, make_params in queries.values():
+                ms, _ = explain_ms(cur, sql, make_params(kw))
+                cells.append(f"{ms:>12.1f}ms")
+            print(f"{kw:<10}" + "".join(cells))
+
+
+if __name__ == "__main__":
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    n_rows = int(args[0]) if args else 1_000_000
+    keep = "--keep" in sys.argv[1:]
+
+    conn = db.connect()
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT to_regclass('bench_questions') IS NOT NULL")
+            exists = cur.fetchone()[0]
+        if not (keep and exists):
+            print(f"生成 {n_rows} 行合成题目...")
+            seed(conn, n_rows)
+        run(conn)
+        if not keep:
+            with conn.cursor() as cur:
+                cur.execute("DROP TABLE bench_questions")
+            conn.commit()
+    finally:
+        conn.close()
@@ -0,0 +1,100 @@
+"""知识体系建树基准：旧的按名称嵌套 defaultdict + 列表查重 vs taxonomy.build_taxonomy。
+
+在内存中合成一份知识体系（默认约 10 万行），分别生成两种查询的结果行：
+  - legacy：旧目录树的 5 表 LEFT JOIN 结果（教材 × 章节 × 小节 × 知识点）
+             交给按名称嵌套 defaultdict、用 `not in list` 查重的旧建树算法；
+  - by_id： TAXONOMY_SQL 的 UNION ALL 结果（每个节点一行），交给 build_taxonomy。
+合成数据中有不同版本的同名教材（章节名也相同），可以看到旧算法把它们合并成了一个节点。
+
+不需要数据库，只衡量建树本身的耗时。
+
+用法: python convert_handler/bench_taxonomy.py [行数] [每小节知识点数]
+"""
+import random
+import sys
+import time
+from collections import defaultdict
+
+from taxonomy import build_taxonomy
+
+CHAPTERS_PER_TEXTBOOK = 10
+SECTIONS_PER_CHAPTER = 8
+KP_POOL_SIZE = 5000
+REPEAT = 3
+
+
+def synth_taxonomy(n_rows, kps_per_section, seed=42):
+    """返回 (legacy 行, UNION ALL 行)。"""
+    rng = random.Random(seed)
+    per_textbook = CHAPTERS_PER_TEXTBOOK * SECTIONS_PER_CHAPTER * kps_per_section
+    n_textbooks = max(1, n_rows // per_textbook)
+    kp_names = [f"知识点{i:05d}" for i in range(KP_POOL_SIZE)]
+
+    legacy_rows, node_rows = [], []
+    chapter_id = section_id = 0
+    for tb_id in range(1, n_textbooks + 1):
+        tb_name = f"数学 必修第{(tb_id - 1) % 5 + 1}册"  # 不同版本的同名教材
+        node_rows.append(("textbook", tb_id, None, tb_name, tb_id % 5 + 1, tb_id % 3 + 1))
+        for c in range(1, CHAPTERS_PER_TEXTBOOK + 1):
+            chapter_id += 1
+            ch_name = f"第{c}章"  # 各教材章节同名
+            node_rows.append(("chapter", chapter_id, tb_id, ch_name, None, None))
+            for s in range(1, SECTIONS_PER_CHAPTER + 1):
+                section_id += 1
+                sec_name = f"{c}.{s} 小节"
+                node_rows.append(("section", section_id, chapter_id, sec_name, None, None))
+                for kp_id in rng.sample(range(KP_POOL_SIZE), kps_per_section):
+                    legacy_rows.append((tb_id, tb_name, chapter_id, ch_name, section_id, sec_name, kp_names[kp_id]))
+                    node_rows.append(("knowledge_point", kp_id + 1, section_id, kp_names[kp_id], None, None))
+    # 与两种查询的 ORDER BY 一致
+    legacy_rows.sort(key=lambda r: (r[1], r[3], r[5], r[6]))
+    node_rows.sort(key=lambda r: (r[0], r[2] or 0, r[3]))
+    return legacy_rows, node_rows
+
+
+def legacy_build(rows):
+    """旧 get_full_knowledge_tree 的建树逻辑（按名称嵌套、列表查重）。"""
+    tree = defaultdict(lambda: defaultdict(lambda: defaultdict(list)))
+    for tb_id, tb_name, ch_id, ch_name, sec_id, sec_name, kp_name in rows:
+        if tb_id and ch_id and sec_id and kp_name:
+            if kp_name not in tree[tb_name][ch_name][sec_name]:
+                tree[tb_name][ch_name][sec_name].append(kp_name)
+        elif tb_id and ch_id and sec_id:
+            tree[tb_name][ch_name][sec_name] = tree[tb_name][ch_name].get(sec_name, [])
+        elif tb_id and ch_id:
+            tree[tb_name][ch_name] = tree[tb_name].get(ch_name, {})
+        elif tb_id:
+            tree[tb_name] = tree.get(tb_name, {})
+    return tree
+
+
+def best_of(fn, rows):
+    best = None
+    for _ in range(REPEAT):
+        t0 = time.perf_counter()
+        result = fn(rows)
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    n_rows = int(args[0]) if args else 100_000
+    kps_per_section = int(args[1]) if len(args) > 1 else 50
+
+    legacy_rows, node_rows = synth_taxonomy(n_rows, kps_per_section)
+    print(f"合成数据: legacy {len(legacy_rows)} 行, UNION ALL {len(node_rows)} 行, 每小节 {kps_per_section} 个知识点")
+
+    legacy_s, legacy_tree = best_of(legacy_build, legacy_rows)
+    by_id_s, tree = best_of(build_taxonomy, node_rows)
+
+    legacy_chapters = sum(len(chapters) for chapters in legacy_tree.values())
+    legacy_sections = sum(len(sections) for chapters in legacy_tree.values() for sections in chapters.values())
+    chapters = sum(len(tree.chapters_of(tb_id)) for _, tb_id in tree.textbooks)
+    sections = len(tree.names["section"])
+
+    print(f"\n{'':<8}{'耗时':>10}{'教材':>8}{'章节':>8}{'小节':>8}")
+    print(f"{'legacy':<8}{legacy_s * 1000:>8.1f}ms{len(legacy_tree):>8}{legacy_chapters:>8}{legacy_sections:>8}")
+    print(f"{'by_id':<8}{by_id_s * 1000:>8.1f}ms{len(tree.textbooks):>8}{chapters:>8}{sections:>8}")
+    print(f"\n加速 {legacy_s / by_id_s:.1f}x")
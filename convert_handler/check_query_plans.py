@@ -0,0 +1,139 @@
+"""题库查询执行计划回归检查。
+
+对题库浏览常用的过滤组合执行 EXPLAIN (FORMAT JSON)，检查计划中用到了
+migrations/ 中为该组合创建的索引，没有对 questions 做顺序扫描，并且
+ORDER BY id DESC LIMIT 直接由索引顺序完成：检查 B-tree 索引的用例时关闭
+enable_sort / enable_bitmapscan，规划器仍然排序说明没有索引能提供 id 顺序。
+
+执行计划取决于数据分布，开发库的数据量和分布都不可靠，因此检查不直接在
+questions 上做：在同一个事务里建同结构的临时表（临时表优先于 public 被解析），
+照搬 public 上的全部索引定义，写入分布固定的合成数据并 ANALYZE，检查完回滚。
+检查的是“当前库里的索引能否支撑这些查询”，迁移未执行时相应项会失败。
+
+用法: python convert_handler/check_query_plans.py      # 有失败时退出码为 1
+"""
+import json
+import sys
+from contextlib import closing
+
+import db
+
+LIST_TAIL = " ORDER BY id DESC LIMIT 20"
+
+# 合成数据的行数和分布：每个过滤条件单独命中的比例都不大，
+# 沿主键倒序扫描再过滤明显比走对应索引贵
+SEED_ROWS = 50000
+SEED_QUESTIONS_SQL = """
+    INSERT INTO questions (id, title, content_md, course_id, grade_id, chapter_id,
+                           question_type, difficulty, quality)
+    SELECT g, '题目 ' || g,
+           CASE WHEN g %% 500 = 0 THEN '求函数的最大值' ELSE '计算下列各式' END,
+           1 + g %% 200,                                       -- 课程：每门 0.5%%
+           1 + (g / 7) %% 3,
+           1 + (g / 3) %% 200,                                 -- 章节：每章 0.5%%
+           (CASE WHEN (g / 200) %% 200 = 0 THEN 'single_choice' -- 单选：0.5%%，与课程无关
+                 ELSE (ARRAY['multiple_choice', 'fill_blank', 'short_answer'])[1 + g %% 3]
+            END)::question_type_enum,
+           1 + g %% 5,
+           CASE WHEN (g / 11) %% 10 = 0 THEN 4 ELSE 2 END       -- 高质量：10%%
+    FROM generate_series(1, %(rows)s) AS g
+"""
+SEED_KNOWLEDGE_POINTS_SQL = """
+    INSERT INTO question_knowledge_points (question_id, point_id)
+    SELECT g, 1 + g %% 500 FROM generate_series(1, %(rows)s) AS g
+    UNION ALL
+    SELECT g, 501 + g %% 500 FROM generate_series(1, %(rows)s) AS g
+"""
+
+# GIN 索引只能走位图扫描，结果不保序，这两类关键词查询之后必然要排序
+UNORDERED_INDEXES = {"idx_questions_search_text_trgm", "idx_questions_search_tsv"}
+
+# (说明, SQL, 参数, 期望用到的索引；None 表示只要求不出现顺序扫描)
+PLAN_CASES = [
+    ("keyset 翻页", "SELECT id FROM questions WHERE id < %(cursor)s" + LIST_TAIL,
+     {"cursor": 1000}, None),
+    ("课程", "SELECT id FROM questions WHERE course_id = %(course)s" + LIST_TAIL,
+     {"course": 1}, {"idx_questions_course"}),
+    ("课程+年级+章节", "SELECT id FROM questions WHERE course_id = %(course)s AND grade_id = %(grade)s "
+     "AND chapter_id = %(chapter)s" + LIST_TAIL,
+     {"course": 1, "grade": 1, "chapter": 1}, {"idx_questions_course_grade_chapter"}),
+    ("章节", "SELECT id FROM questions WHERE chapter_id = %(chapter)s" + LIST_TAIL,
+     {"chapter": 1}, {"idx_questions_chapter"}),
+    ("课程+题型", "SELECT id FROM questions WHERE course_id = %(course)s AND question_type = %(qtype)s" + LIST_TAIL,
+     {"course": 1, "qtype": "single_choice"}, {"idx_questions_course_type"}),
+    ("题型+难度范围", "SELECT id FROM questions WHERE question_type = %(qtype)s AND difficulty >= 2 "
+     "AND difficulty <= 4" + LIST_TAIL,
+     {"qtype": "single_choice"}, {"idx_questions_type"}),
+    ("课程+高质量", "SELECT id FROM questions WHERE course_id = %(course)s AND quality >= 4" + LIST_TAIL,
+     {"course": 1}, {"idx_questions_high_quality"}),
+    ("知识点（关联表）", "SELECT question_id FROM question_knowledge_points WHERE point_id IN %(kps)s",
+     {"kps": (1, 2)}, {"idx_question_knowledge_points_point"}),
+    ("关键词（3 字以上）", "SELECT id FROM questions WHERE search_text ILIKE %(kw)s" + LIST_TAIL,
+     {"kw": "%最大值%"}, {"idx_questions_search_text_trgm"}),
+    ("关键词（1~2 字）", "SELECT id FROM questions WHERE search_tsv @@ question_search_query(%(kw)s)" + LIST_TAIL,
+     {"kw": "函数"}, {"idx_questions_search_tsv"}),
+]
+
+
+def seed_tables(cur, rows=SEED_ROWS):
+    """建与 public 同结构、同索引的临时表并写入合成数据（随事务回滚）。"""
+    for table in ("questions", "question_knowledge_points"):
+        cur.execute(f"CREATE TEMP TABLE {table} (LIKE public.{table} INCLUDING DEFAULTS INCLUDING GENERATED)")
+        cur.execute("SELECT indexdef FROM pg_indexes WHERE schemaname = 'public' AND tablename = %s", (table,))
+        for (indexdef,) in cur.fetchall():
+            cur.execute(indexdef.replace(f" ON public.{table} ", f" ON pg_temp.{table} "))
+    cur.execute(SEED_QUESTIONS_SQL, {"rows": rows})
+    cur.execute(SEED_KNOWLEDGE_POINTS_SQL, {"rows": rows})
+    cur.execute("ANALYZE questions")
+    cur.execute("ANALYZE question_knowledge_points")
+
+
+def walk_plan(node):
+    yield node
+    for child in node.get("Plans", []):
+        yield from walk_plan(child)
+
+
+def check_case(cur, sql, params, expected):
+    ordered = not (expected and expected & UNORDERED_INDEXES)
+    cur.execute(f"SET LOCAL enable_sort = {'off' if ordered else 'on'}")
+    cur.execute(f"SET LOCAL enable_bitmapscan = {'off' if ordered else 'on'}")
+    cur.execute("EXPLAIN (FORMAT JSON) " + sql, params)
+    plan = cur.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    nodes = list(walk_plan(plan[0]["Plan"]))
+    used = {n["Index Name"] for n in nodes if "Index Name" in n}
+    seq_scans = [n for n in nodes if n["Node Type"] == "Seq Scan" and n.get("Relation Name") == "questions"]
+    sorts = [n for n in nodes if n["Node Type"] == "Sort"]
+    problems = []
+    if seq_scans:
+        problems.append("questions 上出现顺序扫描")
+    if sorts and ordered:
+        problems.append("索引未提供 id 顺序，计划中有 Sort")
+    if expected and not (used & expected):
+        problems.append(f"未使用期望的索引 {sorted(expected)}，实际: {sorted(used) or '无'}")
+    return problems
+
+
+def run_checks(conn, cases=PLAN_CASES):
+    failures = 0
+    with conn.cursor() as cur:
+        seed_tables(cur)
+        cur.execute("SET LOCAL enable_seqscan = off")
+        for label, sql, params, expected in cases:
+            problems = check_case(cur, sql, params, expected)
+            if problems:
+                failures += 1
+                print(f"❌ {label}: {'；'.join(problems)}")
+            else:
+                print(f"✅ {label}")
+    conn.rollback()
+    return failures
+
+
+if __name__ == "__main__":
+    with closing(db.connect()) as conn:
+        failed = run_checks(conn)
+    print(f"\n{len(PLAN_CASES) - failed}/{len(PLAN_CASES)} 项通过。")
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,247 @@
+"""数据库配置与进程内共享的连接池。
+
+配置来源（优先级从高到低）：
+1. 环境变量：EXAM_DB_URL，或 EXAM_DB_NAME / EXAM_DB_USER / EXAM_DB_PASSWORD / EXAM_DB_HOST / EXAM_DB_PORT；
+   连接池参数 EXAM_DB_POOL_SIZE / EXAM_DB_MAX_OVERFLOW / EXAM_DB_POOL_TIMEOUT / EXAM_DB_POOL_RECYCLE / EXAM_DB_PRE_PING；
+2. TOML 文件：EXAM_DB_CONFIG 指定的路径，默认与本文件同目录的 db.toml（格式见 db.toml.example）；
+3. 下方 DEFAULTS。密码默认为空，此时由 libpq 读取 PGPASSWORD 或 ~/.pgpass。
+
+Streamlit 应用通过 get_engine() / get_sessionmaker() 使用同一个连接池（st.cache_resource，
+同一进程内所有会话、所有页面共享）；命令行脚本和 LISTEN 长连接用 connect() 直连，不占用连接池。
+"""
+import os
+import threading
+from pathlib import Path
+
+import psycopg2
+
+# optional libs
+try:
+    import tomllib
+except Exception:
+    try:
+        import tomli as tomllib
+    except Exception:
+        tomllib = None
+try:
+    import streamlit as st
+    cache_resource = st.cache_resource
+except Exception:
+    from functools import lru_cache
+    cache_resource = lru_cache(maxsize=None)
+
+# ===============================
+# Config
+# ===============================
+DEFAULT_CONFIG_PATH = Path(__file__).resolve().parent / "db.toml"
+
+DEFAULTS = {
+    "database": {
+        "url": None,
+        "dbname": "exam_db",
+        "user": "yiddi",
+        "password": None,
+        "host": "localhost",
+        "port": 5432,
+    },
+    "pool": {
+        "size": 5,            # 常驻连接数
+        "max_overflow": 10,   # 高峰时额外允许的连接数
+        "timeout": 30,        # 连接全部占用时等待的秒数
+        "recycle": 1800,      # 连接使用超过该秒数后重建，避开服务端/防火墙的空闲断开
+        "pre_ping": True,     # 取出连接前先探活，数据库重启后不会拿到失效连接
+    },
+}
+
+ENV_KEYS = {
+    ("database", "url"): "EXAM_DB_URL",
+    ("database", "dbname"): "EXAM_DB_NAME",
+    ("database", "user"): "EXAM_DB_USER",
+    ("database", "password"): "EXAM_DB_PASSWORD",
+    ("database", "host"): "EXAM_DB_HOST",
+    ("database", "port"): "EXAM_DB_PORT",
+    ("pool", "size"): "EXAM_DB_POOL_SIZE",
+    ("pool", "max_overflow"): "EXAM_DB_MAX_OVERFLOW",
+    ("pool", "timeout"): "EXAM_DB_POOL_TIMEOUT",
+    ("pool", "recycle"): "EXAM_DB_POOL_RECYCLE",
+    ("pool", "pre_ping"): "EXAM_DB_PRE_PING",
+}
+
+
+def _coerce(value, default):
+    if isinstance(default, bool):
+        return str(value).strip().lower() not in ("0", "false", "no", "off", "")
+    if isinstance(default, int):
+        return int(value)
+    return value
+
+
+def load_config(path=None):
+    """合并默认值、TOML 文件与环境变量，返回 {"database": {...}, "pool": {...}}。"""
+    config = {section: dict(values) for section, values in DEFAULTS.items()}
+
+    path = Path(path or os.environ.get("EXAM_DB_CONFIG") or DEFAULT_CONFIG_PATH)
+    if path.exists():
+        if tomllib is None:
+            print(f"警告：未安装 tomli（Python < 3.11），忽略配置文件 {path}")
+        else:
+            with open(path, "rb") as f:
+                data = tomllib.load(f)
+            for section in config:
+                for key, value in data.get(section, {}).items():
+                    if key in config[section]:
+                        config[section][key] = value
+
+    for (section, key), env_name in ENV_KEYS.items():
+        if env_name in os.environ:
+            config[section][key] = _coerce(os.environ[env_name], DEFAULTS[section][key])
+    return config
+
+
+def connect_kwargs(config=None):
+    """psycopg2.connect 的参数。"""
+    db = (config or load_config())["database"]
+    if db["url"]:
+        return {"dsn": db["url"]}
+    kwargs = {k: db[k] for k in ("dbname", "user", "host", "port") if db[k] is not None}
+    if db["password"]:
+        kwargs["password"] = db["password"]
+    return kwargs
+
+
+def connect(config=None):
+    """新建一条独立连接（不经过连接池），用于命令行脚本和 LISTEN 长连接。"""
+    return psycopg2.connect(**connect_kwargs(config))
+
+
+# ===============================
+# 连接池
+# ===============================
+def database_url(config=None):
+    from sqlalchemy.engine import URL, make_url
+
+    db = (config or load_config())["database"]
+    if db["url"]:
+        url = make_url(db["url"])
+        # 未写驱动名时固定用 psycopg2（与 connect() 一致），新版 SQLAlchemy 的默认驱动是 psycopg 3
+        return url.set(drivername="postgresql+psycopg2") if url.drivername == "postgresql" else url
+    return URL.create(
+        "postgresql+psycopg2",
+        username=db["user"],
+        password=db["password"] or None,
+        host=db["host"],
+        port=int(db["port"]) if db["port"] else None,
+        database=db["dbname"],
+    )
+
+
+class PoolMetrics:
+    """通过连接池事件累计的计数，配合 QueuePool 自身的实时状态给出利用率。"""
+
+    def __init__(self, max_overflow):
+        self._lock = threading.Lock()
+        self.max_overflow = max_overflow
+        self.connects = 0          # 新建的物理连接数
+        self.checkouts = 0         # 取出次数
+        self.invalidations = 0     # 被判定失效（含 pre-ping 失败）的连接数
+        self.peak_checked_out = 0  # 同时借出的最大连接数
+
+    def attach(self, engine):
+        from sqlalchemy import event
+
+        pool = engine.pool
+
+        @event.listens_for(pool, "connect")
+        def _on_connect(dbapi_conn, record):
+            with self._lock:
+                self.connects += 1
+
+        @event.listens_for(pool, "checkout")
+        def _on_checkout(dbapi_conn, record, proxy):
+            with self._lock:
+                self.checkouts += 1
+                self.peak_checked_out = max(self.peak_checked_out, pool.checkedout())
+
+        @event.listens_for(pool, "invalidate")
+        def _on_invalidate(dbapi_conn, record, exc):
+            with self._lock:
+                self.invalidations += 1
+
+
+def create_pool(config=None):
+    """按配置创建 SQLAlchemy Engine（QueuePool），并挂上利用率统计。"""
+    from sqlalchemy import create_engine
+
+    config = config or load_config()
+    pool = config["pool"]
+    engine = create_engine(
+        database_url(config),
+        pool_size=pool["size"],
+        max_overflow=pool["max_overflow"],
+        pool_timeout=pool["timeout"],
+        pool_recycle=pool["recycle"],
+        pool_pre_ping=pool["pre_ping"],
+        # Windows 下连接编码问题
+        client_encoding="utf8",
+    )
+    engine.pool_metrics = PoolMetrics(pool["max_overflow"])
+    engine.pool_metrics.attach(engine)
+    return engine
+
+
+@cache_resource
+def get_engine():
+    """进程内共享的 Engine（连接池）。"""
+    return create_pool()
+
+
+@cache_resource
+def get_sessionmaker():
+    from sqlalchemy.orm import sessionmaker
+
+    return sessionmaker(bind=get_engine())
+
+
+def pool_stats(engine=None):
+    """连接池的实时状态与累计计数。"""
+    engine = engine or get_engine()
+    pool = engine.pool
+    metrics = engine.pool_metrics
+    capacity = pool.size() + metrics.max_overflow
+    checked_out = pool.checkedout()
+    return {
+        "pool_size": pool.size(),
+        "max_overflow": metrics.max_overflow,
+        "checked_out": checked_out,
+        "idle": pool.checkedin(),
+        "overflow": max(pool.overflow(), 0),
+        "utilization": checked_out / capacity if capacity > 0 else 0.0,
+        "peak_checked_out": metrics.peak_checked_out,
+        "checkouts": metrics.checkouts,
+        "connects": metrics.connects,
+        "invalidations": metrics.invalidations,
+    }
+
+
+def render_pool_stats(container=None):
+    """在 Streamlit 中显示连接池利用率（默认放在侧边栏）。"""
+    container = container or st.sidebar
+    stats = pool_stats()
+    with container.expander("🔌 数据库连接池"):
+        st.progress(min(stats["utilization"], 1.0),
+                    text=f"借出 {stats['checked_out']} / {stats['pool_size']} + {stats['max_overflow']} 溢出")
+        st.caption(
+            f"空闲 {stats['idle']}｜峰值 {stats['peak_checked_out']}｜取出 {stats['checkouts']} 次｜"
+            f"新建连接 {stats['connects']}｜失效 {stats['invalidations']}"
+        )
+
+
+if __name__ == "__main__":
+    config = load_config()
+    shown = {k: ("***" if k in ("url", "password") and v else v) for k, v in config["database"].items()}
+    print("数据库:", shown)
+    print("连接池:", config["pool"])
+    with connect(config) as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT version()")
+            print(cur.fetchone()[0])
@@ -0,0 +1,143 @@
+"""只读查询的异步访问路径（SQLAlchemy asyncio + asyncpg）：知识体系、题库检索、单题预览。
+
+Streamlit 脚本本身是同步执行的。这里在一个后台线程里常驻一个事件循环，异步连接池和所有查询都
+跑在这个循环上；脚本线程通过 AsyncReads.run() 提交协程并等待结果。等待数据库的是少量协程而不是
+一堆被阻塞的服务线程，一次重跑里互不依赖的查询（当前页 + 估算总数）也可以并发执行。
+
+连接配置与连接池参数和同步路径相同（db.load_config()）。查询语句来自 question_queries.py，
+与同步路径完全一致；asyncpg 下需要注意的类型问题（枚举参数）也在那里处理。
+
+应用中默认仍走同步路径：设置环境变量 EXAM_DB_ASYNC_READS=1 才启用（先用 load_test_reads.py 在
+实际数据和并发量下比较两条路径）。依赖 asyncpg 与 greenlet（pip install "sqlalchemy[asyncio]" asyncpg），
+未启用或未安装时 get_async_reads() 返回 None，调用方退回同步路径。
+"""
+import asyncio
+import os
+import threading
+
+from sqlalchemy import text
+
+from db import cache_resource, load_config
+from question_queries import (
+    build_question_filters, explain_count_sql, knowledge_point_counts_stmt, plan_rows, question_page_stmt,
+    question_preview_stmt,
+)
+from taxonomy import FETCH_SIZE, TAXONOMY_SQL, VERSION_SQL, TaxonomyBuilder
+
+# optional libs
+try:
+    import asyncpg
+    from sqlalchemy.ext.asyncio import create_async_engine
+except Exception:
+    asyncpg = None
+
+ASYNC_READS_ENABLED = os.environ.get("EXAM_DB_ASYNC_READS", "0").strip().lower() in ("1", "true", "yes", "on")
+
+
+def async_database_url(config=None):
+    from db import database_url
+
+    return database_url(config).set(drivername="postgresql+asyncpg")
+
+
+def create_async_pool(config=None):
+    config = config or load_config()
+    pool = config["pool"]
+    return create_async_engine(
+        async_database_url(config),
+        pool_size=pool["size"],
+        max_overflow=pool["max_overflow"],
+        pool_timeout=pool["timeout"],
+        pool_recycle=pool["recycle"],
+        pool_pre_ping=pool["pre_ping"],
+    )
+
+
+# ===============================
+# 读路径（协程）
+# ===============================
+async def load_taxonomy_async(engine, version=None):
+    """加载完整知识体系快照（taxonomy.TaxonomyTree）；version 为 None 时先读取版本号。
+
+    与同步路径的 taxonomy.load_taxonomy 一样用服务端游标分批取行，每取回一个分区就并入快照，
+    不会把整个结果集先读进内存。
+    """
+    async with engine.connect() as conn:
+        if version is None:
+            version = (await conn.execute(text(VERSION_SQL))).scalar()
+        builder = TaxonomyBuilder(version)
+        result = await conn.stream(text(TAXONOMY_SQL).execution_options(yield_per=FETCH_SIZE))
+        async for partition in result.partitions():
+            builder.add(partition)
+    return builder.tree
+
+
+async def fetch_question_page_async(engine, spec, page_size, before_id=None):
+    async with engine.connect() as conn:
+        stmt = question_page_stmt(build_question_filters(spec), page_size, before_id)
+        rows = (await conn.execute(stmt)).all()
+    return rows[:page_size], len(rows) > page_size
+
+
+async def estimate_question_count_async(engine, spec):
+    sql, params = explain_count_sql(spec, engine.dialect)
+    async with engine.connect() as conn:
+        return plan_rows((await conn.exec_driver_sql(sql, params)).scalar())
+
+
+async def knowledge_point_counts_async(engine, spec):
+    async with engine.connect() as conn:
+        return [tuple(row) for row in await conn.execute(knowledge_point_counts_stmt(spec))]
+
+
+async def fetch_question_preview_async(engine, question_id):
+    async with engine.connect() as conn:
+        row = (await conn.execute(question_preview_stmt(question_id))).mappings().first()
+    return dict(row) if row else None
+
+
+# ===============================
+# 供同步脚本调用的入口
+# ===============================
+class AsyncReads:
+    """在后台事件循环上执行异步读查询；各方法从任意线程同步调用，返回查询结果。"""
+
+    def __init__(self, config=None):
+        self._loop = asyncio.new_event_loop()
+        threading.Thread(target=self._loop.run_forever, name="async-db-loop", daemon=True).start()
+        # 连接只会在这个事件循环上建立和使用，asyncpg 连接不能跨事件循环
+        self.engine = create_async_pool(config)
+
+    def run(self, coro, timeout=None):
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result(timeout)
+
+    def taxonomy(self, version=None):
+        return self.run(load_taxonomy_async(self.engine, version))
+
+    def browse(self, spec, page_size, before_id=None):
+        """当前页与估算总数并发查询，返回 (records, has_next, total)。"""
+        async def _browse():
+            (records, has_next), total = await asyncio.gather(
+                fetch_question_page_async(self.engine, spec, page_size, before_id),
+                estimate_question_count_async(self.engine, spec),
+            )
+            return records, has_next, total
+        return self.run(_browse())
+
+    def knowledge_point_counts(self, spec):
+        return self.run(knowledge_point_counts_async(self.engine, spec))
+
+    def preview(self, question_id):
+        return self.run(fetch_question_preview_async(self.engine, question_id))
+
+    def close(self):
+        self.run(self.engine.dispose())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+
+
+@cache_resource
+def get_async_reads():
+    """进程内共享的异步读路径；未启用或未安装 asyncpg 时返回 None。"""
+    if not ASYNC_READS_ENABLED or asyncpg is None:
+        return None
+    return AsyncReads()
@@ -7,6 +7,9 @@ import subprocess
 from pathlib import Path
 from wand.image import Image as WandImage # 导入 Wand 库,注意wand库还要下载 imagemagick
 
+from image_derivatives import generate_derivatives_for_files
+from image_store import record_references, rel_markdown_path, store_image
+
 # =========================
 # 配置输入和输出
 # =========================
@@ -14,12 +17,11 @@ PROJECT_ROOT = Path(__file__).resolve().parent.parent  # 项目根目录（conve
 INPUT_DOCX = None  # 将在 __main__ 中从命令行参数解析
 # Pandoc 工作目录（用于 --extract-media 和临时 md），在 __main__ 中设置为 .pandoc_<docname>
 OUTPUT_FOLDER = None
-IMAGES_SUBFOLDER = "images"
 PANDOC_MEDIA_FOLDER = "media"
 # 其他在 __main__ 中设置的全局：
 DOC_BASE_NAME = None            # 不含扩展名的 docx 名称
 PARTS_OUTPUT_DIR = None         # 小 md 输出目录（项目根目录）
-IMAGES_FINAL_DIR = None         # 根目录 images/<docname>/
+# 图片统一存入内容寻址库 images/by-hash/（见 image_store.py）
 
 
 # =========================
@@ -129,112 +131,74 @@ def save_parts_to_md(parts):
     return saved_files
 
 # =========================
-# ✅ 最终修正：集成 WMF 转换、UUID 重命名并修正路径
+# 图片：WMF 转换、按内容哈希入库并修正引用路径
 # =========================
 def process_images_and_update_references(md_files):
     """
-    1. 将 'media' 文件夹重命名为 'images'。
-    2. 遍历 'images' 文件夹，将 WMF/EMF 文件转换为 PNG。
-    3. 为所有图片生成 UUID 文件名。
-    4. 修正并更新所有 Markdown 文件中的引用路径。
+    1. 遍历 Pandoc 提取的 'media' 文件夹，将 WMF/EMF 文件转换为 PNG。
+    2. 将图片移入内容寻址图片库 images/by-hash/（相同内容只存一份）。
+    3. 在引用表中记录本文档引用的图片。
+    4. 将所有 Markdown 文件中的图片引用改为库内路径。
+    返回本次入库的图片路径列表。
     """
     pandoc_image_dir = OUTPUT_FOLDER / PANDOC_MEDIA_FOLDER
-    final_image_dir = IMAGES_FINAL_DIR
-    
-    # 步骤 1: 重命名或合并文件夹
-    if pandoc_image_dir.exists():
-        final_image_dir.mkdir(parents=True, exist_ok=True)
-        if final_image_dir.exists() and final_image_dir != pandoc_image_dir:
-            for item in pandoc_image_dir.iterdir():
-                if item.is_file():
-                    target = final_image_dir / item.name
-                    if target.exists():
-                        stem, suf = item.stem, item.suffix
-                        k = 1
-                        while True:
-                            candidate = final_image_dir / f"{stem}_{k}{suf}"
-                            if not candidate.exists():
-                                target = candidate
-                                break
-                            k += 1
-                    item.rename(target)
-            try:
-                pandoc_image_dir.rmdir()
-            except OSError:
-                pass
-        else:
-            pandoc_image_dir.rename(final_image_dir)
-        print(f"图片目录已准备就绪: '{final_image_dir}'")
-    else:
+    if not pandoc_image_dir.exists():
         print("未找到 Pandoc 提取的图片目录，跳过后续处理。")
-        return
+        return []
 
-    # 步骤 2 & 3: 转换格式并重命名（WMF/EMF -> 同名 PNG；其它保留原名）
-    rename_map = {}
-    print("开始处理图片：转换格式并重命名...")
-    for old_image_path in list(final_image_dir.iterdir()): # 使用 list() 复制，以防迭代时删除文件出错
-        if not old_image_path.is_file():
+    # 步骤 1 & 2: 转换格式并入库（WMF/EMF -> PNG；其它格式原样入库）
+    rename_map = {}  # {原始文件名: 库内相对路径}
+    print("开始处理图片：转换格式并按内容入库...")
+    for image_path in sorted(pandoc_image_dir.rglob("*")):
+        if not image_path.is_file():
             continue
 
-        original_name = old_image_path.name
-        
-        # --- 新增：检查文件格式并转换 ---
-        if old_image_path.suffix.lower() in ['.wmf', '.emf']:
-            # 对于 WMF/EMF，转换为与原始文件同名的 PNG，便于后续路径替换
-            new_name = f"{old_image_path.stem}.png"
-            new_image_path = final_image_dir / new_name
+        original_name = image_path.name
+
+        if image_path.suffix.lower() in ['.wmf', '.emf']:
+            png_path = image_path.with_suffix(".png")
             try:
-                with WandImage(filename=str(old_image_path)) as img:
+                with WandImage(filename=str(image_path)) as img:
                     img.format = 'png'
-                    img.save(filename=str(new_image_path))
-                os.remove(old_image_path) # 删除原始的 wmf/emf 文件
-                rename_map[original_name] = new_name
-                print(f"转换并重命名: {original_name} -> {new_name}")
+                    img.save(filename=str(png_path))
+                os.remove(image_path) # 删除原始的 wmf/emf 文件
+                print(f"转换: {original_name} -> {png_path.name}")
+                image_path = png_path
             except Exception as e:
                 print(f"错误：转换文件 {original_name} 失败: {e}")
-        else: # 对于其他图片格式，保持原始文件名（不做重命名）
-            new_name = original_name
-            rename_map[original_name] = new_name
+                continue
+
+        stored = store_image(image_path, PROJECT_ROOT)
+        rename_map[original_name] = rel_markdown_path(stored, PROJECT_ROOT)
 
     if not rename_map:
-        return
+        return []
+
+    # 步骤 3: 记录引用
+    record_references(PROJECT_ROOT, DOC_BASE_NAME, rename_map.items())
+    print(f"图片已入库: {len(rename_map)} 个引用，{len(set(rename_map.values()))} 个不同文件")
 
     # 步骤 4: 更新 Markdown 文件中的引用
     print("开始更新 Markdown 文件中的图片引用...")
+    # 匹配模式：![alt](<path>) 或 [text](<path>)，path 可含空格、相对或绝对路径，支持 Windows 反斜杠
+    link_pat = re.compile(r"(!?\[[^\]]*\]\()\s*<?([^)>]+?)>?\s*(\))")
+
+    def _repl(m):
+        before, target, after = m.group(1), m.group(2), m.group(3)
+        base = target.replace('\\', '/').split('/')[-1]
+        new_path = rename_map.get(base)
+        if new_path is None:
+            return m.group(0)
+        return f"{before}{new_path}{after}"
+
     for md_file_path in md_files:
         with open(md_file_path, 'r', encoding='utf-8') as f:
             content = f.read()
 
         original_content = content
 
-        # 基础路径修正：将任何指向 media/ 的引用改到 images/<docname>/
-        correct_path_prefix = f"{IMAGES_SUBFOLDER}/{DOC_BASE_NAME}/"
-        # 1) 包含工作目录名的前缀情况
-        if OUTPUT_FOLDER is not None:
-            path_prefix_to_remove = f"{OUTPUT_FOLDER.name}/{PANDOC_MEDIA_FOLDER}/"
-            content = content.replace(path_prefix_to_remove, correct_path_prefix)
-        # 2) 直接以 media/ 开头的相对路径
-        content = re.sub(r"\((?:\./)?media/", f"({correct_path_prefix}", content)
-        # 3) Windows 绝对路径中的 \\media\\
-        content = re.sub(r"\((?:[A-Za-z]:)?[^)]*?\\media\\", f"({correct_path_prefix}", content)
-
-        # 使用正则仅替换 Markdown 链接/图片目标中的文件名
-        # 匹配模式：![alt](<path>) 或 [text](<path>)，path 可含空格、相对或绝对路径，支持 Windows 反斜杠
-        link_pat = re.compile(r"(!?\[[^\]]*\]\()\s*<?([^)>]+?)>?\s*(\))")
-
-        def replace_target_with_map(text, old_name, new_name):
-            def _repl(m):
-                before, target, after = m.group(1), m.group(2), m.group(3)
-                norm = target.replace('\\\\', '/').replace('\\\\', '/')
-                norm = norm.replace('\\', '/')
-                base = norm.split('/')[-1]
-                if base == old_name:
-                    return f"{before}{correct_path_prefix}{new_name}{after}"
-                return m.group(0)
-            return link_pat.sub(_repl, text)
-
-        for old_name, new_name in rename_map.items():
-            content = replace_target_with_map(content, old_name, new_name)
+        # 按文件名把链接/图片目标整体替换为库内路径（与原路径前缀无关）
+        content = link_pat.sub(_repl, content)
 
         # 移除 Pandoc/kramdown 风格的行内属性块：如 {width="2in" height="1in"}
         # 形式通常紧跟在链接/图片之后：![alt](path){...}
@@ -246,6 +210,8 @@ def process_images_and_update_references(md_files):
                 f.write(content)
             print(f"已更新文件: {md_file_path}")
 
+    return [PROJECT_ROOT / p for p in set(rename_map.values())]
+
 
 # =========================
 # 执行
@@ -263,14 +229,12 @@ if __name__ == "__main__":
 
     # 2) 设置输出结构：
     #    - 小 md：项目根目录
-    #    - 图片：images/<docname>/
+    #    - 图片：images/by-hash/<哈希前2位>/<其余哈希>.<扩展名>
     #    - Pandoc 工作目录：.pandoc_<docname>
     DOC_BASE_NAME = INPUT_DOCX.stem
     PARTS_OUTPUT_DIR = PROJECT_ROOT
-    IMAGES_FINAL_DIR = PROJECT_ROOT / IMAGES_SUBFOLDER / DOC_BASE_NAME
     OUTPUT_FOLDER = PROJECT_ROOT / f".pandoc_{DOC_BASE_NAME}"
     OUTPUT_FOLDER.mkdir(parents=True, exist_ok=True)
-    IMAGES_FINAL_DIR.mkdir(parents=True, exist_ok=True)
 
     # 3) 执行转换与分割
     md_content, temp_file = pandoc_convert_and_parse(INPUT_DOCX)
@@ -278,7 +242,9 @@ if __name__ == "__main__":
     if md_content:
         md_parts = parse_md(md_content)
         saved_md_files = save_parts_to_md(md_parts)
-        process_images_and_update_references(saved_md_files)
+        stored_images = process_images_and_update_references(saved_md_files)
+        # 生成缩略图 / WebP 派生图，供预览和题库浏览使用（原图保留给试卷构建）
+        generate_derivatives_for_files(stored_images)
 
         # 4) 清理临时文件与工作目录
         if temp_file and temp_file.exists():
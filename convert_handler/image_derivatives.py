@@ -0,0 +1,228 @@
+"""为题目图片生成派生图并在图片所在目录写入清单（manifest）。
+
+派生图：
+- w<宽度>.webp：限制宽度的缩略图，供预览与题库浏览列表使用；
+- full.webp：原尺寸 WebP（PNG 原图使用无损压缩）；
+- opt.png：重新优化压缩的 PNG（仅当比原图小时保留），供不支持 WebP 的浏览器。
+
+原图保持不动，试卷（LaTeX）构建仍使用原图以保证打印质量。
+派生图位于 <图片目录>/.derivatives/<原图文件名>/ 下。
+
+用法: python convert_handler/image_derivatives.py <图片目录> [<图片目录> ...]
+"""
+import json
+import os
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+# optional libs
+try:
+    from PIL import Image
+except Exception:
+    Image = None
+
+# ===============================
+# Config
+# ===============================
+DERIVATIVE_WIDTHS = (160, 320, 640, 1280)
+DERIVATIVES_DIR_NAME = ".derivatives"
+MANIFEST_NAME = "manifest.json"
+MANIFEST_VERSION = 1
+WEBP_QUALITY = 85
+SOURCE_EXTS = {".png", ".jpg", ".jpeg", ".webp"}
+
+
+# ===============================
+# 单张图片处理（在子进程中执行）
+# ===============================
+def _save_variant(img, out_path: Path, fmt: str, **save_kwargs):
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = out_path.with_name(out_path.name + ".tmp")
+    img.save(tmp, format=fmt, **save_kwargs)
+    tmp.replace(out_path)
+    return out_path.stat().st_size
+
+
+def build_derivatives_for_image(src_path: str, image_dir: str):
+    """生成一张图片的全部派生图，返回 (文件名, 清单条目)。失败时条目为 None。"""
+    src = Path(src_path)
+    image_dir = Path(image_dir)
+    out_dir = image_dir / DERIVATIVES_DIR_NAME / src.name
+    st = src.stat()
+    entry = {"mtime_ns": st.st_mtime_ns, "size": st.st_size, "variants": {}}
+    try:
+        with Image.open(src) as img:
+            img.load()
+            entry["width"], entry["height"] = img.width, img.height
+            lossless = src.suffix.lower() == ".png"
+            # WebP 不支持调色板/CMYK 等模式，统一转换
+            base = img.convert("RGBA") if img.mode not in ("RGB", "RGBA") else img
+
+            def add(name, fmt, im, **kw):
+                out = out_dir / name
+                size = _save_variant(im, out, fmt, **kw)
+                entry["variants"][name] = {
+                    "path": out.relative_to(image_dir).as_posix(),
+                    "format": fmt.lower(),
+                    "width": im.width,
+                    "height": im.height,
+                    "bytes": size,
+                }
+
+            for w in DERIVATIVE_WIDTHS:
+                if img.width <= w:
+                    break
+                h = max(1, round(img.height * w / img.width))
+                add(f"w{w}.webp", "WEBP", base.resize((w, h), Image.LANCZOS), quality=WEBP_QUALITY, method=6)
+
+            add("full.webp", "WEBP", base, lossless=lossless, quality=WEBP_QUALITY, method=6)
+
+            if lossless:
+                add("opt.png", "PNG", img, optimize=True)
+                if entry["variants"]["opt.png"]["bytes"] >= st.st_size:
+                    (out_dir / "opt.png").unlink()
+                    del entry["variants"]["opt.png"]
+    except Exception as e:
+        print(f"错误：生成派生图失败 {src.name}: {e}")
+        return src.name, None
+    return src.name, entry
+
+
+# ===============================
+# 目录级处理与清单
+# ===============================
+def load_manifest(image_dir: Path):
+    manifest_path = Path(image_dir) / MANIFEST_NAME
+    try:
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest.get("version") == MANIFEST_VERSION:
+            return manifest
+    except (OSError, ValueError):
+        pass
+    return {"version": MANIFEST_VERSION, "images": {}}
+
+
+def _is_current(entry, src: Path):
+    if not entry:
+        return False
+    st = src.stat()
+    return entry.get("mtime_ns") == st.st_mtime_ns and entry.get("size") == st.st_size
+
+
+def _write_manifest(image_dir: Path, manifest):
+    tmp = image_dir / (MANIFEST_NAME + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    tmp.replace(image_dir / MANIFEST_NAME)
+
+
+def generate_derivatives_for_files(paths, workers=None, prune=False):
+    """并行生成给定图片的派生图，并更新各图片所在目录的 manifest.json。
+
+    所有目录的图片共用一个进程池；已在清单中且原图未变化（mtime/size 一致）的图片会被跳过。
+    prune=True 时同时移除清单中原图已不存在的条目。
+    """
+    if Image is None:
+        print("警告：未安装 Pillow，跳过派生图生成。")
+        return
+    groups = {}
+    for p in paths:
+        p = Path(p)
+        if p.is_file() and p.suffix.lower() in SOURCE_EXTS:
+            groups.setdefault(p.parent, []).append(p)
+
+    manifests = {d: load_manifest(d) for d in groups}
+    pending = []
+    for d, files in groups.items():
+        images = manifests[d]["images"]
+        if prune:
+            for name in list(images):
+                if not (d / name).is_file():
+                    del images[name]
+        pending.extend(p for p in files if not _is_current(images.get(p.name), p))
+    if not pending:
+        print("派生图均为最新。")
+        return
+
+    print(f"开始生成派生图：{len(pending)} 张图片...")
+    workers = workers or min(len(pending), os.cpu_count() or 1)
+    args = ([str(p) for p in pending], [str(p.parent) for p in pending])
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(build_derivatives_for_image, *args))
+    else:
+        results = list(map(build_derivatives_for_image, *args))
+
+    for p, (name, entry) in zip(pending, results):
+        if entry is not None:
+            manifests[p.parent]["images"][name] = entry
+    for d, manifest in manifests.items():
+        _write_manifest(d, manifest)
+    print(f"派生图清单已更新：{len(manifests)} 个目录。")
+
+
+def generate_derivatives(image_dir, workers=None):
+    """为 image_dir 下所有图片生成派生图（见 generate_derivatives_for_files）。"""
+    image_dir = Path(image_dir)
+    generate_derivatives_for_files(sorted(image_dir.iterdir()), workers=workers, prune=True)
+
+
+# ===============================
+# 读取端：为给定宽度挑选派生图
+# ===============================
+_manifest_cache = {}  # {目录: (manifest mtime_ns, manifest)}
+_manifest_cache_lock = threading.Lock()
+
+
+def _cached_manifest(image_dir: Path):
+    manifest_path = image_dir / MANIFEST_NAME
+    try:
+        mtime_ns = manifest_path.stat().st_mtime_ns
+    except OSError:
+        return None
+    with _manifest_cache_lock:
+        cached = _manifest_cache.get(image_dir)
+        if cached and cached[0] == mtime_ns:
+            return cached[1]
+    manifest = load_manifest(image_dir)
+    with _manifest_cache_lock:
+        _manifest_cache[image_dir] = (mtime_ns, manifest)
+    return manifest
+
+
+def pick_variant(src: Path, width=None, accept_webp=True):
+    """按清单为 src 选择不小于 width 的最小派生图；没有可用派生图时返回 None。"""
+    manifest = _cached_manifest(src.parent)
+    if manifest is None:
+        return None
+    entry = manifest["images"].get(src.name)
+    if not _is_current(entry, src):
+        return None
+    candidates = [
+        v for v in entry["variants"].values()
+        if accept_webp or v["format"] != "webp"
+    ]
+    full_size = [v for v in candidates if v["width"] == entry.get("width")]
+    if width:
+        pool = [v for v in candidates if v["width"] >= width] or full_size
+    else:
+        pool = full_size
+    if not pool:
+        return None
+    best = min(pool, key=lambda v: (v["width"], v["bytes"]))
+    if best["width"] == entry.get("width") and best["bytes"] >= entry["size"]:
+        # 原尺寸派生图并不比原图小，直接用原图
+        return None
+    path = src.parent / best["path"]
+    return path if path.is_file() else None
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("用法: python image_derivatives.py <图片目录> [<图片目录> ...]")
+        sys.exit(1)
+    for d in sys.argv[1:]:
+        generate_derivatives(d)
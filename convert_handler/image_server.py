@@ -0,0 +1,203 @@
+"""题目图片的本地 HTTP 端点。
+
+Markdown 预览不再把图片以 base64 内联到页面里，而是输出普通的 <img src> URL，
+由本模块启动的小型 HTTP 服务返回图片：
+
+- 带 ETag / Last-Modified / Cache-Control，浏览器可缓存并用 304 重新验证；
+- 支持 ?w=<宽度> 获取缩略图：优先使用 image_derivatives 预先生成的派生图（WebP 等），
+  没有派生图时在第一次请求时生成并缓存到 <root>/.thumbs/ 下。
+
+监听地址、端口和浏览器访问用的对外地址分别由环境变量 EXAM_IMAGE_SERVER_HOST /
+EXAM_IMAGE_SERVER_PORT / EXAM_IMAGE_SERVER_URL 配置，默认只在本机 8502 端口提供服务。
+"""
+import mimetypes
+import os
+import threading
+from email.utils import formatdate
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, quote, unquote, urlsplit
+
+import image_derivatives
+
+# optional libs
+try:
+    from PIL import Image
+except Exception:
+    Image = None
+
+# ===============================
+# Config
+# ===============================
+IMAGE_SERVER_HOST = os.environ.get("EXAM_IMAGE_SERVER_HOST", "127.0.0.1")
+IMAGE_SERVER_PORT = int(os.environ.get("EXAM_IMAGE_SERVER_PORT", "8502"))
+# 浏览器访问图片服务使用的地址；反向代理或远程部署时用 EXAM_IMAGE_SERVER_URL 设为对外地址
+IMAGE_SERVER_PUBLIC_URL = os.environ.get("EXAM_IMAGE_SERVER_URL", f"http://localhost:{IMAGE_SERVER_PORT}").rstrip("/")
+CACHE_MAX_AGE = 86400  # 秒；过期后浏览器带 If-None-Match 重新验证
+THUMB_DIR_NAME = ".thumbs"
+# 允许的缩略图宽度档位，请求的宽度会向上取到最近的档位，避免缓存无限膨胀
+THUMB_WIDTHS = (160, 320, 640, 1280)
+# 这些格式不做缩略（矢量图 / 动图），直接返回原图
+NO_THUMB_EXTS = {".svg", ".gif"}
+ALLOWED_EXTS = {".png", ".jpg", ".jpeg", ".gif", ".svg", ".webp"}
+
+_thumb_lock = threading.Lock()
+
+
+# ===============================
+# 缩略图
+# ===============================
+def snap_width(width):
+    """将任意宽度归一到 THUMB_WIDTHS 中的档位；超过最大档位时返回 None（即原图）。"""
+    if not width or width <= 0:
+        return None
+    for w in THUMB_WIDTHS:
+        if width <= w:
+            return w
+    return None
+
+
+def get_thumbnail(src: Path, root: Path, width: int) -> Path:
+    """返回 src 在给定宽度下的缩略图路径，不存在或已过期时生成。
+
+    无法缩略（未安装 Pillow、矢量图、原图本身更窄、处理失败）时返回原图路径。
+    """
+    if Image is None or src.suffix.lower() in NO_THUMB_EXTS:
+        return src
+    thumb = root / THUMB_DIR_NAME / str(width) / src.relative_to(root)
+    src_mtime = src.stat().st_mtime
+    if thumb.exists() and thumb.stat().st_mtime >= src_mtime:
+        return thumb
+    with _thumb_lock:
+        # 加锁后再检查一次，避免并发请求重复生成
+        if thumb.exists() and thumb.stat().st_mtime >= src_mtime:
+            return thumb
+        try:
+            with Image.open(src) as img:
+                if img.width <= width:
+                    return src
+                height = max(1, round(img.height * width / img.width))
+                resized = img.resize((width, height), Image.LANCZOS)
+                thumb.parent.mkdir(parents=True, exist_ok=True)
+                tmp = thumb.with_name(thumb.name + ".tmp")
+                resized.save(tmp, format=img.format or "PNG", optimize=True)
+                tmp.replace(thumb)
+        except Exception as e:
+            print(f"警告：生成缩略图失败 {src}: {e}")
+            return src
+    return thumb
+
+
+# ===============================
+# HTTP 处理
+# ===============================
+def _etag_for(path: Path) -> str:
+    st = path.stat()
+    return f'"{st.st_mtime_ns:x}-{st.st_size:x}"'
+
+
+class ImageRequestHandler(BaseHTTPRequestHandler):
+    """只读图片服务；root 由 make_handler 绑定。"""
+
+    root: Path = None
+
+    def _resolve(self):
+        parts = urlsplit(self.path)
+        rel = unquote(parts.path).lstrip("/")
+        if not rel:
+            return None, None
+        target = (self.root / rel).resolve()
+        # 拒绝目录穿越与缩略图缓存目录的直接访问
+        if self.root not in target.parents or THUMB_DIR_NAME in target.relative_to(self.root).parts:
+            return None, None
+        if target.suffix.lower() not in ALLOWED_EXTS or not target.is_file():
+            return None, None
+        width = None
+        w_values = parse_qs(parts.query).get("w")
+        if w_values and w_values[0].isdigit():
+            width = snap_width(int(w_values[0]))
+        return target, width
+
+    def _send(self, head_only=False):
+        target, width = self._resolve()
+        if target is None:
+            self.send_error(HTTPStatus.NOT_FOUND)
+            return
+        accept_webp = "image/webp" in (self.headers.get("Accept") or "")
+        variant = image_derivatives.pick_variant(target, width, accept_webp=accept_webp)
+        if variant is not None:
+            target = variant
+        elif width:
+            target = get_thumbnail(target, self.root, width)
+
+        etag = _etag_for(target)
+        if etag in (self.headers.get("If-None-Match") or ""):
+            self.send_response(HTTPStatus.NOT_MODIFIED)
+            self.send_header("ETag", etag)
+            self.send_header("Cache-Control", f"public, max-age={CACHE_MAX_AGE}")
+            self.send_header("Vary", "Accept")
+            self.end_headers()
+            return
+
+        data = b"" if head_only else target.read_bytes()
+        mime_type = mimetypes.guess_type(target.name)[0] or "application/octet-stream"
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", mime_type)
+        self.send_header("Content-Length", str(target.stat().st_size))
+        self.send_header("ETag", etag)
+        self.send_header("Last-Modified", formatdate(target.stat().st_mtime, usegmt=True))
+        self.send_header("Cache-Control", f"public, max-age={CACHE_MAX_AGE}")
+        self.send_header("Vary", "Accept")
+        self.send_header("X-Content-Type-Options", "nosniff")
+        self.end_headers()
+        if not head_only:
+            self.wfile.write(data)
+
+    def do_GET(self):
+        self._send()
+
+    def do_HEAD(self):
+        self._send(head_only=True)
+
+    def log_message(self, format, *args):
+        # Streamlit 控制台里不需要每张图片一行访问日志
+        pass
+
+
+def make_handler(root):
+    return type("BoundImageRequestHandler", (ImageRequestHandler,), {"root": Path(root).resolve()})
+
+
+def start_image_server(root, host=IMAGE_SERVER_HOST, port=IMAGE_SERVER_PORT):
+    """在后台线程启动图片服务并返回 server；端口已被占用时返回 None（沿用已有服务）。"""
+    try:
+        server = ThreadingHTTPServer((host, port), make_handler(root))
+    except OSError as e:
+        print(f"图片服务未启动（{host}:{port} 可能已被占用）: {e}")
+        return None
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="image-server", daemon=True).start()
+    print(f"图片服务已启动: http://{host}:{port}/ -> {root}")
+    return server
+
+
+def image_url(rel_path: str, width=None) -> str:
+    """返回相对路径图片的访问 URL；width 用于请求缩略图。"""
+    url = f"{IMAGE_SERVER_PUBLIC_URL}/{quote(rel_path.replace(chr(92), '/').lstrip('/'))}"
+    width = snap_width(width)
+    if width:
+        url += f"?w={width}"
+    return url
+
+
+if __name__ == "__main__":
+    import sys
+
+    root_dir = sys.argv[1] if len(sys.argv) > 1 else "."
+    srv = start_image_server(root_dir)
+    if srv is not None:
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            srv.shutdown()
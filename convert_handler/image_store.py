@@ -0,0 +1,124 @@
+"""按内容寻址的图片库：images/by-hash/<前2位>/<其余哈希>.<扩展名>。
+
+同一张图片无论被多少份文档引用，只存一份；文件名由内容的 SHA-256 决定，
+因此不会出现同名冲突。每次入库都会在引用表（images/by-hash/refs.sqlite3）
+中记录“哪份文档的哪张原始图片指向了这个哈希文件”，便于追溯和清理。
+"""
+import hashlib
+import os
+import shutil
+import sqlite3
+from pathlib import Path
+
+# ===============================
+# Config
+# ===============================
+IMAGES_SUBFOLDER = "images"
+STORE_SUBFOLDER = "by-hash"
+REFS_DB_NAME = "refs.sqlite3"
+HASH_CHUNK_SIZE = 1 << 20
+
+
+def store_root(project_root: Path) -> Path:
+    return Path(project_root) / IMAGES_SUBFOLDER / STORE_SUBFOLDER
+
+
+def content_hash(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def hashed_path(project_root: Path, digest: str, suffix: str) -> Path:
+    return store_root(project_root) / digest[:2] / f"{digest[2:]}{suffix.lower()}"
+
+
+def store_image(src: Path, project_root: Path) -> Path:
+    """把 src 移入内容寻址库并返回库内路径；库中已有相同内容时直接删除 src。"""
+    src = Path(src)
+    target = hashed_path(project_root, content_hash(src), src.suffix)
+    if target.exists():
+        src.unlink()
+        return target
+    target.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        os.replace(src, target)
+    except OSError:
+        # 跨文件系统时 os.replace 会失败，退回复制
+        shutil.move(str(src), str(target))
+    return target
+
+
+def rel_markdown_path(stored: Path, project_root: Path) -> str:
+    """返回写入 Markdown 的相对路径（相对项目根目录，统一为 / 分隔）。"""
+    return Path(stored).relative_to(project_root).as_posix()
+
+
+# ===============================
+# 引用表
+# ===============================
+def _connect(project_root: Path):
+    root = store_root(project_root)
+    root.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(root / REFS_DB_NAME, timeout=30)
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS image_refs (
+            stored_path   TEXT NOT NULL,  -- 库内相对路径，如 images/by-hash/ab/cdef....png
+            doc_name      TEXT NOT NULL,  -- 来源文档（不含扩展名）
+            original_name TEXT NOT NULL,  -- 文档中的原始图片文件名
+            created_at    TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (stored_path, doc_name, original_name)
+        )
+        """
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_image_refs_doc ON image_refs (doc_name)")
+    return conn
+
+
+def record_references(project_root: Path, doc_name: str, refs):
+    """记录引用。refs: Iterable[(original_name, 库内相对路径)]。
+
+    同一文档重新入库时先清掉它的旧引用，保证引用表与最新一次入库一致。
+    """
+    conn = _connect(project_root)
+    try:
+        with conn:
+            conn.execute("DELETE FROM image_refs WHERE doc_name = ?", (doc_name,))
+            conn.executemany(
+                "INSERT OR IGNORE INTO image_refs (stored_path, doc_name, original_name) VALUES (?, ?, ?)",
+                [(stored, doc_name, original) for original, stored in refs],
+            )
+    finally:
+        conn.close()
+
+
+def find_unreferenced(project_root: Path):
+    """返回库中已没有任何文档引用的图片路径列表（不删除，交由调用方决定）。"""
+    conn = _connect(project_root)
+    try:
+        referenced = {row[0] for row in conn.execute("SELECT DISTINCT stored_path FROM image_refs")}
+    finally:
+        conn.close()
+    root = store_root(project_root)
+    orphans = []
+    for shard in root.iterdir():
+        if not shard.is_dir() or len(shard.name) != 2:
+            continue
+        for p in shard.iterdir():
+            if p.is_file() and p.suffix != ".json" and rel_markdown_path(p, project_root) not in referenced:
+                orphans.append(p)
+    return orphans
+
+
+if __name__ == "__main__":
+    import sys
+
+    project_root = Path(__file__).resolve().parent.parent
+    if len(sys.argv) > 1 and sys.argv[1] == "orphans":
+        for p in find_unreferenced(project_root):
+            print(p)
+    else:
+        print("用法: python image_store.py orphans   # 列出无人引用的图片")
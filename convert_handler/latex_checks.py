@@ -0,0 +1,198 @@
+"""LaTeX 静态检查的核心：在调用 xelatex 之前找出会让编译失败（或悄悄吞掉内容）的写法。
+
+只扫描特殊记号（控制序列、$、%、&、#、_、^、花括号、换行），不做完整的 TeX 解析，单题通常在
+几十微秒内完成。检查项：
+  E101 数学模式未闭合 / 定界符不匹配（$、$$、\\(\\)、\\[\\]）
+  E102 花括号不配对
+  E103 \\begin/\\end 不配对
+  E104 对齐环境之外的 &（Misplaced alignment tab）
+  E105 未转义的 #
+  E106 数学模式之外的 _ 或 ^（Missing $ inserted）
+  E107 未转义的 %：其后同一行的内容会被当成注释吞掉
+  E201 \\hbox 中的行间公式或列表类环境（mvp 版式把题干放在 \\hbox{} 中，见 latex_templates.QUIZ_TEMPLATE_RAW）
+标签、引用、文件名和网址（\\label、\\ref、\\cite、\\includegraphics、\\url、\\href 的网址、\\input 等）的参数
+以及 \\verb|...| 中的内容按原样使用，其中的 _、%、# 等不检查。
+
+题库编辑页面（streamlit_run*.py）保存前用 lint_question() 检查，试卷构建前由 latex_builder/latex_lint.py 检查整个题库。
+"""
+import re
+from collections import namedtuple
+
+# mvp 版式（latex_builder/latex_templates.QUIZ_TEMPLATE_RAW）把题干放在 \\hbox{} 中，
+# 与 latex_lint.layout_uses_hbox("mvp") 一致；编辑页面保存时按此检查题干
+QUESTION_IN_HBOX = True
+
+Issue = namedtuple("Issue", "field line code message")
+
+TOKEN_PATTERN = re.compile(r"\\(?:begin|end)\s*\{([^}]*)\}|\\[A-Za-z@]+|\\.|\$\$|[$%&#{}_^\n]", re.S)
+ALIGN_ENVS = {
+    "tabular", "tabular*", "tabularx", "array", "align", "align*", "aligned", "alignat", "alignat*", "alignedat",
+    "eqnarray", "eqnarray*", "split", "cases", "dcases", "matrix", "pmatrix", "bmatrix", "Bmatrix", "vmatrix",
+    "Vmatrix", "smallmatrix", "longtable", "flalign", "flalign*",
+}
+DISPLAY_ENVS = {
+    "equation", "equation*", "align", "align*", "gather", "gather*", "multline", "multline*", "displaymath",
+    "eqnarray", "eqnarray*", "flalign", "flalign*", "alignat", "alignat*",
+}
+# 需要段落（竖直）模式的环境，放进 \hbox 会报错
+VERTICAL_ENVS = {"itemize", "enumerate", "description", "center", "flushleft", "flushright", "quote", "figure"}
+MATH_ENVS = DISPLAY_ENVS | {"math"}
+CLOSERS = {"\\)": "\\(", "\\]": "\\["}
+# 参数按原样使用（标签、文件名、网址）的命令：跳过可选参数和第一个必选参数（\\href 只跳过网址）
+VERBATIM_ARG_COMMANDS = {
+    "\\label", "\\ref", "\\eqref", "\\pageref", "\\autoref", "\\cref", "\\Cref", "\\cite", "\\citep",
+    "\\citet", "\\nocite", "\\includegraphics", "\\url", "\\href", "\\input", "\\include",
+}
+
+
+def _verbatim_arg_end(text, pos):
+    """pos 处（可有空白和 [可选参数]）的 {参数} 结束后的位置；没有 { 参数时返回 pos。"""
+    end = len(text)
+    while pos < end and text[pos] in " \t":
+        pos += 1
+    if pos < end and text[pos] == "[":
+        close = text.find("]", pos)
+        if close < 0:
+            return pos
+        pos = close + 1
+        while pos < end and text[pos] in " \t":
+            pos += 1
+    if pos >= end or text[pos] != "{":
+        return pos
+    depth = 0
+    i = pos
+    while i < end:
+        ch = text[i]
+        if ch == "\\":
+            i += 2
+            continue
+        if ch == "{":
+            depth += 1
+        elif ch == "}":
+            depth -= 1
+            if depth == 0:
+                return i + 1
+        i += 1
+    return pos          # 参数没有闭合，照常检查，由 E102 报告
+
+
+def _verb_end(text, pos):
+    """\\verb 之后（pos 处可有 *）的定界内容结束后的位置；\\verb 不能跨行，找不到结束符时到行尾。"""
+    if text.startswith("*", pos):
+        pos += 1
+    if pos >= len(text) or text[pos] in " \n":
+        return pos
+    close = text.find(text[pos], pos + 1)
+    newline = text.find("\n", pos)
+    if close < 0 or 0 <= newline < close:
+        return len(text) if newline < 0 else newline
+    return close + 1
+
+
+def lint_latex(text, field="latex", in_hbox=False):
+    """检查一段 LaTeX，返回 [Issue]。in_hbox=True 表示这段内容会被放进 \\hbox{}。"""
+    issues = []
+    if not text:
+        return issues
+    line = 1
+    math = None          # 当前数学模式的开启记号：'$'、'$$'、'\\('、'\\[' 或环境名
+    math_line = 0
+    braces = []          # 未闭合的 { 所在行
+    envs = []            # [(环境名, 行)]
+    skip_until = -1     # 注释、\\verb 和按原样使用的参数在此位置之前结束
+
+    def add(code, message, at_line=None):
+        issues.append(Issue(field, at_line or line, code, message))
+
+    for match in TOKEN_PATTERN.finditer(text):
+        token = match.group(0)
+        if match.start() < skip_until:
+            if token == "\n":
+                line += 1
+            continue
+        if token == "\n":
+            line += 1
+        elif token == "%":
+            add("E107", "未转义的 %，同一行后面的内容会被当作注释（应写成 \\%）")
+            newline = text.find("\n", match.end())
+            skip_until = len(text) if newline < 0 else newline
+        elif token in VERBATIM_ARG_COMMANDS:
+            skip_until = _verbatim_arg_end(text, match.end())
+        elif token == "\\verb":
+            skip_until = _verb_end(text, match.end())
+        elif token == "{":
+            braces.append(line)
+        elif token == "}":
+            if braces:
+                braces.pop()
+            else:
+                add("E102", "多余的 }")
+        elif token in ("$", "$$"):
+            if math is None:
+                math, math_line = token, line
+                if token == "$$" and in_hbox:
+                    add("E201", "\\hbox 中不能使用行间公式 $$...$$（改用行内 $...$ 或换用不含 \\hbox 的版式）")
+            elif math == token:
+                math = None
+            else:
+                add("E101", f"数学定界符不匹配：第 {math_line} 行以 {math} 开始，这里是 {token}")
+                math = None
+        elif token in ("\\(", "\\["):
+            if math is not None:
+                add("E101", f"在数学模式中（第 {math_line} 行的 {math}）又出现 {token}")
+            math, math_line = token, line
+            if token == "\\[" and in_hbox:
+                add("E201", "\\hbox 中不能使用行间公式 \\[...\\]")
+        elif token in CLOSERS:
+            if math != CLOSERS[token]:
+                add("E101", f"{token} 没有对应的 {CLOSERS[token]}")
+            math = None
+        elif match.group(1) is not None:
+            name = match.group(1).strip()
+            if token.startswith("\\begin"):
+                envs.append((name, line))
+                if name in MATH_ENVS and math is None:
+                    math, math_line = name, line
+                if in_hbox and (name in DISPLAY_ENVS or name in VERTICAL_ENVS):
+                    add("E201", f"\\hbox 中不能使用 {name} 环境")
+            else:
+                if not envs:
+                    add("E103", f"\\end{{{name}}} 没有对应的 \\begin")
+                elif envs[-1][0] != name:
+                    add("E103", f"\\end{{{name}}} 与第 {envs[-1][1]} 行的 \\begin{{{envs[-1][0]}}} 不匹配")
+                    envs.pop()
+                else:
+                    envs.pop()
+                if math == name:
+                    math = None
+        elif token == "&":
+            if not any(env in ALIGN_ENVS for env, _ in envs):
+                add("E104", "对齐环境之外的 &（应写成 \\&）")
+        elif token == "#":
+            add("E105", "未转义的 #（应写成 \\#）")
+        elif token in ("_", "^"):
+            if math is None:
+                add("E106", f"数学模式之外的 {token}（应放进 $...$ 或写成 \\{token}）")
+
+    if math is not None:
+        add("E101", f"第 {math_line} 行开始的数学模式 {math} 没有闭合", math_line)
+    for open_line in braces:
+        add("E102", "{ 没有闭合", open_line)
+    for name, open_line in envs:
+        add("E103", f"\\begin{{{name}}} 没有对应的 \\end", open_line)
+    return issues
+
+
+def lint_question(content_latex, answer_md=None, analysis_md=None):
+    """保存一道题之前的检查，返回 [Issue]。
+
+    题干按 mvp 版式放进 \\hbox 检查。答案、解析是 Markdown，检查后台任务（materialize_latex.py）
+    转换出的 LaTeX；无法转换（如没有 pypandoc）时检查原文，这时构建试卷会直接使用原文。
+    """
+    from materialize_latex import md_to_latex_many
+
+    issues = lint_latex(content_latex, "题干", QUESTION_IN_HBOX)
+    converted = md_to_latex_many([answer_md, analysis_md])
+    for field, md_text, (latex, _) in zip(("答案", "解析"), (answer_md, analysis_md), converted):
+        issues += lint_latex(md_text if latex is None else latex, field)
+    return issues
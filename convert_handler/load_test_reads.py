@@ -0,0 +1,191 @@
+"""读路径压测：同步（psycopg2 + 线程）vs 异步（asyncpg + 协程）。
+
+模拟 N 个并发会话，每个会话重复若干轮“打开题库浏览页”的查询序列：
+  taxonomy  加载完整知识体系快照
+  kp_counts 当前过滤条件下各知识点题数
+  browse    当前页（keyset 分页，只取摘要列）+ 规划器估算总数
+  preview   依次取当前页前 3 题的完整内容（相当于展开 3 题）
+同步路径每个会话一个线程，共用 db.create_pool() 的连接池；异步路径每个会话一个协程，共用
+db_async.create_async_pool() 的连接池。两边的连接池参数和 SQL 语句完全相同，最后输出各操作的延迟分位数。
+
+需要本地 PostgreSQL 中已有题库数据（可先用 bench_search.py 或真实数据），连接配置见 db.py。
+
+用法: python convert_handler/load_test_reads.py [--sessions 20] [--rounds 10] [--pool-size 5] [--max-overflow 10]
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from db import create_pool, load_config
+from db_async import (
+    create_async_pool, estimate_question_count_async, fetch_question_page_async, fetch_question_preview_async,
+    knowledge_point_counts_async, load_taxonomy_async,
+)
+from question_queries import (
+    build_question_filters, explain_count_sql, knowledge_point_counts_stmt, plan_rows, question_page_stmt,
+    question_preview_stmt,
+)
+from taxonomy import load_taxonomy
+
+PAGE_SIZE = 10
+PREVIEWS_PER_PAGE = 3
+SPECS = [
+    {},
+    {"difficulty": (3, 5)},
+    {"quality": (4, 5)},
+    {"keyword": "函数"},
+    {"keyword": "最大值"},
+    {"q_type": "single_choice"},
+    {"q_type": "single_choice", "difficulty": (2, 4)},
+]
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return float("nan")
+    k = (len(sorted_values) - 1) * p / 100
+    lo, hi = int(k), min(int(k) + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+class Timings:
+    def __init__(self):
+        self.samples = defaultdict(list)
+
+    def add(self, op, seconds):
+        self.samples[op].append(seconds * 1000)
+
+
+# ===============================
+# 同步路径
+# ===============================
+def sync_session(engine, rounds, seed, timings):
+    rng = random.Random(seed)
+    for _ in range(rounds):
+        spec = rng.choice(SPECS)
+        filters = build_question_filters(spec)
+
+        t0 = time.perf_counter()
+        conn = engine.raw_connection()
+        try:
+            load_taxonomy(conn)
+        finally:
+            conn.close()
+        timings.add("taxonomy", time.perf_counter() - t0)
+
+        t0 = time.perf_counter()
+        with engine.connect() as conn:
+            conn.execute(knowledge_point_counts_stmt(spec)).all()
+        timings.add("kp_counts", time.perf_counter() - t0)
+
+        t0 = time.perf_counter()
+        with engine.connect() as conn:
+            ids = [r.id for r in conn.execute(question_page_stmt(filters, PAGE_SIZE)).all()[:PAGE_SIZE]]
+        sql, params = explain_count_sql(spec, engine.dialect)
+        with engine.connect() as conn:
+            plan_rows(conn.exec_driver_sql(sql, params).scalar())
+        timings.add("browse", time.perf_counter() - t0)
+
+        for question_id in ids[:PREVIEWS_PER_PAGE]:
+            t0 = time.perf_counter()
+            with engine.connect() as conn:
+                conn.execute(question_preview_stmt(question_id)).first()
+            timings.add("preview", time.perf_counter() - t0)
+
+
+def run_sync(config, sessions, rounds):
+    engine = create_pool(config)
+    timings = Timings()
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=sessions) as pool:
+        futures = [pool.submit(sync_session, engine, rounds, i, timings) for i in range(sessions)]
+        for f in futures:
+            f.result()
+    elapsed = time.perf_counter() - t0
+    engine.dispose()
+    return timings, elapsed
+
+
+# ===============================
+# 异步路径
+# ===============================
+async def async_session(engine, rounds, seed, timings):
+    rng = random.Random(seed)
+    for _ in range(rounds):
+        spec = rng.choice(SPECS)
+
+        t0 = time.perf_counter()
+        await load_taxonomy_async(engine)
+        timings.add("taxonomy", time.perf_counter() - t0)
+
+        t0 = time.perf_counter()
+        await knowledge_point_counts_async(engine, spec)
+        timings.add("kp_counts", time.perf_counter() - t0)
+
+        t0 = time.perf_counter()
+        (rows, _), _ = await asyncio.gather(
+            fetch_question_page_async(engine, spec, PAGE_SIZE),
+            estimate_question_count_async(engine, spec),
+        )
+        timings.add("browse", time.perf_counter() - t0)
+
+        for row in rows[:PREVIEWS_PER_PAGE]:
+            t0 = time.perf_counter()
+            await fetch_question_preview_async(engine, row.id)
+            timings.add("preview", time.perf_counter() - t0)
+
+
+async def run_async_main(config, sessions, rounds):
+    engine = create_async_pool(config)
+    timings = Timings()
+    t0 = time.perf_counter()
+    await asyncio.gather(*(async_session(engine, rounds, i, timings) for i in range(sessions)))
+    elapsed = time.perf_counter() - t0
+    await engine.dispose()
+    return timings, elapsed
+
+
+# ===============================
+# 报告
+# ===============================
+def report(results):
+    ops = ["taxonomy", "kp_counts", "browse", "preview"]
+    print(f"\n{'操作':<10}{'路径':<7}{'次数':>7}{'p50':>10}{'p95':>10}{'p99':>10}{'max':>10}{'mean':>10}")
+    for op in ops:
+        for name, (timings, _) in results.items():
+            values = sorted(timings.samples[op])
+            cells = [percentile(values, p) for p in (50, 95, 99)] + [values[-1] if values else float("nan"),
+                                                                     statistics.fmean(values) if values else float("nan")]
+            print(f"{op:<10}{name:<7}{len(values):>7}" + "".join(f"{v:>8.1f}ms" for v in cells))
+    print()
+    for name, (timings, elapsed) in results.items():
+        total = sum(len(v) for v in timings.samples.values())
+        print(f"{name}: 总耗时 {elapsed:.2f}s，{total / elapsed:.0f} 次查询/秒")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=20, help="并发会话数")
+    parser.add_argument("--rounds", type=int, default=10, help="每个会话的轮数")
+    parser.add_argument("--pool-size", type=int, help="覆盖配置中的连接池大小")
+    parser.add_argument("--max-overflow", type=int, help="覆盖配置中的溢出连接数")
+    parser.add_argument("--only", choices=["sync", "async"], help="只跑一条路径")
+    args = parser.parse_args()
+
+    config = load_config()
+    if args.pool_size is not None:
+        config["pool"]["size"] = args.pool_size
+    if args.max_overflow is not None:
+        config["pool"]["max_overflow"] = args.max_overflow
+    print(f"{args.sessions} 个并发会话 × {args.rounds} 轮，连接池 {config['pool']['size']} + {config['pool']['max_overflow']}")
+
+    results = {}
+    if args.only != "async":
+        results["sync"] = run_sync(config, args.sessions, args.rounds)
+    if args.only != "sync":
+        results["async"] = asyncio.run(run_async_main(config, args.sessions, args.rounds))
+    report(results)
@@ -0,0 +1,232 @@
+"""后台任务：把题目的 Markdown 字段预先转换为 LaTeX 并写回 questions 表。
+
+需要 migrations/007_question_latex_renditions.sql。每道题的 content_md / answer / analysis 有一个摘要列
+latex_source_hash（生成列），上次转换时的摘要记在 latex_rendered_hash；两者不同（或有 Markdown 题干却没有
+LaTeX 题干）的题目由部分索引 idx_questions_latex_stale 列出，本任务只处理这些题：
+- content_latex：题干为空或由本任务生成过（content_latex_generated）时才写入，人工编辑的题干不覆盖；
+- answer_latex / analysis_latex：答案、解析的 LaTeX 版本。
+试卷构建（latex_builder/exam_from_db.py）直接读取这些列，不在构建过程中调用 pandoc。
+
+pandoc 每次启动约 10ms，这里把一批字段用分隔段落拼成一个文档、一次转换后再拆开，
+多批之间用线程池并行（pandoc 是子进程，不受 GIL 限制）。写回时核对摘要，转换期间源文本又被修改的题目
+保持待转换状态，下一轮重新处理，因此可以同时运行多个任务实例。
+
+用法: python convert_handler/materialize_latex.py              # 转换全部待转换的题目后退出
+      python convert_handler/materialize_latex.py --watch      # 常驻：LISTEN question_latex_stale，有变更就转换
+      python convert_handler/materialize_latex.py --status     # 查看转换状态
+      python convert_handler/materialize_latex.py --force      # pandoc 升级后全部重新转换
+"""
+import argparse
+import os
+import re
+import select
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from psycopg2 import sql
+from psycopg2.extras import execute_values
+
+import db
+
+# optional libs
+try:
+    import pypandoc
+except Exception:
+    pypandoc = None
+
+# ===============================
+# Config
+# ===============================
+BATCH_SIZE = 100            # 每次 pandoc 调用转换的题目数
+NOTIFY_CHANNEL = "question_latex_stale"
+LISTEN_POLL_SECONDS = 60
+SPLIT_MARKER = "EXAMLATEXSPLITMARKER"
+SPLIT_PATTERN = re.compile(rf"\s*^{SPLIT_MARKER}$\s*", re.M)
+# 在整个文档范围内生效的写法：链接 / 脚注定义（[r]: url、[^1]: ...）和标题（隐式标题引用 [标题]、
+# 标识符去重）。拼成一个文档时会串到别的字段甚至别的题目里，含这些写法的字段单独转换
+DOCUMENT_SCOPED_PATTERN = re.compile(r"\]:|\[\^|^ {0,3}#|^ {0,3}(?:=+|-+)[ \t]*$", re.M)
+
+# 与迁移 007 中部分索引 idx_questions_latex_stale 的条件一致
+STALE_SQL = ("(latex_rendered_hash IS DISTINCT FROM latex_source_hash"
+             " OR (content_latex IS NULL AND content_md IS NOT NULL AND latex_render_error IS NULL))")
+FIELDS = ("content_md", "answer", "analysis")
+
+
+# ===============================
+# Markdown -> LaTeX
+# ===============================
+def md_to_latex(md_text):
+    """与 streamlit_run.py 的 md_to_latex 相同的转换，失败时抛出异常而不是返回原文。"""
+    latex_output = pypandoc.convert_text(md_text, "latex", format="md")
+    return re.sub(r"\\pandocbounded{(.*?)}", r"\1", latex_output, flags=re.DOTALL).strip()
+
+
+def md_to_latex_many(texts):
+    """批量转换：返回与 texts 等长的 [(LaTeX, 错误)]；None 对应 (None, None)，空白文本对应 ("", None)。
+
+    先把字段拼成一个文档一次转换；含链接/脚注定义或标题的字段（DOCUMENT_SCOPED_PATTERN）会影响同一文档
+    中的其他字段，不参与拼接，逐个转换。分隔段落被吞掉（如未闭合的代码块）导致段数不符时，全部逐个转换。
+    """
+    todo = [i for i, text in enumerate(texts) if text and text.strip()]
+    results = [(None if text is None else "", None) for text in texts]
+    batch, single = [], []
+    for i in todo:
+        (single if DOCUMENT_SCOPED_PATTERN.search(texts[i]) else batch).append(i)
+    if len(batch) > 1:
+        try:
+            joined = f"\n\n{SPLIT_MARKER}\n\n".join(texts[i] for i in batch)
+            parts = SPLIT_PATTERN.split(md_to_latex(joined))
+        except Exception:
+            parts = []
+        if len(parts) == len(batch):
+            for i, part in zip(batch, parts):
+                results[i] = (part, None)
+        else:
+            single += batch
+    else:
+        single += batch
+    for i in single:
+        try:
+            results[i] = (md_to_latex(texts[i]), None)
+        except Exception as e:
+            results[i] = (None, str(e).strip()[:500] or type(e).__name__)
+    return results
+
+
+def render_rows(rows):
+    """rows: [(id, 摘要, content_md, answer, analysis)] -> 写回用的 [(id, 摘要, 题干, 答案, 解析, 错误)]。
+
+    题干 LaTeX 为人工编辑时，fetch_stale 取回的 content_md 为 None，不转换也不覆盖。
+    """
+    texts = [text for row in rows for text in row[2:]]
+    converted = md_to_latex_many(texts)
+    out = []
+    for n, (question_id, source_hash, *_) in enumerate(rows):
+        (content, e1), (answer, e2), (analysis, e3) = converted[3 * n:3 * n + 3]
+        errors = [f"{field}: {e}" for field, e in zip(FIELDS, (e1, e2, e3)) if e]
+        out.append((question_id, source_hash, content, answer, analysis, "\n".join(errors) or None))
+    return out
+
+
+# ===============================
+# 读取与写回
+# ===============================
+def fetch_stale(conn, after_id, limit):
+    with conn.cursor() as cur:
+        cur.execute(f"""
+            SELECT id, latex_source_hash,
+                   CASE WHEN content_latex IS NULL OR content_latex_generated THEN content_md END,
+                   answer, analysis
+            FROM questions
+            WHERE {STALE_SQL} AND id > %s ORDER BY id LIMIT %s
+        """, (after_id, limit))
+        rows = cur.fetchall()
+    conn.commit()
+    return rows
+
+
+def write_back(conn, rendered):
+    """只更新摘要仍与转换时一致的题目；题干仅在为空或由本任务生成时覆盖。返回更新的行数。"""
+    with conn.cursor() as cur:
+        execute_values(cur, """
+            UPDATE questions q SET
+                content_latex = CASE WHEN q.content_latex IS NULL OR q.content_latex_generated
+                                     THEN coalesce(v.content, q.content_latex) ELSE q.content_latex END,
+                content_latex_generated = q.content_latex_generated
+                                          OR (q.content_latex IS NULL AND v.content IS NOT NULL),
+                answer_latex = v.answer,
+                analysis_latex = v.analysis,
+                latex_render_error = v.error,
+                latex_rendered_hash = v.source_hash,
+                latex_rendered_at = now()
+            FROM (VALUES %s) AS v (id, source_hash, content, answer, analysis, error)
+            WHERE q.id = v.id AND q.latex_source_hash = v.source_hash
+        """, rendered, template="(%s::integer, %s::text, %s::text, %s::text, %s::text, %s::text)",
+            page_size=len(rendered) or 1)
+        updated = cur.rowcount
+    conn.commit()
+    return updated
+
+
+def materialize(conn, batch_size=BATCH_SIZE, workers=None):
+    """转换全部待转换的题目，返回 (更新的题目数, 失败的题目数)。"""
+    workers = workers or min(8, os.cpu_count() or 1)
+    updated = failed = 0
+    after_id = 0
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while True:
+            rows = fetch_stale(conn, after_id, batch_size * workers)
+            if not rows:
+                break
+            after_id = rows[-1][0]
+            batches = [rows[i:i + batch_size] for i in range(0, len(rows), batch_size)]
+            for rendered in pool.map(render_rows, batches):
+                failed += sum(1 for row in rendered if row[-1])
+                updated += write_back(conn, rendered)
+    return updated, failed
+
+
+def print_status(conn):
+    with conn.cursor() as cur:
+        cur.execute(f"""
+            SELECT count(*), count(*) FILTER (WHERE {STALE_SQL}),
+                   count(*) FILTER (WHERE latex_render_error IS NOT NULL),
+                   count(*) FILTER (WHERE content_latex_generated), max(latex_rendered_at)
+            FROM questions
+        """)
+        total, stale, errors, generated, last = cur.fetchone()
+    conn.rollback()
+    print(f"题目 {total}：待转换 {stale}，转换失败 {errors}，题干由任务生成 {generated}，最近转换 {last or '-'}")
+
+
+def run_once(conn, batch_size, workers):
+    start = time.perf_counter()
+    updated, failed = materialize(conn, batch_size, workers)
+    if updated or failed:
+        print(f"已转换 {updated} 道题，失败 {failed} 道（{time.perf_counter() - start:.2f}s）")
+    return updated, failed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="预先把题目的 Markdown 字段转换为 LaTeX")
+    parser.add_argument("--watch", action="store_true", help="常驻运行，收到变更通知后转换")
+    parser.add_argument("--status", action="store_true", help="只显示转换状态")
+    parser.add_argument("--force", action="store_true", help="全部重新转换（如 pandoc 升级后）")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="每次 pandoc 调用转换的题目数")
+    parser.add_argument("--workers", type=int, help="并行的 pandoc 进程数")
+    parser.add_argument("--schema", help="先在该 schema 中查找表")
+    args = parser.parse_args()
+
+    if pypandoc is None and not args.status:
+        sys.exit("FATAL ERROR: 需要 pypandoc（pip install pypandoc_binary）。")
+
+    conn = db.connect()
+    with conn.cursor() as cur:
+        if args.schema:
+            cur.execute(sql.SQL("SET search_path TO {}, public").format(sql.Identifier(args.schema)))
+        # 本任务写入题干时不把题目标记为人工编辑，也不触发变更通知（见迁移 007 中的触发器）
+        cur.execute("SET exam.materializing = 'on'")
+    conn.commit()
+
+    if args.status:
+        print_status(conn)
+        sys.exit(0)
+    if args.force:
+        with conn.cursor() as cur:
+            cur.execute("UPDATE questions SET latex_rendered_hash = NULL")
+        conn.commit()
+
+    run_once(conn, args.batch_size, args.workers)
+    if args.watch:
+        with conn.cursor() as cur:
+            cur.execute(f"LISTEN {NOTIFY_CHANNEL}")
+        conn.commit()
+        print(f"等待题目变更（LISTEN {NOTIFY_CHANNEL}）...")
+        while True:
+            # 超时也执行一轮，补上漏掉通知的变更
+            if select.select([conn], [], [], LISTEN_POLL_SECONDS) != ([], [], []):
+                conn.poll()
+                del conn.notifies[:]
+            run_once(conn, args.batch_size, args.workers)
+    print_status(conn)
@@ -0,0 +1,65 @@
+"""执行 convert_handler/migrations/ 下的 SQL 迁移。
+
+迁移文件按文件名顺序执行，每个文件一个事务；已执行的文件名记录在
+schema_migrations 表中，重复运行只会执行新增的迁移。
+
+用法: python convert_handler/migrate.py            # 执行全部未执行的迁移
+      python convert_handler/migrate.py --list     # 查看迁移状态
+"""
+import sys
+from contextlib import closing
+from pathlib import Path
+
+import db
+
+MIGRATIONS_DIR = Path(__file__).resolve().parent / "migrations"
+
+
+def pending_migrations(cur):
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            filename   text PRIMARY KEY,
+            applied_at timestamp NOT NULL DEFAULT now()
+        )
+    """)
+    cur.execute("SELECT filename FROM schema_migrations")
+    applied = {row[0] for row in cur.fetchall()}
+    all_files = sorted(MIGRATIONS_DIR.glob("*.sql"))
+    return all_files, applied
+
+
+def run_migrations(conn):
+    with conn.cursor() as cur:
+        all_files, applied = pending_migrations(cur)
+    conn.commit()
+    todo = [p for p in all_files if p.name not in applied]
+    if not todo:
+        print("数据库已是最新，无需迁移。")
+        return
+    for path in todo:
+        print(f"执行迁移: {path.name} ...")
+        try:
+            with conn.cursor() as cur:
+                cur.execute(path.read_text(encoding="utf-8"))
+                cur.execute("INSERT INTO schema_migrations (filename) VALUES (%s)", (path.name,))
+            conn.commit()
+            # 迁移中 RAISE NOTICE 的提示（如回填时未匹配的数据）
+            for notice in conn.notices:
+                print(f"  {notice.strip()}")
+            del conn.notices[:]
+        except Exception as e:
+            conn.rollback()
+            print(f"错误：迁移 {path.name} 失败，已回滚: {e}")
+            raise
+    print(f"✅ 共执行 {len(todo)} 个迁移。")
+
+
+if __name__ == "__main__":
+    with closing(db.connect()) as conn:
+        if "--list" in sys.argv[1:]:
+            with conn.cursor() as cur:
+                all_files, applied = pending_migrations(cur)
+            for p in all_files:
+                print(f"{'[x]' if p.name in applied else '[ ]'} {p.name}")
+        else:
+            run_migrations(conn)
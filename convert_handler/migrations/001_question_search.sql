@@ -0,0 +1,40 @@
+-- 题目全文检索：
+--   search_text  标题 + 题干 Markdown + 题干 LaTeX 的拼接，配合 pg_trgm GIN 索引支持任意子串 ILIKE
+--   search_tsv   simple 分词 + 中文单字/双字切分的 tsvector，用于 pg_trgm 无法加速的 1~2 字关键词
+-- 两列均为 STORED 生成列，INSERT / UPDATE 时由数据库自动维护（需要 PostgreSQL 12+）。
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- 中文按单字和相邻双字切分，其余文本交给 simple 分词器
+CREATE OR REPLACE FUNCTION question_search_tsv(doc text) RETURNS tsvector
+LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+    SELECT to_tsvector('simple', coalesce(doc, '')) || coalesce((
+        SELECT array_to_tsvector(array_agg(DISTINCT substr(run, i, n)))
+        FROM (SELECT m[1] AS run FROM regexp_matches(coalesce(doc, ''), '([一-鿿]+)', 'g') AS m) AS runs,
+             generate_series(1, 2) AS n,
+             generate_series(1, char_length(run)) AS i
+        WHERE i + n - 1 <= char_length(run)
+    ), ''::tsvector)
+$$;
+
+-- 与 question_search_tsv 对应的查询：1~2 个汉字的关键词直接作为一个词元，其余按 simple 分词
+CREATE OR REPLACE FUNCTION question_search_query(q text) RETURNS tsquery
+LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+    SELECT CASE
+        WHEN q ~ '^[一-鿿]{1,2}$' THEN quote_literal(q)::tsquery
+        ELSE plainto_tsquery('simple', q)
+    END
+$$;
+
+ALTER TABLE questions
+    ADD COLUMN IF NOT EXISTS search_text text GENERATED ALWAYS AS (
+        coalesce(title, '') || ' ' || coalesce(content_md, '') || ' ' || coalesce(content_latex, '')
+    ) STORED;
+
+ALTER TABLE questions
+    ADD COLUMN IF NOT EXISTS search_tsv tsvector GENERATED ALWAYS AS (
+        question_search_tsv(coalesce(title, '') || ' ' || coalesce(content_md, '') || ' ' || coalesce(content_latex, ''))
+    ) STORED;
+
+CREATE INDEX IF NOT EXISTS idx_questions_search_text_trgm ON questions USING gin (search_text gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_questions_search_tsv ON questions USING gin (search_tsv);
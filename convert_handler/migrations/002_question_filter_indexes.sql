@@ -0,0 +1,43 @@
+-- 题库浏览过滤面板使用的索引。
+-- 列表统一按 id DESC 做 keyset 分页，因此复合索引都以 id DESC 结尾。
+-- 注意：只有 id 之前的列全部是等值条件时，排序 + LIMIT 才能直接在索引上完成；
+-- 题型+难度范围、只按课程过滤、高质量部分索引不满足这一点，由 009 修正。
+
+-- question_type 改为枚举类型，过滤用等值比较即可走索引（已是枚举时跳过）
+DO $$
+BEGIN
+    IF (SELECT atttypid::regtype::text FROM pg_attribute
+        WHERE attrelid = 'questions'::regclass AND attname = 'question_type') <> 'question_type_enum' THEN
+        ALTER TABLE questions
+            ALTER COLUMN question_type TYPE question_type_enum
+            USING nullif(question_type, '')::question_type_enum;
+    END IF;
+END
+$$;
+
+-- 课程 / 课程+年级 / 课程+年级+章节
+CREATE INDEX IF NOT EXISTS idx_questions_course_grade_chapter
+    ON questions (course_id, grade_id, chapter_id, id DESC);
+
+-- 只按章节过滤（选择了教材章节但未限定课程时）
+CREATE INDEX IF NOT EXISTS idx_questions_chapter
+    ON questions (chapter_id, id DESC);
+
+-- 课程 + 题型
+CREATE INDEX IF NOT EXISTS idx_questions_course_type
+    ON questions (course_id, question_type, id DESC);
+
+-- 题型 + 难度范围
+CREATE INDEX IF NOT EXISTS idx_questions_type_difficulty
+    ON questions (question_type, difficulty, id DESC);
+
+-- 高质量题目（quality >= 4）占比小且最常被筛选，用部分索引
+CREATE INDEX IF NOT EXISTS idx_questions_high_quality
+    ON questions (course_id, difficulty, id DESC)
+    WHERE quality >= 4;
+
+-- 知识点数组的包含 / 相交查询（@> / &&）；003 改用关联表后不再使用，由 010 删除
+CREATE INDEX IF NOT EXISTS idx_questions_knowledge_points
+    ON questions USING gin (knowledge_points);
+
+ANALYZE questions;
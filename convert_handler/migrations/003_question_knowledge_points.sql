@@ -0,0 +1,41 @@
+-- 题目与知识点的关联改为以 knowledge_points.id 为键的关联表。
+-- 知识点改名只需更新 knowledge_points 一行；按知识点查题走 (point_id, question_id) 索引。
+-- questions.knowledge_points 文本数组保留为旧数据，应用不再写入（其 GIN 索引由 010 删除）。
+
+CREATE TABLE IF NOT EXISTS question_knowledge_points (
+    question_id integer NOT NULL REFERENCES questions (id) ON DELETE CASCADE,
+    point_id    integer NOT NULL REFERENCES knowledge_points (id) ON DELETE CASCADE,
+    PRIMARY KEY (question_id, point_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_question_knowledge_points_point
+    ON question_knowledge_points (point_id, question_id);
+
+-- 由旧数组回填：按 point_name 匹配（去除首尾空白）
+INSERT INTO question_knowledge_points (question_id, point_id)
+SELECT DISTINCT q.id, kp.id
+FROM questions q
+CROSS JOIN LATERAL unnest(q.knowledge_points) AS n (name)
+JOIN knowledge_points kp ON kp.point_name = btrim(n.name)
+ON CONFLICT DO NOTHING;
+
+-- 报告无法匹配到知识点表的名称，便于人工补录
+DO $$
+DECLARE
+    unmatched record;
+BEGIN
+    FOR unmatched IN
+        SELECT btrim(n.name) AS name, count(*) AS questions
+        FROM questions q
+        CROSS JOIN LATERAL unnest(q.knowledge_points) AS n (name)
+        LEFT JOIN knowledge_points kp ON kp.point_name = btrim(n.name)
+        WHERE kp.id IS NULL AND btrim(n.name) <> ''
+        GROUP BY 1
+        ORDER BY 2 DESC
+    LOOP
+        RAISE NOTICE '未匹配的知识点: % (% 道题)', unmatched.name, unmatched.questions;
+    END LOOP;
+END
+$$;
+
+ANALYZE question_knowledge_points;
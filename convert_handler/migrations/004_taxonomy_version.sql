@@ -0,0 +1,31 @@
+-- 知识体系（教材/章节/小节/知识点）版本号。
+-- 任何对这几张表的增删改都会通过语句级触发器把 version 加一，
+-- 应用据此判断内存中的知识体系快照是否过期，而不是按固定 TTL 盲目刷新。
+
+CREATE TABLE IF NOT EXISTS taxonomy_version (
+    id         boolean PRIMARY KEY DEFAULT true CHECK (id),  -- 单行表
+    version    bigint NOT NULL DEFAULT 1,
+    updated_at timestamp NOT NULL DEFAULT now()
+);
+INSERT INTO taxonomy_version (id) VALUES (true) ON CONFLICT DO NOTHING;
+
+CREATE OR REPLACE FUNCTION bump_taxonomy_version() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    UPDATE taxonomy_version SET version = version + 1, updated_at = now();
+    RETURN NULL;
+END
+$$;
+
+DO $$
+DECLARE
+    t text;
+BEGIN
+    FOREACH t IN ARRAY ARRAY['textbooks', 'chapters', 'sections', 'knowledge_points', 'sections_knowledge_points'] LOOP
+        EXECUTE format('DROP TRIGGER IF EXISTS trg_%1$s_taxonomy_version ON %1$I', t);
+        EXECUTE format('CREATE TRIGGER trg_%1$s_taxonomy_version
+                            AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON %1$I
+                            FOR EACH STATEMENT EXECUTE FUNCTION bump_taxonomy_version()', t);
+    END LOOP;
+END
+$$;
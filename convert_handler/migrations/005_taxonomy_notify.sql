@@ -0,0 +1,14 @@
+-- 知识体系变更时除了递增 taxonomy_version，还通过 NOTIFY 通知正在 LISTEN 的应用进程，
+-- 应用无需每次重跑都查询版本号即可得知缓存已过期（通知在事务提交时发出）。
+
+CREATE OR REPLACE FUNCTION bump_taxonomy_version() RETURNS trigger
+LANGUAGE plpgsql AS $$
+DECLARE
+    new_version bigint;
+BEGIN
+    UPDATE taxonomy_version SET version = version + 1, updated_at = now()
+    RETURNING version INTO new_version;
+    PERFORM pg_notify('taxonomy_changed', new_version::text);
+    RETURN NULL;
+END
+$$;
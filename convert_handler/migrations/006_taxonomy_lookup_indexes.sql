@@ -0,0 +1,16 @@
+-- 知识库浏览器按需加载：按父节点 ID 取子节点，以及按名称搜索节点。
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- 子节点查询（WHERE 父 ID = ? ORDER BY name）
+CREATE INDEX IF NOT EXISTS idx_chapters_textbook_name ON chapters (textbook_id, name);
+CREATE INDEX IF NOT EXISTS idx_sections_chapter_name ON sections (chapter_id, name);
+-- sections_knowledge_points 的主键 (section_id, point_id) 已覆盖按小节取知识点；
+-- 搜索命中知识点后需要反查所属小节
+CREATE INDEX IF NOT EXISTS idx_sections_knowledge_points_point ON sections_knowledge_points (point_id);
+
+-- 名称子串搜索（ILIKE '%关键词%'）
+CREATE INDEX IF NOT EXISTS idx_textbooks_name_trgm ON textbooks USING gin (name gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_chapters_name_trgm ON chapters USING gin (name gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_sections_name_trgm ON sections USING gin (name gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_knowledge_points_name_trgm ON knowledge_points USING gin (point_name gin_trgm_ops);
@@ -0,0 +1,60 @@
+-- 题目文本字段的 LaTeX 版本，由后台任务 materialize_latex.py 预先转换并保存，
+-- 生成试卷时直接读取，不再在构建过程中调用 pandoc。
+--   content_latex            题干 LaTeX；content_latex_generated 为 true 表示由后台任务从 content_md 生成，
+--                            content_md 变化时会重新生成；人工编辑过的题干（false）不会被覆盖
+--   answer_latex / analysis_latex   答案、解析（Markdown）的 LaTeX 版本，总是由后台任务生成
+--   latex_source_hash        content_md / answer / analysis 的摘要（STORED 生成列）
+--   latex_rendered_hash      上次转换时的 latex_source_hash；两者不同即需要重新转换
+--   latex_render_error       上次转换失败的原因；源文本再次变化前不会重试
+
+ALTER TABLE questions
+    ADD COLUMN IF NOT EXISTS content_latex_generated boolean NOT NULL DEFAULT false,
+    ADD COLUMN IF NOT EXISTS answer_latex text,
+    ADD COLUMN IF NOT EXISTS analysis_latex text,
+    ADD COLUMN IF NOT EXISTS latex_rendered_hash text,
+    ADD COLUMN IF NOT EXISTS latex_rendered_at timestamp,
+    ADD COLUMN IF NOT EXISTS latex_render_error text;
+
+ALTER TABLE questions
+    ADD COLUMN IF NOT EXISTS latex_source_hash text GENERATED ALWAYS AS (
+        md5(coalesce(content_md, '') || E'\x1f' || coalesce(answer, '') || E'\x1f' || coalesce(analysis, ''))
+    ) STORED;
+
+-- 待转换的题目：源文本变化过，或有 Markdown 题干却没有 LaTeX 题干（转换失败的除外）。部分索引只包含这些行，
+-- 题库全部转换完成后索引几乎为空，后台任务每次查询都很快。
+CREATE INDEX IF NOT EXISTS idx_questions_latex_stale ON questions (id)
+    WHERE latex_rendered_hash IS DISTINCT FROM latex_source_hash
+       OR (content_latex IS NULL AND content_md IS NOT NULL AND latex_render_error IS NULL);
+
+-- 人工修改题干 LaTeX 后，该题不再由后台任务生成（后台任务写入时设置 exam.materializing = on）
+CREATE OR REPLACE FUNCTION keep_manual_content_latex() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF NEW.content_latex IS DISTINCT FROM OLD.content_latex
+       AND coalesce(current_setting('exam.materializing', true), '') <> 'on' THEN
+        NEW.content_latex_generated := false;
+    END IF;
+    RETURN NEW;
+END
+$$;
+
+DROP TRIGGER IF EXISTS trg_questions_manual_content_latex ON questions;
+CREATE TRIGGER trg_questions_manual_content_latex
+    BEFORE UPDATE OF content_latex ON questions
+    FOR EACH ROW EXECUTE FUNCTION keep_manual_content_latex();
+
+-- 题目文本变化时通知正在 LISTEN 的后台任务（通知在事务提交时发出；后台任务自己的写入不通知）
+CREATE OR REPLACE FUNCTION notify_question_latex_stale() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF coalesce(current_setting('exam.materializing', true), '') <> 'on' THEN
+        PERFORM pg_notify('question_latex_stale', '');
+    END IF;
+    RETURN NULL;
+END
+$$;
+
+DROP TRIGGER IF EXISTS trg_questions_latex_stale ON questions;
+CREATE TRIGGER trg_questions_latex_stale
+    AFTER INSERT OR UPDATE OF content_md, content_latex, answer, analysis ON questions
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_question_latex_stale();
@@ -0,0 +1,29 @@
+-- 自动组卷（latex_builder/exam_assembler.py）用到的表和索引。
+--   exam_papers / exam_paper_questions  已组好的试卷及其题目，组卷时排除最近若干天内用过的题
+--   idx_questions_assembly              候选题查询：课程 + 题型 + 质量下限，难度放在 INCLUDE 中，
+--                                       只取 ID 和难度时可以走 index-only scan
+
+CREATE TABLE IF NOT EXISTS exam_papers (
+    id         serial PRIMARY KEY,
+    name       text NOT NULL,
+    spec       jsonb NOT NULL DEFAULT '{}',   -- 组卷条件，便于日后复现
+    seed       integer,
+    created_at timestamp NOT NULL DEFAULT now()
+);
+
+CREATE TABLE IF NOT EXISTS exam_paper_questions (
+    paper_id    integer NOT NULL REFERENCES exam_papers (id) ON DELETE CASCADE,
+    question_id integer NOT NULL REFERENCES questions (id) ON DELETE CASCADE,
+    position    integer NOT NULL,
+    PRIMARY KEY (paper_id, question_id)
+);
+
+-- 最近的试卷：按时间取试卷，再按主键前缀取题目
+CREATE INDEX IF NOT EXISTS idx_exam_papers_created_at ON exam_papers (created_at);
+-- 某道题被哪些试卷用过（删除题目时的外键检查也用到）
+CREATE INDEX IF NOT EXISTS idx_exam_paper_questions_question ON exam_paper_questions (question_id);
+
+CREATE INDEX IF NOT EXISTS idx_questions_assembly
+    ON questions (course_id, question_type, quality) INCLUDE (difficulty);
+
+ANALYZE questions;
@@ -0,0 +1,22 @@
+-- 修正 002 中不能直接支撑 ORDER BY id DESC LIMIT 的列表索引。
+-- 复合索引里 id DESC 之前的列必须全部是等值条件，索引顺序才等于 id 顺序；
+-- 中间夹着范围条件（difficulty BETWEEN ...）或未参与过滤的列（只按课程过滤时的
+-- grade_id / chapter_id）时，规划器只能先取全部匹配行再排序，或者沿主键倒序扫描
+-- 再逐行过滤——数据量大时两者都很慢。
+
+-- 只按课程过滤
+CREATE INDEX IF NOT EXISTS idx_questions_course
+    ON questions (course_id, id DESC);
+
+-- 题型 + 难度范围：难度放进 INCLUDE，在索引上过滤，不打断 id 顺序
+DROP INDEX IF EXISTS idx_questions_type_difficulty;
+CREATE INDEX IF NOT EXISTS idx_questions_type
+    ON questions (question_type, id DESC) INCLUDE (difficulty);
+
+-- 课程 + 高质量：去掉 difficulty 列（同名重建）
+DROP INDEX IF EXISTS idx_questions_high_quality;
+CREATE INDEX idx_questions_high_quality
+    ON questions (course_id, id DESC)
+    WHERE quality >= 4;
+
+ANALYZE questions;
@@ -0,0 +1,5 @@
+-- 题目知识点已改用 question_knowledge_points 关联表（003），questions.knowledge_points
+-- 文本数组不再读写；它上面的 GIN 索引只会拖慢题目的写入和 VACUUM，删除。
+-- 数组列本身仍保留为旧数据。
+
+DROP INDEX IF EXISTS idx_questions_knowledge_points;
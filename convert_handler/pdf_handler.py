@@ -6,79 +6,75 @@ import shutil
 from pathlib import Path
 from wand.image import Image as WandImage  # 需要安装 ImageMagick + wand
 
+from image_derivatives import generate_derivatives_for_files
+from image_store import record_references, rel_markdown_path, store_image
+
 """将 PDF 按题号/标签切分成 Markdown，并导出图片。
 
 输出结构：
 - 小 md：项目根目录，命名 word_part_<pdf名>_<序号>[_<标签>].md
-- 图片：images/<pdf名>/ 下，尽量统一为 png。
+- 图片：内容寻址图片库 images/by-hash/ 下，尽量统一为 png（见 image_store.py）；
+  派生图与 manifest.json 见 image_derivatives.py。
 """
 
 # ===============================
 # 配置（路径、目录）
 # ===============================
 PROJECT_ROOT = Path(__file__).resolve().parent.parent  # convert_handler 的上一级
-IMAGES_SUBFOLDER = "images"
-
-if len(sys.argv) < 2:
-    print("用法: python convert_handler/pdf_handler.py <pdf文件路径>")
-    sys.exit(1)
-
-PDF_PATH = Path(sys.argv[1])
-if not PDF_PATH.exists():
-    print(f"错误：未找到文件: {PDF_PATH}")
-    sys.exit(1)
-
-DOC_BASE_NAME = PDF_PATH.stem
 PARTS_OUTPUT_DIR = PROJECT_ROOT
-IMG_DIR_PATH = PROJECT_ROOT / IMAGES_SUBFOLDER / DOC_BASE_NAME
-IMG_DIR_PATH.mkdir(parents=True, exist_ok=True)
+
 
 # ===============================
-# 1️⃣ 打开 PDF 并提取文本 + 图片（保存到 images/<pdf名>/）
+# 1️⃣ 打开 PDF 并提取文本 + 图片（按内容入库到 images/by-hash/）
 # ===============================
-pages_content = []
-pos_counter = 0
-
-doc = fitz.open(str(PDF_PATH))
-
-for page_index in range(len(doc)):
-    page = doc[page_index]
-    page_text = page.get_text()  # 获取页面文本
-    page_images = []
-
-    image_list = page.get_images(full=True)
-    for img_idx, img in enumerate(image_list, start=1):
-        xref = img[0]
-        base_image = doc.extract_image(xref)
-        image_bytes = base_image["image"]
-        img_name = f"{DOC_BASE_NAME}_p{page_index+1}_{img_idx}.png"
-        img_path = IMG_DIR_PATH / img_name
-        try:
-            with WandImage(blob=image_bytes) as wi:
-                wi.format = 'png'
-                wi.save(filename=str(img_path))
-        except Exception:
-            # 若转换失败，尝试直接写入原始字节（可能非 png），保证不阻断流程
+def extract_pages(pdf_path, doc_base_name, work_dir):
+    """返回 (各页内容 [{start, end, text, images}], {原始图片名: 库内相对路径})。"""
+    pages_content = []
+    pos_counter = 0
+    image_refs = {}  # {原始图片名: 库内相对路径}
+
+    doc = fitz.open(str(pdf_path))
+
+    for page_index in range(len(doc)):
+        page = doc[page_index]
+        page_text = page.get_text()  # 获取页面文本
+        page_images = []
+
+        image_list = page.get_images(full=True)
+        for img_idx, img in enumerate(image_list, start=1):
+            xref = img[0]
+            base_image = doc.extract_image(xref)
+            image_bytes = base_image["image"]
+            img_name = f"{doc_base_name}_p{page_index+1}_{img_idx}.png"
+            img_path = work_dir / img_name
             try:
-                with open(img_path, "wb") as f:
-                    f.write(image_bytes)
+                with WandImage(blob=image_bytes) as wi:
+                    wi.format = 'png'
+                    wi.save(filename=str(img_path))
             except Exception:
-                continue
-        page_images.append(f"{IMAGES_SUBFOLDER}/{DOC_BASE_NAME}/{img_name}")
-
-    pages_content.append({
-        'start': pos_counter,
-        'end': pos_counter + len(page_text),
-        'text': page_text,
-        'images': page_images
-    })
-    pos_counter += len(page_text) + 1
+                # 若转换失败，尝试直接写入原始字节（可能非 png），保证不阻断流程
+                try:
+                    with open(img_path, "wb") as f:
+                        f.write(image_bytes)
+                except Exception:
+                    continue
+            # 同一 xref 在多页重复出现（如页眉 logo）时，库里只保留一份
+            stored_rel = rel_markdown_path(store_image(img_path, PROJECT_ROOT), PROJECT_ROOT)
+            image_refs[img_name] = stored_rel
+            page_images.append(stored_rel)
+
+        pages_content.append({
+            'start': pos_counter,
+            'end': pos_counter + len(page_text),
+            'text': page_text,
+            'images': page_images
+        })
+        pos_counter += len(page_text) + 1
+    return pages_content, image_refs
 
 # ===============================
 # 2️⃣ 按 doc_handler 的规则切分文本（支持 > 前缀、答案/详解标签等）
 # ===============================
-all_text = "\n".join([p['text'] for p in pages_content])
-
 label_pattern = re.compile(
     r"(?m)^\s*(?:>\s*)*"
     r"("  # 捕获用于命名的标签文本
@@ -111,8 +107,6 @@ def parse_with_positions(text: str):
         p['text'] = text[p['start']:p['end']].strip()
     return parts
 
-parts = parse_with_positions(all_text)
-
 # ===============================
 # 3️⃣ 将题目和对应图片匹配并写入 Markdown（命名与 doc_handler 一致）
 # ===============================
@@ -127,29 +121,62 @@ def sanitize_label(label: str | None) -> str:
     s = re.sub(r"\s+", "_", s)
     return s
 
-for i, part in enumerate(parts, 1):
-    part_text = part['text']
-    part_start = part['start']
-    part_end = part['end']
-
-    # 匹配题目跨页的图片（按范围重叠）
-    part_images = []
-    for page in pages_content:
-        if not (part_end <= page['start'] or part_start >= page['end']):
-            part_images.extend(page['images'])
-
-    # 插入图片 Markdown（使用根目录相对路径 images/<pdf名>/...）
-    for img_rel in part_images:
-        part_text += f"\n\n![image]({img_rel})\n"
-
-    # 生成文件名并保存到项目根目录
-    label_fragment = sanitize_label(part.get('label'))
-    if label_fragment:
-        filename = PARTS_OUTPUT_DIR / f"word_part_{DOC_BASE_NAME}_{i}_{label_fragment}.md"
-    else:
-        filename = PARTS_OUTPUT_DIR / f"word_part_{DOC_BASE_NAME}_{i}.md"
-    with open(filename, "w", encoding="utf-8") as f:
-        f.write(part_text)
-
-print(f"✅ PDF 按题号/标签切分完成。小 md 输出到: {PARTS_OUTPUT_DIR}")
-print(f"✅ 图片已导出到: {IMG_DIR_PATH}")
+def write_parts(parts, pages_content, doc_base_name):
+    for i, part in enumerate(parts, 1):
+        part_text = part['text']
+        part_start = part['start']
+        part_end = part['end']
+
+        # 匹配题目跨页的图片（按范围重叠）
+        part_images = []
+        for page in pages_content:
+            if not (part_end <= page['start'] or part_start >= page['end']):
+                part_images.extend(page['images'])
+
+        # 插入图片 Markdown（使用根目录相对路径 images/by-hash/...）
+        for img_rel in part_images:
+            part_text += f"\n\n![image]({img_rel})\n"
+
+        # 生成文件名并保存到项目根目录
+        label_fragment = sanitize_label(part.get('label'))
+        if label_fragment:
+            filename = PARTS_OUTPUT_DIR / f"word_part_{doc_base_name}_{i}_{label_fragment}.md"
+        else:
+            filename = PARTS_OUTPUT_DIR / f"word_part_{doc_base_name}_{i}.md"
+        with open(filename, "w", encoding="utf-8") as f:
+            f.write(part_text)
+
+
+# ===============================
+# 4️⃣ 执行：切分、写入 Markdown，记录图片引用并生成缩略图 / WebP 派生图（原图保留给试卷构建）
+# ===============================
+def main():
+    if len(sys.argv) < 2:
+        print("用法: python convert_handler/pdf_handler.py <pdf文件路径>")
+        sys.exit(1)
+
+    pdf_path = Path(sys.argv[1])
+    if not pdf_path.exists():
+        print(f"错误：未找到文件: {pdf_path}")
+        sys.exit(1)
+
+    doc_base_name = pdf_path.stem
+    # 图片先导出到临时工作目录，再按内容哈希移入图片库
+    work_dir = PROJECT_ROOT / f".pdf_{doc_base_name}"
+    work_dir.mkdir(parents=True, exist_ok=True)
+
+    pages_content, image_refs = extract_pages(pdf_path, doc_base_name, work_dir)
+    all_text = "\n".join([p['text'] for p in pages_content])
+    write_parts(parse_with_positions(all_text), pages_content, doc_base_name)
+
+    record_references(PROJECT_ROOT, doc_base_name, image_refs.items())
+    generate_derivatives_for_files(sorted({PROJECT_ROOT / p for p in image_refs.values()}))
+    shutil.rmtree(work_dir, ignore_errors=True)
+
+    print(f"✅ PDF 按题号/标签切分完成。小 md 输出到: {PARTS_OUTPUT_DIR}")
+    print(f"✅ 图片已入库: {len(image_refs)} 个引用，{len(set(image_refs.values()))} 个不同文件")
+
+
+# 生成派生图时可能启动进程池：Windows（spawn）下子进程会重新导入本脚本，执行入口必须放在 __main__ 中
+if __name__ == "__main__":
+    main()
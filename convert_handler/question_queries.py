@@ -0,0 +1,171 @@
+"""题库浏览用到的 ORM 模型与查询语句，同步（psycopg2）与异步（asyncpg）两条访问路径共用。
+
+这里只构造 SQLAlchemy 语句，不持有连接；执行交给调用方：
+streamlit_run_bak9.py 用 db.get_engine() 的同步连接池，db_async.py 用 asyncpg 连接池。
+"""
+import json
+import re
+
+from sqlalchemy import (
+    Column, Integer, Text, String, TIMESTAMP, ARRAY, func, and_, SmallInteger, select, Computed, desc,
+    Table, ForeignKey, cast
+)
+from sqlalchemy.dialects.postgresql import ENUM, JSONB, TSVECTOR
+from sqlalchemy.orm import declarative_base, deferred, relationship
+
+Base = declarative_base()
+
+question_knowledge_points_table = Table('question_knowledge_points', Base.metadata,
+    Column('question_id', Integer, ForeignKey('questions.id', ondelete='CASCADE'), primary_key=True),
+    Column('point_id', Integer, ForeignKey('knowledge_points.id', ondelete='CASCADE'), primary_key=True)
+)
+
+class KnowledgePoint(Base):
+    __tablename__ = "knowledge_points"
+    id = Column(Integer, primary_key=True)
+    point_name = Column(String, unique=True)
+
+SEARCH_DOC_SQL = "coalesce(title, '') || ' ' || coalesce(content_md, '') || ' ' || coalesce(content_latex, '')"
+
+# questions.question_type 在数据库中是枚举（migrations/002_question_filter_indexes.sql）。
+# asyncpg 会把字符串参数显式标成 VARCHAR，枚举列与 VARCHAR 没有 = 运算符，比较时要把参数转换成枚举。
+QUESTION_TYPE_ENUM = ENUM(name="question_type_enum", create_type=False)
+
+class Question(Base):
+    __tablename__ = "questions"
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    title = Column(Text)
+    content_md = Column(Text)
+    content_latex = Column(Text)
+    course_id = Column(Integer)
+    grade_id = Column(Integer)
+    chapter_id = Column(Integer)
+    knowledge_points = Column(ARRAY(Text))  # 旧字段，已由 question_knowledge_points 关联表取代，不再写入
+    question_type = Column(String(50))
+    difficulty = Column(Integer)
+    answer = Column(Text)
+    analysis = Column(Text)
+    extra_metadata = Column("metadata", JSONB)
+    quality = Column(SmallInteger)
+    created_at = Column(TIMESTAMP, server_default=func.now())
+    updated_at = Column(TIMESTAMP, server_default=func.now(), onupdate=func.now())
+    # 检索用生成列（见 migrations/001_question_search.sql），由数据库维护，默认不加载
+    search_text = deferred(Column(Text, Computed(SEARCH_DOC_SQL, persisted=True)))
+    search_tsv = deferred(Column(TSVECTOR, Computed(f"question_search_tsv({SEARCH_DOC_SQL})", persisted=True)))
+    linked_knowledge_points = relationship("KnowledgePoint", secondary=question_knowledge_points_table)
+
+# ===============================
+# 过滤条件
+# ===============================
+# 与 migrations/001_question_search.sql 中 question_search_tsv 索引的单字/双字词元一致
+SHORT_CJK_KEYWORD = re.compile(r"[\u4e00-\u9fff]{1,2}")
+
+def keyword_filter(keyword):
+    """关键词检索（标题/题干 Markdown/题干 LaTeX）。
+
+    只有 1~2 个汉字的关键词走 search_tsv（按中文单字/双字建的词元索引，pg_trgm 无法加速这么短的关键词）；
+    其余关键词（包括 “x”、“ab” 这类短的 ASCII 关键词，以及中英混排）一律对 search_text 做 ILIKE
+    子串匹配：3 个字符及以上走 pg_trgm 索引，更短的 ASCII 关键词是顺序扫描，但结果与长关键词一致
+    （simple 分词只能整词匹配，会漏掉 “x” 出现在 “x^2” 里这样的子串）。
+    """
+    if not SHORT_CJK_KEYWORD.fullmatch(keyword):
+        escaped = keyword.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        return Question.search_text.ilike(f"%{escaped}%", escape="\\")
+    return Question.search_tsv.op("@@")(func.question_search_query(keyword))
+
+def build_question_filters(spec):
+    """由过滤面板的取值（spec 字典）生成过滤条件。
+
+    各条件与 migrations/002_question_filter_indexes.sql 的索引对应：题型用等值比较，
+    难度/质量取满 1~5 时不加条件，避免无意义的范围谓词干扰索引选择。
+    """
+    filters = []
+    if spec.get("course_id"): filters.append(Question.course_id == spec["course_id"])
+    if spec.get("grade_id"): filters.append(Question.grade_id == spec["grade_id"])
+    if spec.get("chapter_id"): filters.append(Question.chapter_id == spec["chapter_id"])
+    if spec.get("q_type"): filters.append(Question.question_type == cast(spec["q_type"], QUESTION_TYPE_ENUM))
+    for column, key in ((Question.difficulty, "difficulty"), (Question.quality, "quality")):
+        lo, hi = spec.get(key) or (1, 5)
+        if lo > 1: filters.append(column >= lo)
+        if hi < 5: filters.append(column <= hi)
+    if spec.get("keyword"): filters.append(keyword_filter(spec["keyword"]))
+    if spec.get("kps"):
+        # 按知识点 ID 查关联表，走 (point_id, question_id) 索引
+        qkp = question_knowledge_points_table
+        kp_ids = list(spec["kps"])
+        matched = select(qkp.c.question_id).where(qkp.c.point_id.in_(kp_ids))
+        if spec.get("kp_mode") == "all":
+            matched = matched.group_by(qkp.c.question_id).having(func.count() == len(kp_ids))
+        filters.append(Question.id.in_(matched))
+    return filters
+
+# ===============================
+# 查询语句
+# ===============================
+SNIPPET_CHARS = 120
+
+def question_snippet(column, chars=SNIPPET_CHARS):
+    """列表摘要：只截取开头一段（TOAST 大字段按切片读取，不必解压整列），图片语法换成 [图]，空白压成一个空格。"""
+    head = func.substr(column, 1, chars * 4)
+    no_images = func.regexp_replace(head, r"!\[[^\]]*\]\([^)]*\)", "[图]", "g")
+    return func.left(func.regexp_replace(no_images, r"\s+", " ", "g"), chars)
+
+def question_summary_columns():
+    """题库列表只取摘要列；题干、答案、解析、metadata 等大字段由 question_preview_stmt 按需加载。"""
+    return (
+        Question.id, Question.title, Question.course_id, Question.grade_id, Question.chapter_id,
+        Question.question_type, Question.difficulty, Question.quality,
+        question_snippet(Question.content_md).label("snippet"),
+    )
+
+def question_page_stmt(filters, page_size, before_id=None):
+    """按 id 倒序做 keyset 分页：只取 id < before_id 的前 page_size + 1 条（多取一条判断是否有下一页）。
+
+    与 OFFSET 不同，翻到多深都只走主键索引扫描 page_size + 1 行。结果行只含摘要列。
+    """
+    conditions = list(filters)
+    if before_id is not None: conditions.append(Question.id < before_id)
+    stmt = select(*question_summary_columns())
+    if conditions: stmt = stmt.where(and_(*conditions))
+    return stmt.order_by(Question.id.desc()).limit(page_size + 1)
+
+def knowledge_point_counts_stmt(spec):
+    """在当前过滤条件下统计每个知识点的题目数：[(知识点 ID, 名称, 题数)]。"""
+    qkp = question_knowledge_points_table
+    stmt = (
+        select(KnowledgePoint.id, KnowledgePoint.point_name, func.count().label("n"))
+        .select_from(qkp)
+        .join(KnowledgePoint, KnowledgePoint.id == qkp.c.point_id)
+        .join(Question, Question.id == qkp.c.question_id)
+        .group_by(KnowledgePoint.id, KnowledgePoint.point_name)
+        .order_by(desc("n"), KnowledgePoint.point_name)
+    )
+    filters = build_question_filters(spec)
+    if filters: stmt = stmt.where(and_(*filters))
+    return stmt
+
+def question_preview_stmt(question_id):
+    """单题的完整内容（题干、答案、解析等大字段）。"""
+    return select(
+        Question.id, Question.title, Question.content_md, Question.content_latex,
+        Question.answer, Question.analysis, Question.extra_metadata,
+    ).where(Question.id == question_id)
+
+def explain_count_sql(spec, dialect):
+    """返回 (EXPLAIN 语句, 驱动参数)，用查询规划器估算的行数代替 count(*)。
+
+    EXPLAIN 不能直接套在 SQLAlchemy 语句上，这里先按目标驱动编译，再交给 exec_driver_sql 执行；
+    asyncpg 使用 $1 位置参数，psycopg2 使用命名参数。
+    """
+    stmt = select(Question.id)
+    filters = build_question_filters(spec)
+    if filters: stmt = stmt.where(and_(*filters))
+    compiled = stmt.compile(dialect=dialect, compile_kwargs={"render_postcompile": True})
+    params = compiled.params
+    if compiled.positiontup is not None:
+        params = tuple(params[name] for name in compiled.positiontup)
+    return "EXPLAIN (FORMAT JSON) " + str(compiled), params
+
+def plan_rows(plan):
+    if isinstance(plan, str): plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
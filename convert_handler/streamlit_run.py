@@ -2,6 +2,7 @@
 import streamlit as st
 import json
 import io
+import os
 import traceback
 from pathlib import Path
 import re
@@ -9,29 +10,29 @@ import base64
 import streamlit.components.v1 as components
 
 from sqlalchemy import (
-    create_engine, Column, Integer, Text, String,
+    Column, Integer, Text, String,
     TIMESTAMP, ARRAY, func, and_, or_, SmallInteger, text, Table, ForeignKey
 )
 from sqlalchemy.dialects.postgresql import JSONB
-from sqlalchemy.orm import sessionmaker, Session, relationship, declarative_base
+from sqlalchemy.orm import Session, relationship, declarative_base
+
+from db import connect, get_engine, get_sessionmaker, render_pool_stats
+from db_async import get_async_reads
+from latex_checks import lint_question
+from taxonomy import make_taxonomy_cache
 
 # ===============================
-# Config (Please fill in your password)
+# Config（数据库连接见 db.py：环境变量 EXAM_DB_* 或 db.toml）
 # ===============================
-DB_USER = "yiddi"
-DB_PASSWORD = "your_password"  # <--- Please enter your correct database password here
-DB_NAME = "exam_db"
-DB_HOST = "localhost"
-DB_PORT = "5432"
-DATABASE_URL = f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
 AUTH_USERS = {"admin": "admin123"}
+LINT_ON_SAVE = os.environ.get("EXAM_LINT_ON_SAVE", "1") != "0"   # “保存前检查 LaTeX” 的默认值
 
 # ===============================
 # DB init & ORM
 # ===============================
-# ✅ **FIX**: Added client_encoding='utf8' to resolve connection encoding issues on Windows
-engine = create_engine(DATABASE_URL, client_encoding='utf8')
-SessionLocal = sessionmaker(bind=engine)
+# 进程内共享的连接池（client_encoding='utf8' 等设置见 db.create_pool）
+engine = get_engine()
+SessionLocal = get_sessionmaker()
 Base = declarative_base()
 
 # --- ORM Model Definitions ---
@@ -40,6 +41,11 @@ sections_knowledge_points_table = Table('sections_knowledge_points', Base.metada
     Column('point_id', Integer, ForeignKey('knowledge_points.id'), primary_key=True)
 )
 
+question_knowledge_points_table = Table('question_knowledge_points', Base.metadata,
+    Column('question_id', Integer, ForeignKey('questions.id', ondelete='CASCADE'), primary_key=True),
+    Column('point_id', Integer, ForeignKey('knowledge_points.id', ondelete='CASCADE'), primary_key=True)
+)
+
 class Textbook(Base):
     __tablename__ = "textbooks"
     id = Column(Integer, primary_key=True)
@@ -69,6 +75,7 @@ class KnowledgePoint(Base):
     id = Column(Integer, primary_key=True)
     point_name = Column(String, unique=True)
     sections = relationship("Section", secondary=sections_knowledge_points_table, back_populates="knowledge_points")
+    questions = relationship("Question", secondary=question_knowledge_points_table, back_populates="linked_knowledge_points")
 
 class Question(Base):
     __tablename__ = "questions"
@@ -80,7 +87,7 @@ class Question(Base):
     grade_id = Column(Integer)
     chapter_id = Column(Integer)
     section_id = Column(Integer)
-    knowledge_points = Column(ARRAY(Text))
+    knowledge_points = Column(ARRAY(Text))  # 旧字段，已由 question_knowledge_points 关联表取代，不再写入
     question_type = Column(String(50))
     difficulty = Column(Integer)
     answer = Column(Text)
@@ -89,6 +96,7 @@ class Question(Base):
     quality = Column(SmallInteger)
     created_at = Column(TIMESTAMP, server_default=func.now())
     updated_at = Column(TIMESTAMP, server_default=func.now(), onupdate=func.now())
+    linked_knowledge_points = relationship("KnowledgePoint", secondary=question_knowledge_points_table, back_populates="questions")
 
 # ===============================
 # Helper Functions
@@ -124,33 +132,15 @@ def md_to_latex(md_text):
 # ===============================
 # Database Query Functions
 # ===============================
-@st.cache_data(ttl=600)
-def get_textbooks_from_db():
-    with SessionLocal() as session:
-        return session.query(Textbook.name, Textbook.id).order_by(Textbook.name).all()
+@st.cache_resource
+def get_taxonomy_cache():
+    # 进程内所有会话共用一份知识体系快照；LISTEN 使用独立长连接，不占用连接池。
+    # EXAM_DB_ASYNC_READS=1 时快照经异步读路径（db_async.AsyncReads.taxonomy）加载
+    return make_taxonomy_cache(engine.raw_connection, listen_connect=connect, async_reads=get_async_reads())
 
-@st.cache_data(ttl=600)
-def get_chapters_for_textbook(textbook_id: int):
-    if not textbook_id: return []
-    with SessionLocal() as session:
-        return session.query(Chapter.name, Chapter.id).filter(Chapter.textbook_id == textbook_id).order_by(Chapter.name).all()
-
-@st.cache_data(ttl=600)
-def get_sections_for_chapter(chapter_id: int):
-    if not chapter_id: return []
-    with SessionLocal() as session:
-        return session.query(Section.name, Section.id).filter(Section.chapter_id == chapter_id).order_by(Section.name).all()
-
-@st.cache_data(ttl=600)
-def get_kps_for_section(section_id: int):
-    if not section_id: return []
-    with SessionLocal() as session:
-        kps = session.query(KnowledgePoint.point_name).join(
-            sections_knowledge_points_table
-        ).filter(
-            sections_knowledge_points_table.c.section_id == section_id
-        ).order_by(KnowledgePoint.point_name).all()
-        return [kp[0] for kp in kps]
+def get_taxonomy():
+    """返回最新的知识体系快照（教材/章节/小节/知识点），仅在知识体系变更后重新查询。"""
+    return get_taxonomy_cache().get()
 
 @st.cache_data(ttl=3600)
 def get_enum_labels(enum_type_name: str):
@@ -198,29 +188,27 @@ with left_col:
     st.header("2. 题目元信息")
     title = st.text_input("题目标题或简述")
 
-    all_textbooks = get_textbooks_from_db()
-    book_options = {name: id for name, id in all_textbooks}
+    taxonomy = get_taxonomy()
+    book_options = {name: id for name, id in taxonomy.textbooks}
     selected_book_name = st.selectbox("选择教材", options=book_options.keys())
     selected_book_id = book_options.get(selected_book_name)
 
     chapter_options = {}
     if selected_book_id:
-        all_chapters = get_chapters_for_textbook(selected_book_id)
-        chapter_options = {name: id for name, id in all_chapters}
+        chapter_options = {name: id for name, id in taxonomy.chapters_of(selected_book_id)}
     selected_chapter_name = st.selectbox("选择章节", options=chapter_options.keys())
     selected_chapter_id = chapter_options.get(selected_chapter_name)
 
     section_options = {}
     if selected_chapter_id:
-        all_sections = get_sections_for_chapter(selected_chapter_id)
-        section_options = {name: id for name, id in all_sections}
+        section_options = {name: id for name, id in taxonomy.sections_of(selected_chapter_id)}
     selected_section_name = st.selectbox("选择小节", options=section_options.keys())
     selected_section_id = section_options.get(selected_section_name)
 
-    kp_options = []
+    kp_options = {}
     if selected_section_id:
-        kp_options = get_kps_for_section(selected_section_id)
-    selected_kps = st.multiselect("关联知识点", options=kp_options)
+        kp_options = {id: name for name, id in taxonomy.knowledge_points_of(selected_section_id)}
+    selected_kp_ids = st.multiselect("关联知识点", options=kp_options.keys(), format_func=kp_options.get)
 
     col1, col2 = st.columns(2)
     with col1:
@@ -250,22 +238,29 @@ with right_col:
 
     st.markdown("---")
     st.header("4. 提交到数据库")
+    lint_on_save = st.checkbox("保存前检查 LaTeX（$、%、&、括号与环境配对）", value=LINT_ON_SAVE)
     if st.button("✅ 确认并写入数据库", use_container_width=True, type="primary"):
+        lint_issues = lint_question(st.session_state.content_latex, st.session_state.answer_md,
+                                    st.session_state.analysis_md) if lint_on_save else []
+        for issue in lint_issues:
+            st.error(f"{issue.field} 第 {issue.line} 行 {issue.code}：{issue.message}")
+        if lint_issues:
+            st.warning("LaTeX 有上述问题，未保存；修改后再提交，或取消勾选“保存前检查 LaTeX”。")
+            st.stop()
         try:
             extra_meta_dict = json.loads(meta_raw) if meta_raw.strip() else {}
             
             with SessionLocal() as session:
-                selected_textbook = session.get(Textbook, selected_book_id) if selected_book_id else None
+                selected_textbook = taxonomy.textbook_info.get(selected_book_id, {})
                 
                 new_question = Question(
                     title=title or None,
                     content_md=st.session_state.content_md or None,
                     content_latex=st.session_state.content_latex or None,
-                    course_id=selected_textbook.course_id if selected_textbook else None,
-                    grade_id=selected_textbook.grade_id if selected_textbook else None,
+                    course_id=selected_textbook.get("course_id"),
+                    grade_id=selected_textbook.get("grade_id"),
                     chapter_id=selected_chapter_id,
                     section_id=selected_section_id,
-                    knowledge_points=selected_kps or None,
                     question_type=q_type or None,
                     difficulty=int(difficulty),
                     answer=st.session_state.answer_md or None,
@@ -273,10 +268,16 @@ with right_col:
                     extra_metadata=extra_meta_dict,
                     quality=int(quality)
                 )
+                if selected_kp_ids:
+                    new_question.linked_knowledge_points = session.query(KnowledgePoint).filter(
+                        KnowledgePoint.id.in_(selected_kp_ids)
+                    ).all()
                 session.add(new_question)
                 session.commit()
                 st.success(f"题目 '{title or '(无标题)'}' 已成功写入数据库！")
 
         except Exception as e:
             st.error(f"写入数据库失败：{e}")
-            traceback.print_exc()
\ No newline at end of file
+            traceback.print_exc()
+
+render_pool_stats()
@@ -8,15 +8,8 @@ import subprocess
 import traceback
 from pathlib import Path
 import re
-import base64
 
-from sqlalchemy import (
-    create_engine, Column, Integer, Text, String,
-    TIMESTAMP, ARRAY, func, and_, or_, SmallInteger, text
-)
-from sqlalchemy.dialects.postgresql import JSONB
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import text
 
 # optional libs
 try:
@@ -32,71 +25,66 @@ try:
 except Exception:
     pypandoc = None
 
-import math
 import html
 import streamlit.components.v1 as components
 
+import image_server
+# 模块名 db 与下文的会话变量 db 重名，只导入需要的函数
+from db import get_engine, get_sessionmaker, render_pool_stats
+from db_async import get_async_reads
+from latex_checks import lint_question
+from question_queries import (
+    KnowledgePoint, Question, build_question_filters, explain_count_sql, knowledge_point_counts_stmt,
+    plan_rows, question_page_stmt, question_preview_stmt,
+)
+
 # ===============================
-# Config
+# Config（数据库连接见 db.py：环境变量 EXAM_DB_* 或 db.toml）
 # ===============================
-DB_USER = "yiddi"
-DB_PASSWORD = "020297"
-DB_NAME = "exam_db"
-DB_HOST = "localhost"
-DB_PORT = "5432"
 XELATEX_CMD = "xelatex"
 DVISVGM_CMD = "dvisvgm"
 WORD_PARTS_FOLDER = "word_md_parts"
-DATABASE_URL = f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+PREVIEW_IMAGE_WIDTH = 640   # 编辑区预览使用的缩略图宽度
+LISTING_IMAGE_WIDTH = 320   # 题库浏览列表使用的缩略图宽度
 AUTH_USERS = {"admin": "admin123"}
+LINT_ON_SAVE = os.environ.get("EXAM_LINT_ON_SAVE", "1") != "0"   # “保存前检查 LaTeX” 的默认值
 
 # ===============================
-# DB init & ORM
+# DB init（ORM 模型与查询语句见 question_queries.py）
 # ===============================
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(bind=engine)
-Base = declarative_base()
-
-class Question(Base):
-    __tablename__ = "questions"
-    id = Column(Integer, primary_key=True, autoincrement=True)
-    title = Column(Text)
-    content_md = Column(Text)
-    content_latex = Column(Text)
-    course_id = Column(Integer)
-    grade_id = Column(Integer)
-    chapter_id = Column(Integer)
-    knowledge_points = Column(ARRAY(Text))
-    question_type = Column(String(50))
-    difficulty = Column(Integer)
-    answer = Column(Text)
-    analysis = Column(Text)
-    extra_metadata = Column("metadata", JSONB)
-    quality = Column(SmallInteger)
-    created_at = Column(TIMESTAMP, server_default=func.now())
-    updated_at = Column(TIMESTAMP, server_default=func.now(), onupdate=func.now())
+engine = get_engine()
+SessionLocal = get_sessionmaker()
 
 # ===============================
 # Helpers
 # ===============================
-def render_markdown_with_images(md_text: str, base_path: str):
+def lint_before_save(content_latex, answer_md, analysis_md):
+    """保存前的 LaTeX 静态检查（不调用 xelatex，见 latex_checks.lint_question）：逐条显示问题，没有问题时返回 True。"""
+    issues = lint_question(content_latex, answer_md, analysis_md)
+    for issue in issues:
+        st.error(f"{issue.field} 第 {issue.line} 行 {issue.code}：{issue.message}")
+    return not issues
+
+def render_markdown_with_images(md_text: str, base_path: str, width=None):
+    """将 Markdown 中的图片替换为指向本地图片服务的 <img src>；width 用于请求缩略图。"""
     if not md_text: return ""
     img_pattern = re.compile(r'!\[(.*?)\]\((.*?)\)')
     def replacer(match):
         alt_text, img_path_str = match.group(1), match.group(2)
+        if re.match(r'^(?:https?:)?//|^data:', img_path_str):
+            return f'<img src="{html.escape(img_path_str)}" alt="{html.escape(alt_text)}" style="max-width: 100%;">'
         full_img_path = Path(base_path) / img_path_str
-        if full_img_path.exists() and full_img_path.is_file():
-            try:
-                img_data = full_img_path.read_bytes()
-                b64_data = base64.b64encode(img_data).decode('utf-8')
-                ext = full_img_path.suffix.lower()
-                mime_type = {'.png': 'image/png', '.jpg': 'image/jpeg', '.jpeg': 'image/jpeg', '.gif': 'image/gif', '.svg': 'image/svg+xml'}.get(ext, 'application/octet-stream')
-                data_uri = f'data:{mime_type};base64,{b64_data}'
-                return f'<img src="{data_uri}" alt="{alt_text}" style="max-width: 100%;">'
-            except Exception as e: return f"![{alt_text}](图片加载失败: {e})"
+        if full_img_path.is_file():
+            src = image_server.image_url(img_path_str, width=width)
+            return f'<img src="{html.escape(src)}" alt="{html.escape(alt_text)}" loading="lazy" style="max-width: 100%;">'
         else: return f"![{alt_text}]({img_path_str} '图片未找到')"
     return img_pattern.sub(replacer, md_text)
 
+@st.cache_resource
+def get_image_server():
+    # 每个进程只启动一次图片服务，所有会话共用
+    return image_server.start_image_server(WORD_PARTS_FOLDER)
+
 def parse_docx_bytes(file_bytes):
     if docx is None: raise RuntimeError("python-docx 未安装")
     stream = io.BytesIO(file_bytes)
@@ -197,6 +185,51 @@ def login_widget():
             st.rerun()
         return True
 
+# ===============================
+# 题库浏览：keyset 分页与估算总数
+# ===============================
+@st.cache_data(ttl=300)
+def knowledge_point_counts(spec):
+    """在当前过滤条件下，用一条聚合查询统计每个知识点的题目数，返回 [(知识点 ID, 名称, 题数)]。"""
+    async_reads = get_async_reads()
+    if async_reads is not None: return async_reads.knowledge_point_counts(spec)
+    with engine.connect() as conn:
+        return [tuple(row) for row in conn.execute(knowledge_point_counts_stmt(spec))]
+
+def fetch_question_page(db, filters, page_size, before_id=None):
+    """keyset 分页（见 question_page_stmt），返回 (records, has_next)；records 只含摘要列。"""
+    rows = db.execute(question_page_stmt(filters, page_size, before_id)).all()
+    return rows[:page_size], len(rows) > page_size
+
+def load_question(question_id):
+    """单题的完整内容（题干/答案/解析等大字段），不经缓存；加载编辑时用它，总是取到最新保存的内容。"""
+    async_reads = get_async_reads()
+    if async_reads is not None: return async_reads.preview(question_id)
+    with engine.connect() as conn:
+        row = conn.execute(question_preview_stmt(question_id)).mappings().first()
+    return dict(row) if row else None
+
+@st.cache_data(ttl=300)
+def fetch_question_preview(question_id):
+    """列表中展开时的单题内容，缓存 5 分钟，可能稍旧。"""
+    return load_question(question_id)
+
+@st.cache_data(ttl=300)
+def estimate_question_count(spec):
+    """用查询规划器估算的行数代替 count(*)，避免每次重跑都扫描全部匹配行。"""
+    sql, params = explain_count_sql(spec, engine.dialect)
+    with engine.connect() as conn:
+        return plan_rows(conn.exec_driver_sql(sql, params).scalar())
+
+def _browse_next_page(last_id):
+    st.session_state._browse_cursors.append(last_id)
+
+def _browse_prev_page():
+    if len(st.session_state._browse_cursors) > 1: st.session_state._browse_cursors.pop()
+
+def _browse_first_page():
+    st.session_state._browse_cursors = [None]
+
 # ===============================
 # App UI
 # ===============================
@@ -206,6 +239,8 @@ st.title("题库管理系统")
 if not login_widget():
     st.stop()
 
+get_image_server()
+
 left_col, middle_col, right_col = st.columns([2.5, 2.5, 2])
 
 # --- 左栏：负责题干 ---
@@ -228,7 +263,7 @@ with left_col:
 
     md_text = st.text_area("题干 Markdown", value=st.session_state.content_md_buffer, height=220, key="content_md_editor")
     st.markdown("**题干 Markdown 预览：**")
-    rendered_html_md = render_markdown_with_images(md_text, WORD_PARTS_FOLDER)
+    rendered_html_md = render_markdown_with_images(md_text, WORD_PARTS_FOLDER, width=PREVIEW_IMAGE_WIDTH)
     st.markdown(rendered_html_md, unsafe_allow_html=True)
 
     st.markdown("---")
@@ -290,7 +325,7 @@ with middle_col:
     if "analysis_md_buffer" not in st.session_state: st.session_state.analysis_md_buffer = ""
     analysis_md_text = st.text_area("解析 Markdown", value=st.session_state.analysis_md_buffer, height=220, key="analysis_md_editor")
     st.markdown("**解析 Markdown 预览：**")
-    rendered_analysis_md = render_markdown_with_images(analysis_md_text, WORD_PARTS_FOLDER)
+    rendered_analysis_md = render_markdown_with_images(analysis_md_text, WORD_PARTS_FOLDER, width=PREVIEW_IMAGE_WIDTH)
     st.markdown(rendered_analysis_md, unsafe_allow_html=True)
     
     st.markdown("---")
@@ -318,9 +353,14 @@ with middle_col:
 with middle_col:
     st.markdown("---")
     st.header("4. 提交操作")
+    lint_on_save = st.checkbox("保存前检查 LaTeX（$、%、&、括号与环境配对）", value=LINT_ON_SAVE)
     if st.button("✅ 确认并写入数据库", use_container_width=True):
         if not st.session_state.get("_content_preview_success", False):
             st.warning("请先成功编译“题干 LaTeX”再保存。")
+        elif lint_on_save and not lint_before_save(st.session_state.content_latex_editor,
+                                                   st.session_state.answer_editor,
+                                                   st.session_state.analysis_md_editor):
+            st.warning("LaTeX 有上述问题，未保存；修改后再提交，或取消勾选“保存前检查 LaTeX”。")
         else:
             db = SessionLocal()
             try:
@@ -328,7 +368,10 @@ with middle_col:
                 if meta_raw.strip():
                     try: extra_meta = json.loads(meta_raw.replace("\\","/"))
                     except Exception: st.warning("额外 metadata 不是合法 JSON，已存空对象。")
-                kp_list = [kp.strip() for kp in kp_raw.split(",")] if kp_raw.strip() else None
+                kp_names = [kp.strip() for kp in kp_raw.split(",") if kp.strip()]
+                kp_objs = db.query(KnowledgePoint).filter(KnowledgePoint.point_name.in_(kp_names)).all() if kp_names else []
+                unknown_kps = set(kp_names) - {kp.point_name for kp in kp_objs}
+                if unknown_kps: st.warning(f"以下知识点不在知识点表中，已忽略：{'、'.join(sorted(unknown_kps))}")
                 
                 q = Question(
                     title=title or None,
@@ -337,7 +380,6 @@ with middle_col:
                     course_id=course_id if course_id > 0 else None,
                     grade_id=grade_id if grade_id > 0 else None,
                     chapter_id=chapter_id if chapter_id > 0 else None,
-                    knowledge_points=kp_list,
                     question_type=q_type or None,
                     difficulty=int(difficulty) if difficulty else None,
                     answer=st.session_state.answer_editor or None,
@@ -345,6 +387,7 @@ with middle_col:
                     extra_metadata=extra_meta,
                     quality=int(quality) if quality else None
                 )
+                q.linked_knowledge_points = kp_objs
                 db.add(q)
                 db.commit()
                 st.success("已写入数据库（questions 表）。")
@@ -358,46 +401,83 @@ with right_col:
     st.header("题库浏览")
     db = SessionLocal()
     try:
-        course_id_filter = st.number_input("课程 ID 过滤", 0, key="f_course_id")
+        f_col_1, f_col_2, f_col_3 = st.columns(3)
+        with f_col_1: course_id_filter = st.number_input("课程 ID", 0, key="f_course_id")
+        with f_col_2: grade_id_filter = st.number_input("年级 ID", 0, key="f_grade_id")
+        with f_col_3: chapter_id_filter = st.number_input("章节 ID", 0, key="f_chapter_id")
         type_filter = st.selectbox("题型过滤", options=[""] + allowed_types, key="f_type")
+        diff_range = st.slider("难度范围", 1, 5, (1, 5), key="f_difficulty")
+        quality_range = st.slider("质量范围", 1, 5, (1, 5), key="f_quality")
         keyword = st.text_input("关键字搜索 (标题/内容)")
+        filter_spec = {
+            "course_id": course_id_filter, "grade_id": grade_id_filter, "chapter_id": chapter_id_filter,
+            "q_type": type_filter, "difficulty": diff_range, "quality": quality_range,
+            "keyword": keyword.strip(),
+        }
+        # 知识点选项及题数基于其余过滤条件统计（不含知识点本身）
+        kp_counts = {kp_id: (name, n) for kp_id, name, n in knowledge_point_counts(filter_spec)}
+        # 已选中但在当前条件下没有题目的知识点也要保留在选项里，否则多选框会丢失选择
+        kp_options = list(kp_counts) + [kp for kp in st.session_state.get("f_kps", []) if kp not in kp_counts]
+        kp_names = st.session_state.setdefault("_kp_names", {})
+        kp_names.update({kp_id: name for kp_id, (name, _) in kp_counts.items()})
+        kp_filter = st.multiselect("知识点过滤", options=kp_options, key="f_kps",
+                                   format_func=lambda kp: f"{kp_names.get(kp, kp)} ({kp_counts.get(kp, ('', 0))[1]})")
+        kp_mode = st.radio("知识点匹配", options=["any", "all"], horizontal=True, key="f_kp_mode",
+                           format_func=lambda m: "包含任一" if m == "any" else "全部包含")
+        filter_spec["kps"] = tuple(sorted(kp_filter))
+        filter_spec["kp_mode"] = kp_mode
         
-        query = db.query(Question)
-        filters = []
-        if course_id_filter > 0: filters.append(Question.course_id == course_id_filter)
-        if type_filter: filters.append(Question.question_type == type_filter)
-        if keyword.strip():
-            kw = f"%{keyword.strip()}%"
-            filters.append(or_(Question.title.ilike(kw), Question.content_md.ilike(kw)))
-        if filters: query = query.filter(and_(*filters))
-        
+        filters = build_question_filters(filter_spec)
         page_size = st.number_input("每页显示", 5, 200, 10, 5)
-        total = query.count()
-        total_pages = max(1, math.ceil(total / page_size))
-        page = st.number_input(f"页码 (1-{total_pages})", 1, total_pages, 1)
-        offset = (page - 1) * page_size
-        records = query.order_by(Question.id.desc()).offset(offset).limit(page_size).all()
-        
-        st.write(f"共 {total} 条记录 — 第 {page}/{total_pages} 页")
+
+        # 过滤条件变化时回到第一页；_browse_cursors[i] 为第 i+1 页的起始游标（上一页最后一条的 id）
+        filter_key = (tuple(filter_spec.items()), page_size)
+        if st.session_state.get("_browse_filter_key") != filter_key:
+            st.session_state._browse_filter_key = filter_key
+            _browse_first_page()
+        cursors = st.session_state._browse_cursors
+
+        async_reads = get_async_reads()
+        if async_reads is not None:
+            # 异步路径：当前页与估算总数并发查询
+            records, has_next, total = async_reads.browse(filter_spec, page_size, before_id=cursors[-1])
+        else:
+            records, has_next = fetch_question_page(db, filters, page_size, before_id=cursors[-1])
+            total = estimate_question_count(filter_spec)
+
+        st.write(f"约 {total} 条记录（估算）— 第 {len(cursors)} 页")
+        nav_1, nav_2, nav_3 = st.columns(3)
+        with nav_1: st.button("⏮ 首页", disabled=len(cursors) == 1, on_click=_browse_first_page, key="browse_first")
+        with nav_2: st.button("◀ 上一页", disabled=len(cursors) == 1, on_click=_browse_prev_page, key="browse_prev")
+        with nav_3: st.button("下一页 ▶", disabled=not has_next, on_click=_browse_next_page,
+                              args=(records[-1].id if records else None,), key="browse_next")
         
+        # 列表只有摘要列；打开“完整内容”或加载编辑时才按 ID 查询大字段。
+        # 用开关而不是 st.expander：折叠的 expander 内容照样执行，做不到按需加载。
         for r in records:
-            with st.expander(f"ID {r.id} | {r.title or '(无标题)'}"):
-                st.markdown(f"**类型:** {r.question_type} | **难度:** {r.difficulty} | **质量:** {r.quality}")
-                st.markdown("**题干预览:**")
-                rendered_record_md = render_markdown_with_images(r.content_md or "", WORD_PARTS_FOLDER)
-                st.markdown(rendered_record_md, unsafe_allow_html=True)
-                st.markdown("**答案:**")
-                st.info(r.answer or "无")
-                st.markdown("**解析预览:**")
-                rendered_record_analysis = render_markdown_with_images(r.analysis or "", WORD_PARTS_FOLDER)
-                st.markdown(rendered_record_analysis, unsafe_allow_html=True)
+            with st.container(border=True):
+                st.markdown(f"**ID {r.id} | {r.title or '(无标题)'}**")
+                st.caption(f"类型: {r.question_type} | 难度: {r.difficulty} | 质量: {r.quality}")
+                if r.snippet: st.text(r.snippet)
+                show_full = st.toggle("完整内容", key=f"detail_{r.id}")
+                if show_full:
+                    full = fetch_question_preview(r.id) or {}
+                    st.markdown("**题干预览:**")
+                    rendered_record_md = render_markdown_with_images(full.get("content_md") or "", WORD_PARTS_FOLDER, width=LISTING_IMAGE_WIDTH)
+                    st.markdown(rendered_record_md, unsafe_allow_html=True)
+                    st.markdown("**答案:**")
+                    st.info(full.get("answer") or "无")
+                    st.markdown("**解析预览:**")
+                    rendered_record_analysis = render_markdown_with_images(full.get("analysis") or "", WORD_PARTS_FOLDER, width=LISTING_IMAGE_WIDTH)
+                    st.markdown(rendered_record_analysis, unsafe_allow_html=True)
 
                 if st.button(f"✏️ 加载此题进行编辑 (ID {r.id})", key=f"edit_btn_{r.id}"):
-                    st.session_state.content_md_buffer = r.content_md or ""
-                    st.session_state.content_latex_buffer = r.content_latex or ""
-                    st.session_state.answer_buffer = r.answer or ""
-                    st.session_state.analysis_md_buffer = r.analysis or ""
-                    st.session_state.analysis_latex_buffer = md_to_latex(r.analysis or "")
+                    full = load_question(r.id) or {}
+                    st.session_state.content_md_buffer = full.get("content_md") or ""
+                    st.session_state.content_latex_buffer = full.get("content_latex") or ""
+                    st.session_state.answer_buffer = full.get("answer") or ""
+                    st.session_state.analysis_md_buffer = full.get("analysis") or ""
+                    st.session_state.analysis_latex_buffer = md_to_latex(full.get("analysis") or "")
                     
                     st.session_state.pop('_content_preview_result', None)
                     st.session_state.pop('_analysis_preview_result', None)
@@ -410,4 +490,6 @@ with right_col:
         st.exception(traceback.format_exc())
     finally:
         if db.is_active:
-            db.close()
\ No newline at end of file
+            db.close()
+
+render_pool_stats()
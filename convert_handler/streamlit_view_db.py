@@ -1,115 +1,89 @@
 import streamlit as st
 import psycopg2
-from collections import defaultdict
+from sqlalchemy.exc import OperationalError
 
-# --- 1. 数据库连接配置 (请根据您的实际情况修改) ---
-DB_CONFIG = {
-    "dbname": "exam_db",
-    "user": "yiddi",              # 您的 PostgreSQL 用户名
-    "password": "020297",  # 您的数据库密码
-    "host": "localhost",
-    "port": "5432"
-}
+from db import connect, get_engine, render_pool_stats
+from taxonomy import CHILD_KIND, make_lazy_taxonomy_cache
+
+# --- 1. 数据库连接配置：见 db.py（环境变量 EXAM_DB_* 或 db.toml），与题库管理共用同一个连接池 ---
 
 # --- 2. 设置页面标题和布局 ---
 st.set_page_config(page_title="知识库浏览器", layout="wide")
 st.title("📚 Exam DB 知识库目录树")
 
-# --- 3. 从数据库获取所有数据的函数 ---
-def get_full_knowledge_tree():
-    """
-    一次性从数据库中查询所有教材、章节、小节和知识点，并构建一个层级字典。
+# --- 3. 按需加载：先取教材，节点展开时才按 ID 查询子节点 ---
+@st.cache_resource
+def get_taxonomy_cache():
     """
-    query = """
-    SELECT
-        t.id AS textbook_id,
-        t.name AS textbook_name,
-        c.id AS chapter_id,
-        c.name AS chapter_name,
-        s.id AS section_id,
-        s.name AS section_name,
-        kp.point_name
-    FROM
-        textbooks t
-    LEFT JOIN
-        chapters c ON t.id = c.textbook_id
-    LEFT JOIN
-        sections s ON c.id = s.chapter_id
-    LEFT JOIN
-        sections_knowledge_points skp ON s.id = skp.section_id
-    LEFT JOIN
-        knowledge_points kp ON skp.point_id = kp.id
-    ORDER BY
-        t.name, c.name, s.name, kp.point_name;
+    所有会话共用一份按需加载的知识体系。已展开过的节点的子节点在同一版本内共享；
+    知识体系变更时触发器会递增版本号并 NOTIFY，缓存换成新的空实例。
     """
-    
-    tree = defaultdict(lambda: defaultdict(lambda: defaultdict(list)))
+    # 按需查询从共享连接池借连接；LISTEN 使用独立长连接，不占用连接池
+    return make_lazy_taxonomy_cache(get_engine().raw_connection, listen_connect=connect)
 
+def get_lazy_taxonomy():
     try:
-        with psycopg2.connect(**DB_CONFIG) as conn:
-            with conn.cursor() as cur:
-                cur.execute(query)
-                results = cur.fetchall()
-                
-                for row in results:
-                    tb_id, tb_name, ch_id, ch_name, sec_id, sec_name, kp_name = row
-                    
-                    if tb_id and ch_id and sec_id and kp_name:
-                        # 确保知识点不重复添加
-                        if kp_name not in tree[tb_name][ch_name][sec_name]:
-                            tree[tb_name][ch_name][sec_name].append(kp_name)
-                    elif tb_id and ch_id and sec_id:
-                        # 确保节存在，即使它没有知识点
-                        tree[tb_name][ch_name][sec_name] = tree[tb_name][ch_name].get(sec_name, [])
-                    elif tb_id and ch_id:
-                        # 确保章存在，即使它没有节
-                        tree[tb_name][ch_name] = tree[tb_name].get(ch_name, {})
-                    elif tb_id:
-                        # 确保教材存在
-                        tree[tb_name] = tree.get(tb_name, {})
-
-    except psycopg2.OperationalError as e:
+        return get_taxonomy_cache().get()
+    except (psycopg2.OperationalError, OperationalError) as e:
         st.error(f"数据库连接失败，请检查您的配置: {e}")
         return None
     except Exception as e:
         st.error(f"查询数据时发生错误: {e}")
         return None
-        
-    return tree
 
-# --- 4. 渲染目录树 ---
-knowledge_tree = get_full_knowledge_tree()
+ICONS = {"textbook": "📖", "chapter": "📄", "section": "🖋️", "knowledge_point": "•"}
+KIND_LABELS = {"textbook": "教材", "chapter": "章节", "section": "小节", "knowledge_point": "知识点"}
+EMPTY_HINTS = {"root": "知识库中暂无教材。", "textbook": "本教材下暂无章节。", "chapter": "本章下暂无小节。", "section": "本节下暂未关联知识点。"}
+INDENT = "\u3000\u3000"  # 全角空格，标签里的半角空格会被去掉
 
-if knowledge_tree:
-    # 按教材名称排序
-    sorted_textbooks = sorted(knowledge_tree.keys())
+def open_key(kind, node_id):
+    return f"open_{kind}_{node_id}"
 
-    for textbook_name in sorted_textbooks:
-        with st.expander(f"📖 **{textbook_name}**"):
-            
-            chapters = knowledge_tree.get(textbook_name, {})
-            if not chapters:
-                st.write("本教材下暂无章节。")
-                continue
+def jump_to(hit):
+    """展开命中节点的所有祖先（以及节点本身），并记下需要高亮的节点。"""
+    for kind in ("textbook", "chapter", "section"):
+        ancestor_id = hit[f"{kind}_id"]
+        if ancestor_id is not None:
+            st.session_state[open_key(kind, ancestor_id)] = True
+    st.session_state["focus_node"] = (hit["kind"], hit["id"])
 
-            sorted_chapters = sorted(chapters.keys())
-            for chapter_name in sorted_chapters:
-                with st.expander(f"📄 **{chapter_name}**"):
-                    
-                    sections = chapters.get(chapter_name, {})
-                    if not sections:
-                        st.write("本章下暂无小节。")
-                        continue
+def render_children(taxonomy, kind, node_id, depth):
+    """渲染某个节点的子节点；只有展开的节点才会继续查询和渲染下一层。"""
+    child_kind = CHILD_KIND[kind]
+    children = taxonomy.children(kind, node_id)
+    indent = INDENT * depth
+    focus = st.session_state.get("focus_node")
+    if not children:
+        st.caption(indent + EMPTY_HINTS[kind])
+        return
+    if child_kind == "knowledge_point":
+        # 知识点是叶子，整节合成一个元素输出
+        lines = [
+            f"{indent}{ICONS[child_kind]} " + (f"**{name}**" if focus == (child_kind, child_id) else name)
+            for child_id, name in children
+        ]
+        st.markdown("  \n".join(lines))
+        return
+    for child_id, name in children:
+        label = f"{indent}{ICONS[child_kind]} " + (f"**:orange[{name}]**" if focus == (child_kind, child_id) else f"**{name}**")
+        if st.toggle(label, key=open_key(child_kind, child_id)):
+            render_children(taxonomy, child_kind, child_id, depth + 1)
 
-                    sorted_sections = sorted(sections.keys())
-                    for section_name in sorted_sections:
-                        with st.expander(f"🖋️ {section_name}"):
-                            
-                            knowledge_points = sections.get(section_name, [])
-                            if knowledge_points:
-                                for kp in sorted(knowledge_points):
-                                    st.markdown(f"- {kp}")
-                            else:
-                                st.info("本节下暂未关联知识点。")
+# --- 4. 渲染目录树 ---
+taxonomy = get_lazy_taxonomy()
+
+if taxonomy:
+    search = st.text_input("🔍 搜索教材 / 章节 / 小节 / 知识点", placeholder="输入名称中的文字，点击结果即可展开到该节点")
+    if search.strip():
+        hits = taxonomy.search(search.strip())
+        if not hits:
+            st.caption("没有匹配的节点。")
+        for i, hit in enumerate(hits):
+            st.button(f"{KIND_LABELS[hit['kind']]}：{hit['name']}", key=f"search_hit_{i}", on_click=jump_to, args=(hit,))
+        st.divider()
+
+    render_children(taxonomy, "root", None, 0)
 else:
-    st.warning("未能加载知识库数据。")
\ No newline at end of file
+    st.warning("未能加载知识库数据。")
+
+render_pool_stats()
@@ -0,0 +1,304 @@
+"""知识体系（教材 → 章节 → 小节 → 知识点）的内存快照与共享缓存。
+
+一条 UNION ALL 查询取回整个知识体系，按 ID 建索引，级联选择框的每一级都是 O(1) 字典查找。
+
+快照缓存（VersionedCache）在进程内所有会话间共享，失效依据两种信号：
+- taxonomy_version 表的版本号（migrations/004_taxonomy_version.sql，由触发器维护）；
+- 触发器发出的 NOTIFY taxonomy_changed（migrations/005_taxonomy_notify.sql）。
+监听线程在线时，取用缓存不需要任何查询，收到通知后才去核对版本号并重新加载；
+监听断开时退回到每次取用都查一行版本号。
+
+知识库浏览器用的是按需加载的 LazyTaxonomy：先取教材，节点展开时才按父节点 ID 查询子节点，
+名称搜索走 migrations/006_taxonomy_lookup_indexes.sql 中的 trigram 索引。
+"""
+import select
+import threading
+import time
+from collections import defaultdict
+
+TAXONOMY_SQL = """
+    SELECT 'textbook' AS kind, id, NULL::integer AS parent_id, name, course_id, grade_id FROM textbooks
+    UNION ALL
+    SELECT 'chapter', id, textbook_id, name, NULL, NULL FROM chapters
+    UNION ALL
+    SELECT 'section', id, chapter_id, name, NULL, NULL FROM sections
+    UNION ALL
+    SELECT 'knowledge_point', kp.id, skp.section_id, kp.point_name, NULL, NULL
+    FROM sections_knowledge_points skp
+    JOIN knowledge_points kp ON kp.id = skp.point_id
+    ORDER BY kind, parent_id, name
+"""
+
+VERSION_SQL = "SELECT version FROM taxonomy_version"
+NOTIFY_CHANNEL = "taxonomy_changed"
+LISTEN_POLL_SECONDS = 60
+LISTEN_RETRY_SECONDS = 5
+
+
+class TaxonomyTree:
+    """按 ID 索引的知识体系快照；children 中的列表均为 [(名称, ID)]，已按名称排序。"""
+
+    def __init__(self, version):
+        self.version = version
+        self.textbooks = []                 # [(名称, ID)]
+        self.textbook_info = {}             # {ID: {"name", "course_id", "grade_id"}}
+        self.names = defaultdict(dict)      # {kind: {ID: 名称}}
+        self.parents = defaultdict(dict)    # {"chapter" / "section": {ID: 父节点 ID}}
+        self.children = {}                  # {(父 kind, 父 ID): [(名称, ID)]}
+
+    def chapters_of(self, textbook_id):
+        return self.children.get(("textbook", textbook_id), [])
+
+    def sections_of(self, chapter_id):
+        return self.children.get(("chapter", chapter_id), [])
+
+    def knowledge_points_of(self, section_id):
+        return self.children.get(("section", section_id), [])
+
+
+PARENT_KIND = {"chapter": "textbook", "section": "chapter", "knowledge_point": "section"}
+FETCH_SIZE = 5000
+
+
+class TaxonomyBuilder:
+    """由 TAXONOMY_SQL 的结果行增量构建快照：add(rows) 可以分批多次调用（如异步路径的每个分区），
+    最后从 tree 取结果。
+
+    结果行按 (kind, parent_id, name) 排序，同一父节点的子节点是连续的一段：
+    只在换段时查一次字典，段内直接追加到当前列表，并用该段的 ID 集合去重。
+    """
+
+    def __init__(self, version=None):
+        self.tree = TaxonomyTree(version)
+        self._seen = {}  # {(父 kind, 父 ID): 已加入的子节点 ID 集合}
+
+    def add(self, rows):
+        tree, seen = self.tree, self._seen
+        group = None
+        for kind, node_id, parent_id, name, course_id, grade_id in rows:
+            if kind == "textbook":
+                tree.textbooks.append((name, node_id))
+                tree.textbook_info[node_id] = {"name": name, "course_id": course_id, "grade_id": grade_id}
+                tree.names[kind][node_id] = name
+                continue
+            if group != (kind, parent_id):
+                group = (kind, parent_id)
+                key = (PARENT_KIND[kind], parent_id)
+                bucket = tree.children.setdefault(key, [])
+                ids = seen.setdefault(key, set())
+                kind_names = tree.names[kind]
+                kind_parents = tree.parents[kind] if kind != "knowledge_point" else None
+            # 同一知识点可挂在多个小节下，各小节的列表各自维护
+            if node_id in ids:
+                continue
+            ids.add(node_id)
+            bucket.append((name, node_id))
+            kind_names[node_id] = name
+            if kind_parents is not None:
+                kind_parents[node_id] = parent_id
+
+
+def build_taxonomy(rows, version=None):
+    """由 TAXONOMY_SQL 的结果行构建快照；rows 可以是任意可迭代对象，逐行消费。"""
+    builder = TaxonomyBuilder(version)
+    builder.add(rows)
+    return builder.tree
+
+
+def iter_rows(cur, size=FETCH_SIZE):
+    while True:
+        rows = cur.fetchmany(size)
+        if not rows:
+            return
+        yield from rows
+
+
+def load_taxonomy(conn, version=None):
+    """在 DBAPI 连接上执行一次查询，加载完整知识体系。
+
+    使用服务端游标分批取行，边取边建树，不会把整个结果集先读进内存。
+    """
+    with conn.cursor(name="taxonomy_snapshot") as cur:
+        cur.itersize = FETCH_SIZE
+        cur.execute(TAXONOMY_SQL)
+        return build_taxonomy(iter_rows(cur), version)
+
+
+def current_version(conn):
+    with conn.cursor() as cur:
+        cur.execute(VERSION_SQL)
+        return cur.fetchone()[0]
+
+
+class VersionedCache:
+    """进程内共享的快照缓存，知识体系版本变化时才调用 loader(conn, version) 重新加载。
+
+    connect：返回 DBAPI 连接的函数（用完即 close，可以是连接池的 raw_connection）。
+    listen_connect：返回专用于 LISTEN 的长连接的函数；为 None 时不启动监听。
+    """
+
+    def __init__(self, loader, connect, listen_connect=None):
+        self._loader = loader
+        self._connect = connect
+        self._listen_connect = listen_connect
+        self._value = None
+        self._version = None
+        self._lock = threading.Lock()
+        self._listening = False
+        self._dirty = True
+        if listen_connect is not None:
+            threading.Thread(target=self._listen_loop, name="taxonomy-listener", daemon=True).start()
+
+    def get(self):
+        if self._listening and not self._dirty and self._value is not None:
+            return self._value
+        conn = self._connect()
+        try:
+            # 先清除标记再读版本号：读版本号之后到达的通知会重新置位，下次取用时再核对
+            self._dirty = False
+            version = current_version(conn)
+            with self._lock:
+                if self._value is None or self._version != version:
+                    self._value = self._loader(conn, version)
+                    self._version = version
+                return self._value
+        except Exception:
+            self._dirty = True
+            raise
+        finally:
+            conn.close()
+
+    def invalidate(self):
+        self._dirty = True
+        self._version = None
+
+    def _listen_loop(self):
+        while True:
+            conn = None
+            try:
+                conn = self._listen_connect()
+                conn.autocommit = True
+                with conn.cursor() as cur:
+                    cur.execute(f"LISTEN {NOTIFY_CHANNEL}")
+                # 监听建立前的变更无从得知，先核对一次版本号
+                self._dirty = True
+                self._listening = True
+                while True:
+                    if select.select([conn], [], [], LISTEN_POLL_SECONDS) == ([], [], []):
+                        continue
+                    conn.poll()
+                    if conn.notifies:
+                        del conn.notifies[:]
+                        self._dirty = True
+            except Exception as e:
+                print(f"知识体系变更监听中断，{LISTEN_RETRY_SECONDS}s 后重连: {e}")
+            finally:
+                self._listening = False
+                self._dirty = True
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
+            time.sleep(LISTEN_RETRY_SECONDS)
+
+
+def make_taxonomy_cache(connect, listen_connect=None, async_reads=None):
+    """async_reads 为 db_async.AsyncReads 时，版本号仍在 connect 的连接上核对，快照改由异步路径分批加载。"""
+    if async_reads is None:
+        return VersionedCache(load_taxonomy, connect, listen_connect)
+    return VersionedCache(lambda conn, version: async_reads.taxonomy(version), connect, listen_connect)
+
+
+# ===============================
+# 按需加载（知识库浏览器）
+# ===============================
+CHILD_KIND = {"root": "textbook", "textbook": "chapter", "chapter": "section", "section": "knowledge_point"}
+
+CHILDREN_SQL = {
+    "root": "SELECT id, name FROM textbooks ORDER BY name",
+    "textbook": "SELECT id, name FROM chapters WHERE textbook_id = %s ORDER BY name",
+    "chapter": "SELECT id, name FROM sections WHERE chapter_id = %s ORDER BY name",
+    "section": """
+        SELECT kp.id, kp.point_name
+        FROM sections_knowledge_points skp
+        JOIN knowledge_points kp ON kp.id = skp.point_id
+        WHERE skp.section_id = %s
+        ORDER BY kp.point_name
+    """,
+}
+
+# 命中节点连同其祖先 ID 一起返回，便于直接展开到该节点
+SEARCH_SQL = """
+    SELECT 'textbook', t.id, t.name, t.id, NULL::integer, NULL::integer
+    FROM textbooks t WHERE t.name ILIKE %(q)s
+    UNION ALL
+    SELECT 'chapter', c.id, c.name, c.textbook_id, c.id, NULL
+    FROM chapters c WHERE c.name ILIKE %(q)s
+    UNION ALL
+    SELECT 'section', s.id, s.name, c.textbook_id, s.chapter_id, s.id
+    FROM sections s JOIN chapters c ON c.id = s.chapter_id
+    WHERE s.name ILIKE %(q)s
+    UNION ALL
+    SELECT 'knowledge_point', kp.id, kp.point_name, c.textbook_id, s.chapter_id, s.id
+    FROM knowledge_points kp
+    JOIN sections_knowledge_points skp ON skp.point_id = kp.id
+    JOIN sections s ON s.id = skp.section_id
+    JOIN chapters c ON c.id = s.chapter_id
+    WHERE kp.point_name ILIKE %(q)s
+    LIMIT %(limit)s
+"""
+SEARCH_MEMO_LIMIT = 256
+
+
+class LazyTaxonomy:
+    """按需加载的知识体系：节点第一次展开时才按 ID 查询其子节点。
+
+    查询结果在同一知识体系版本内由所有会话共享；版本变化后 VersionedCache 会换上新实例。
+    """
+
+    def __init__(self, connect, version=None):
+        self._connect = connect
+        self.version = version
+        self._children = {}   # {(kind, ID): [(子 ID, 名称)]}
+        self._searches = {}   # {(关键词, limit): [命中]}
+        self._lock = threading.Lock()
+
+    def _query(self, sql, params):
+        conn = self._connect()
+        try:
+            with conn.cursor() as cur:
+                cur.execute(sql, params)
+                return cur.fetchall()
+        finally:
+            conn.close()
+
+    def children(self, kind="root", node_id=None):
+        key = (kind, node_id)
+        rows = self._children.get(key)
+        if rows is None:
+            rows = [tuple(r) for r in self._query(CHILDREN_SQL[kind], () if kind == "root" else (node_id,))]
+            with self._lock:
+                self._children[key] = rows
+        return rows
+
+    def search(self, term, limit=30):
+        """按名称子串搜索，返回 [{"kind", "id", "name", "textbook_id", "chapter_id", "section_id"}]。"""
+        key = (term, limit)
+        hits = self._searches.get(key)
+        if hits is None:
+            escaped = term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            rows = self._query(SEARCH_SQL, {"q": f"%{escaped}%", "limit": limit})
+            hits = [
+                dict(zip(("kind", "id", "name", "textbook_id", "chapter_id", "section_id"), row))
+                for row in rows
+            ]
+            with self._lock:
+                if len(self._searches) >= SEARCH_MEMO_LIMIT:
+                    self._searches.clear()
+                self._searches[key] = hits
+        return hits
+
+
+def make_lazy_taxonomy_cache(connect, listen_connect=None):
+    return VersionedCache(lambda conn, version: LazyTaxonomy(connect, version), connect, listen_connect)
@@ -0,0 +1,148 @@
+"""自动组卷基准：在合成的大题库上计时 exam_assembler 的候选题查询与求解，并核对约束。
+
+在独立的 exam_bench schema 中建表（结构与 exam_fixture 相同，索引与 migrations/008_exam_papers.sql 相同），
+灌入合成题目（默认 10 万道，同一课程，三种题型，难度/质量分布不均，每题 1~3 个知识点，共 300 个知识点），
+并记录若干份最近的试卷（用于 “不重复使用” 的排除）。然后对每组组卷条件用多个种子各组一次卷，输出：
+  查询 / 求解 / 合计耗时（中位数与最大值）、题型是否凑齐、难度偏差、未覆盖知识点数、是否用到最近用过的题。
+
+用法: python bench_assembly.py [题目数] [--seeds 5] [--keep]
+      --keep  保留 exam_bench schema，下次运行跳过灌数据
+"""
+import argparse
+import io
+import random
+import statistics
+import time
+
+from psycopg2 import sql
+
+from exam_assembler import assemble, difficulty_targets, recent_question_ids
+from exam_from_db import db
+
+SCHEMA = "exam_bench"
+TYPES = ["single_choice", "fill_blank", "short_answer"]
+N_KNOWLEDGE_POINTS = 300
+RECENT_PAPERS = 20
+SPECS = {
+    "小测 20 题": {
+        "course": 1, "types": {"single_choice": 10, "fill_blank": 6, "short_answer": 4},
+        "difficulty": {"1": 0.2, "2": 0.3, "3": 0.3, "4": 0.2}, "knowledge_points": list(range(1, 6)),
+        "min_quality": 3, "recent_days": 90,
+    },
+    "期中 40 题": {
+        "course": 1, "types": {"single_choice": 20, "fill_blank": 12, "short_answer": 8},
+        "difficulty": {"1": 0.1, "2": 0.2, "3": 0.4, "4": 0.2, "5": 0.1}, "knowledge_points": list(range(1, 21)),
+        "min_quality": 3, "recent_days": 90,
+    },
+    "期末 80 题（稀有知识点）": {
+        "course": 1, "types": {"single_choice": 40, "fill_blank": 25, "short_answer": 15},
+        "difficulty": {"2": 10, "3": 30, "4": 25, "5": 15},
+        "knowledge_points": list(range(1, 41)) + list(range(N_KNOWLEDGE_POINTS - 10, N_KNOWLEDGE_POINTS + 1)),
+        "min_quality": 4, "recent_days": 90,
+    },
+}
+
+
+def seed(conn, n_rows):
+    rng = random.Random(42)
+    with conn.cursor() as cur:
+        cur.execute(sql.SQL("DROP SCHEMA IF EXISTS {0} CASCADE; CREATE SCHEMA {0}").format(sql.Identifier(SCHEMA)))
+        cur.execute(sql.SQL("SET search_path TO {}").format(sql.Identifier(SCHEMA)))
+        cur.execute("""
+            CREATE TABLE questions (
+                id integer PRIMARY KEY, course_id integer, grade_id integer, chapter_id integer,
+                question_type text, difficulty integer, quality smallint
+            );
+            CREATE TABLE question_knowledge_points (
+                question_id integer, point_id integer, PRIMARY KEY (question_id, point_id)
+            );
+            CREATE TABLE exam_papers (
+                id serial PRIMARY KEY, name text NOT NULL, spec jsonb NOT NULL DEFAULT '{}', seed integer,
+                created_at timestamp NOT NULL DEFAULT now()
+            );
+            CREATE TABLE exam_paper_questions (
+                paper_id integer NOT NULL REFERENCES exam_papers (id) ON DELETE CASCADE,
+                question_id integer NOT NULL, position integer NOT NULL, PRIMARY KEY (paper_id, question_id)
+            );
+        """)
+        questions, links = io.StringIO(), io.StringIO()
+        for qid in range(1, n_rows + 1):
+            difficulty = rng.choices([1, 2, 3, 4, 5], weights=[15, 25, 30, 20, 10])[0]
+            quality = rng.choices([1, 2, 3, 4, 5], weights=[10, 20, 35, 25, 10])[0]
+            questions.write(f"{qid}\t1\t{1 + qid % 3}\t{1 + qid % 12}\t{rng.choice(TYPES)}\t{difficulty}\t{quality}\n")
+            # 知识点频率不均：编号越大的知识点越少见
+            for kp in set(int(N_KNOWLEDGE_POINTS * rng.random() ** 2) + 1 for _ in range(rng.randint(1, 3))):
+                links.write(f"{qid}\t{kp}\n")
+        questions.seek(0)
+        links.seek(0)
+        cur.copy_expert("COPY questions FROM STDIN", questions)
+        cur.copy_expert("COPY question_knowledge_points FROM STDIN", links)
+        for paper in range(RECENT_PAPERS):
+            cur.execute("INSERT INTO exam_papers (name, created_at) VALUES (%s, now() - make_interval(days => %s)) "
+                        "RETURNING id", (f"历史试卷 {paper}", paper * 7))
+            paper_id = cur.fetchone()[0]
+            cur.executemany("INSERT INTO exam_paper_questions VALUES (%s, %s, %s)",
+                            [(paper_id, qid, pos) for pos, qid in enumerate(rng.sample(range(1, n_rows + 1), 40), 1)])
+        cur.execute("""
+            CREATE INDEX ON questions (course_id, question_type, quality) INCLUDE (difficulty);
+            CREATE INDEX ON question_knowledge_points (point_id, question_id);
+            CREATE INDEX ON exam_papers (created_at);
+            ANALYZE questions; ANALYZE question_knowledge_points; ANALYZE exam_papers; ANALYZE exam_paper_questions;
+        """)
+    conn.commit()
+
+
+def check(conn, spec, result):
+    """核对约束，返回 (题型是否凑齐, 难度偏差, 未覆盖知识点数, 用到最近用过的题数)。"""
+    types_ok = all(used == want for used, want in result["types"].values())
+    targets = difficulty_targets(spec["difficulty"], sum(spec["types"].values()))
+    deviation = sum(abs(result["difficulty"].get(d, (0, 0))[0] - n) for d, n in targets.items())
+    reused = len(set(result["ids"]) & recent_question_ids(conn, spec["recent_days"]))
+    conn.rollback()
+    return types_ok, deviation, len(result["uncovered"]), reused
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="自动组卷基准")
+    parser.add_argument("rows", nargs="?", type=int, default=100_000)
+    parser.add_argument("--seeds", type=int, default=5, help="每组条件用几个种子各组一次卷")
+    parser.add_argument("--keep", action="store_true", help=f"保留 {SCHEMA} schema，下次跳过灌数据")
+    args = parser.parse_args()
+
+    conn = db.connect()
+    with conn.cursor() as cur:
+        cur.execute("SELECT count(*) FROM pg_namespace WHERE nspname = %s", (SCHEMA,))
+        exists = cur.fetchone()[0]
+    conn.rollback()
+    if not (args.keep and exists):
+        t0 = time.perf_counter()
+        seed(conn, args.rows)
+        print(f"已生成 {args.rows} 道题（{time.perf_counter() - t0:.1f}s）")
+    with conn.cursor() as cur:
+        cur.execute(sql.SQL("SET search_path TO {}").format(sql.Identifier(SCHEMA)))
+        cur.execute("SELECT count(*) FROM questions")
+        n_questions = cur.fetchone()[0]
+    conn.commit()
+
+    print(f"\n题库 {n_questions} 道题，每组条件 {args.seeds} 个种子（时间为中位数 / 最大值，单位 ms）\n")
+    print(f"{'组卷条件':<22}{'候选':>8}{'查询':>14}{'求解':>14}{'合计':>14}  题型  难度偏差  未覆盖  重复")
+    worst = 0.0
+    for label, spec in SPECS.items():
+        runs = [assemble(conn, spec, seed) for seed in range(args.seeds)]
+        checks = [check(conn, spec, result) for result in runs]
+
+        def ms(key):
+            values = [r[key] * 1000 for r in runs]
+            return f"{statistics.median(values):6.0f} /{max(values):5.0f}"
+
+        worst = max(worst, max(r["total_seconds"] for r in runs))
+        print(f"{label:<22}{runs[0]['candidates']:>8}{ms('query_seconds'):>14}{ms('seconds'):>14}"
+              f"{ms('total_seconds'):>14}  {'✅' if all(c[0] for c in checks) else '❌'}  "
+              f"{max(c[1] for c in checks):>8}  {max(c[2] for c in checks):>6}  {max(c[3] for c in checks):>4}")
+    print(f"\n最慢一次组卷 {worst:.3f}s")
+
+    if not args.keep:
+        with conn.cursor() as cur:
+            cur.execute(sql.SQL("DROP SCHEMA {} CASCADE").format(sql.Identifier(SCHEMA)))
+        conn.commit()
+    conn.close()
@@ -0,0 +1,80 @@
+"""增量编译基准：整卷从头编译 vs fragment_cache 的片段缓存 + 组装编译。
+
+合成一套试卷（默认 40 道题），依次计时：
+  full         latex_templates 生成整卷，latex_driver 编译（不使用 .aux 缓存）
+  cold         片段缓存为空：编译全部片段 + 组装
+  warm         未做改动再构建一次：全部命中 + 组装
+  edit_one     修改其中一道题：重编 1 个片段 + 组装
+需要本机安装 TeX（默认 xelatex）；在临时目录中运行，不影响工作目录中的缓存。
+
+用法: python bench_fragments.py [每套题数] [--engine xelatex] [--jobs N]
+"""
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from fragment_cache import build_incremental
+from latex_driver import LATEX_ENGINE, compile_tex
+from latex_templates import write_paper
+
+
+def synth_quizzes(n_questions, seed=42):
+    rng = random.Random(seed)
+    formulas = [r"\int_0^{%d} x^2\,dx" % rng.randint(1, 9), r"\sum_{k=1}^{n} k^{%d}" % rng.randint(2, 5),
+                r"\frac{\sqrt{%d}}{%d}" % (rng.randint(2, 50), rng.randint(2, 9)), r"\lim_{x\to 0}\frac{\sin x}{x}"]
+    return [{
+        "quiz_id": f"Q{i:03d}",
+        "question_type": "fill_blank",
+        "question_latex": f"Evaluate ${rng.choice(formulas)}$ and ${rng.choice(formulas)}$. (No. {i})",
+        "answer": f"${rng.randint(1, 99)}$",
+        "solution_latex": f"$${rng.choice(formulas)}$$",
+    } for i in range(n_questions)]
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="增量编译基准")
+    parser.add_argument("questions", nargs="?", type=int, default=40)
+    parser.add_argument("--engine", default=LATEX_ENGINE)
+    parser.add_argument("--jobs", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+    if shutil.which(args.engine) is None:
+        sys.exit(f"FATAL ERROR: 找不到 {args.engine}，请安装 TeX 发行版。")
+
+    quizzes = synth_quizzes(args.questions)
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="bench_fragments_") as workdir:
+        workdir = Path(workdir)
+        cache_dir = workdir / "cache"
+
+        exam_path = workdir / "full" / "exam.tex"
+        exam_path.parent.mkdir()
+        write_paper(quizzes, exam_path, workdir / "full" / "solution.tex")
+        seconds, build = timed(compile_tex, exam_path, args.engine, cache_dir=None)
+        results["full"] = (seconds, f"{build['runs']} 次整卷编译")
+
+        for case in ("cold", "warm", "edit_one"):
+            if case == "edit_one":
+                quizzes[len(quizzes) // 2] = dict(quizzes[len(quizzes) // 2],
+                                                  question_latex=r"Edited: find $\int_0^1 e^x\,dx$.")
+            seconds, stats = timed(build_incremental, quizzes, workdir / case, cache_dir=cache_dir,
+                                   engine=args.engine, jobs=args.jobs)
+            if not stats["ok"]:
+                sys.exit(f"FATAL ERROR: {case} 构建失败：{stats}")
+            results[case] = (seconds, f"新编译 {stats['compiled']} 个片段，命中 {stats['hits']}，"
+                                      f"组装 {stats['assemble_seconds']:.2f}s")
+
+    print(f"每套 {args.questions} 道题，引擎 {args.engine}，片段并行 {args.jobs}\n")
+    for case, (seconds, detail) in results.items():
+        print(f"{case:<10}{seconds:>8.2f}s  {detail}")
+    print(f"\n修改一道题后重建：{results['full'][0] / results['edit_one'][0]:.1f}x（相对整卷从头编译）")
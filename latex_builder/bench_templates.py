@@ -0,0 +1,96 @@
+"""模板渲染基准：旧的 str.replace('%s', ..., 1) 链 vs latex_templates 预编译模板，单位为 套/秒。
+
+合成一套试卷（默认 40 道题，题干/解析各约 600 字符的 LaTeX），分别用两种方式渲染整套试卷和答案，
+重复多次取最好成绩。只衡量字符串渲染本身，不涉及文件写入与 LaTeX 编译。
+
+用法: python bench_templates.py [每套题数] [题干字符数]
+"""
+import random
+import sys
+import time
+
+from latex_templates import LATEX_FOOTER, LATEX_HEADER, QUIZ_TEMPLATE_RAW, SOLUTION_TEMPLATE_RAW, render_paper
+
+REPEAT = 5
+MIN_SECONDS = 0.5
+
+# 旧实现：模板中的字段换回 %s，按顺序逐个 replace
+LEGACY_QUIZ = QUIZ_TEMPLATE_RAW.replace("<<num>>", "%s").replace("<<quiz_id>>", "%s").replace("<<question>>", "%s")
+LEGACY_SOLUTION = (SOLUTION_TEMPLATE_RAW.replace("<<num>>", "%s").replace("<<quiz_id>>", "%s")
+                   .replace("<<answer>>", "%s").replace("<<solution>>", "%s"))
+
+
+def legacy_paper(quizzes):
+    exam_content, solution_content = [], []
+    for i, quiz in enumerate(quizzes):
+        quiz_template = LEGACY_QUIZ
+        quiz_template = quiz_template.replace('%s', str(i + 1), 1)
+        quiz_template = quiz_template.replace('%s', str(quiz['quiz_id']), 1)
+        quiz_template = quiz_template.replace('%s', quiz['question_latex'], 1)
+        exam_content.append(quiz_template)
+
+        solution_template = LEGACY_SOLUTION
+        solution_template = solution_template.replace('%s', str(i + 1), 1)
+        solution_template = solution_template.replace('%s', str(quiz['quiz_id']), 1)
+        solution_template = solution_template.replace('%s', quiz['answer'], 1)
+        solution_template = solution_template.replace('%s', quiz['solution_latex'], 1)
+        solution_content.append(solution_template)
+    return (LATEX_HEADER + "\n".join(exam_content) + LATEX_FOOTER,
+            LATEX_HEADER + "\n".join(solution_content) + LATEX_FOOTER)
+
+
+def synth_quizzes(n_questions, chars, seed=42):
+    rng = random.Random(seed)
+    pieces = [r"$\frac{a}{b}$", r"$x^2 + y^2 = r^2$", "已知函数", "求证", r"$\sqrt{2}$", "的取值范围", " ", "，"]
+
+    def text():
+        out = []
+        while sum(len(p) for p in out) < chars:
+            out.append(rng.choice(pieces))
+        return "".join(out)
+
+    return [{
+        "quiz_id": f"Q{i:05d}",
+        "question_type": rng.choice(["single_choice", "fill_blank", "short_answer"]),
+        "question_latex": text(),
+        "answer": "$" + str(rng.randint(1, 99)) + "$",
+        "solution_latex": text(),
+    } for i in range(n_questions)]
+
+
+def papers_per_second(render, quizzes):
+    """重复渲染至少 MIN_SECONDS，取 REPEAT 轮中最好的一轮。"""
+    best = 0.0
+    for _ in range(REPEAT):
+        count, start = 0, time.perf_counter()
+        while True:
+            render(quizzes)
+            count += 1
+            elapsed = time.perf_counter() - start
+            if elapsed >= MIN_SECONDS:
+                break
+        best = max(best, count / elapsed)
+    return best
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    n_questions = int(args[0]) if args else 40
+    chars = int(args[1]) if len(args) > 1 else 600
+    quizzes = synth_quizzes(n_questions, chars)
+    print(f"每套 {n_questions} 道题，题干/解析约 {chars} 字符")
+
+    if legacy_paper(quizzes) != render_paper(quizzes):
+        sys.exit("FATAL ERROR: 两种实现的输出不一致")
+
+    cases = [
+        ("legacy", legacy_paper),
+        ("template", render_paper),
+        ("sections", lambda q: render_paper(q, sections=True, answer_sheet_page=True)),
+    ]
+    results = {name: papers_per_second(render, quizzes) for name, render in cases}
+
+    print(f"\n{'':<10}{'套/秒':>10}{'题/秒':>12}")
+    for name, rate in results.items():
+        print(f"{name:<10}{rate:>10.0f}{rate * n_questions:>12.0f}")
+    print(f"\n加速 {results['template'] / results['legacy']:.1f}x（template vs legacy）")
@@ -0,0 +1,212 @@
+"""多套试卷并行编译：同一组题目生成 N 套变体（题目顺序打乱、选择题选项打乱），用进程池并行编译。
+
+每套变体在独立的临时目录中编译（.aux/.log 互不干扰，可以安全并行），编译完成后把 PDF 和日志
+收集到输出目录，并输出每套的编译耗时。manifest.json 记录每套的出题顺序和答案，便于阅卷对照。
+
+题目数据与 latex_compiler.py 相同（quiz_list）；选择题可额外带 "choices"（选项 LaTeX 列表），
+此时 "answer" 为正确选项字母（如 "B"、"AC" 或 "A, C"），打乱选项后答案字母随之更新；
+答案不是选项字母的题不打乱选项。
+
+用法:
+  python build_farm.py master_quiz_data.json --variants 30 --jobs 8
+  python build_farm.py master_quiz_data.json --variants 30 --seed 2025 --no-shuffle-choices
+  python build_farm.py master_quiz_data.json --variants 5 --tex-only      # 只生成 .tex，不编译
+
+编译前先用 latex_lint.py 检查全部题目，有错误时列出题目 ID 并停止（--no-lint 跳过）。
+"""
+import argparse
+import json
+import os
+import random
+import re
+import shutil
+import string
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+from latex_driver import LATEX_ENGINE, MAX_RUNS, compile_tex
+from latex_format import FORMAT_MARKER, ensure_format
+from latex_lint import check_before_build
+from latex_templates import LAYOUTS, render_paper
+
+
+# ----------------------------------------------------
+# 变体生成
+# ----------------------------------------------------
+
+# 能随选项换位的答案：单个字母或用逗号、顿号、空白分隔的几个字母（"B"、"AC"、"A, C"、"A、C"）
+LETTER_ANSWER = re.compile(r"^[A-Z](\s*[,、]?\s*[A-Z])*$")
+_warned_answers = set()
+
+
+def shuffle_choices(quiz, rng):
+    """打乱选项顺序，并把答案字母换成新位置（字母按新顺序排列，分隔符保持原样）。
+
+    没有 choices 的题原样返回；答案不是选项字母（如 "$B$"，或超出选项个数）时无法换位，选项保持原顺序并给出警告。
+    """
+    choices = quiz.get("choices")
+    if not choices:
+        return quiz
+    answer = (quiz.get("answer") or "").strip().upper()
+    valid = string.ascii_uppercase[:len(choices)]
+    if not LETTER_ANSWER.match(answer) or not all(ch in valid for ch in answer if ch.isalpha()):
+        if quiz.get("quiz_id") not in _warned_answers:
+            _warned_answers.add(quiz.get("quiz_id"))
+            print(f"⚠️ 题目 {quiz.get('quiz_id')} 的答案 {quiz.get('answer')!r} 不是选项字母，不打乱选项", file=sys.stderr)
+        return quiz
+    order = list(range(len(choices)))
+    rng.shuffle(order)
+    new_letter = {valid[old]: valid[new] for new, old in enumerate(order)}
+    letters = iter(sorted(new_letter[ch] for ch in answer if ch.isalpha()))
+    answer = "".join(next(letters) if ch.isalpha() else ch for ch in answer)
+    return dict(quiz, choices=[choices[i] for i in order], answer=answer)
+
+
+def make_variants(quizzes, count, seed=0, shuffle_questions=True, shuffle_options=True):
+    """返回 [(变体名, 题目列表)]。同一 seed 每次生成的变体相同。"""
+    variants = []
+    for k in range(1, count + 1):
+        rng = random.Random(f"{seed}-{k}")
+        items = list(quizzes)
+        if shuffle_questions:
+            rng.shuffle(items)
+        if shuffle_options:
+            items = [shuffle_choices(quiz, rng) for quiz in items]
+        variants.append((f"v{k:02d}", items))
+    return variants
+
+
+# ----------------------------------------------------
+# 编译（在子进程中执行）
+# ----------------------------------------------------
+
+def build_variant(name, quizzes, out_dir, engine=LATEX_ENGINE, max_runs=MAX_RUNS, tex_only=False, paper_options=None):
+    """生成并编译一套变体，返回结果字典。PDF、日志与 .tex 收集到 out_dir。
+
+    编译用 latex_driver.compile_tex（按需重跑），.aux 缓存在 out_dir/aux_cache，同名变体下次编译可少跑一遍。
+    """
+    start = time.perf_counter()
+    out_dir = Path(out_dir)
+    papers = render_paper(quizzes, subtitle=f"Paper {name}", **(paper_options or {}))
+    documents = dict(zip((f"exam_{name}", f"solution_{name}"), papers))
+    result = {"variant": name, "ok": True, "documents": {}}
+
+    with tempfile.TemporaryDirectory(prefix=f"exam_{name}_") as workdir:
+        for stem, source in documents.items():
+            tex_path = Path(workdir) / f"{stem}.tex"
+            tex_path.write_text(source, encoding="utf-8")
+            shutil.copy2(tex_path, out_dir / "tex")
+            if tex_only:
+                continue
+            build = compile_tex(tex_path, engine, max_runs, cache_dir=(out_dir / "aux_cache").resolve())
+            result["documents"][stem] = build
+            result["ok"] = result["ok"] and build["ok"]
+            for suffix, target in ((".pdf", "pdf"), (".log", "logs")):
+                produced = tex_path.with_suffix(suffix)
+                if produced.exists():
+                    shutil.copy2(produced, out_dir / target)
+
+    result["seconds"] = round(time.perf_counter() - start, 3)
+    return result
+
+
+# ----------------------------------------------------
+# 调度与报告
+# ----------------------------------------------------
+
+def run_farm(variants, out_dir, jobs=None, engine=LATEX_ENGINE, max_runs=MAX_RUNS, tex_only=False,
+             paper_options=None):
+    """paper_options 传给 latex_templates.render_paper（layout / sections / answer_sheet_page）。"""
+    out_dir = Path(out_dir)
+    for sub in ("tex", "pdf", "logs"):
+        (out_dir / sub).mkdir(parents=True, exist_ok=True)
+
+    # 版式需要预编译格式时先在主进程里生成一次，避免各子进程同时生成
+    layout = LAYOUTS[(paper_options or {}).get("layout", "mvp")]
+    marker = FORMAT_MARKER.search(layout.header)
+    if marker and not tex_only:
+        ensure_format(marker.group(1), engine)
+
+    results = []
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = {pool.submit(build_variant, name, quizzes, out_dir, engine, max_runs, tex_only, paper_options): name
+                   for name, quizzes in variants}
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as e:
+                result = {"variant": futures[future], "ok": False, "error": str(e), "seconds": 0.0, "documents": {}}
+            print(f"{'✅' if result['ok'] else '❌'} {result['variant']}  {result['seconds']:.2f}s")
+            results.append(result)
+    return sorted(results, key=lambda r: r["variant"])
+
+
+def write_manifest(variants, results, out_dir):
+    by_name = {r["variant"]: r for r in results}
+    manifest = [{
+        "variant": name,
+        "order": [quiz["quiz_id"] for quiz in quizzes],
+        "answers": {quiz["quiz_id"]: quiz["answer"] for quiz in quizzes},
+        "build": by_name.get(name),
+    } for name, quizzes in variants]
+    path = Path(out_dir) / "manifest.json"
+    path.write_text(json.dumps(manifest, ensure_ascii=False, indent=2), encoding="utf-8")
+    return path
+
+
+def report(results, wall_seconds):
+    print(f"\n{'变体':<8}{'状态':<6}{'试卷(次数)':>10}{'答案(次数)':>10}{'合计':>10}")
+    for r in results:
+        docs = r["documents"]
+        builds = [docs.get(f"{kind}_{r['variant']}") for kind in ("exam", "solution")]
+        cells = [f"{b['seconds']:>6.2f}s×{b['runs']}" if b else f"{'-':>10}" for b in builds]
+        print(f"{r['variant']:<8}{'成功' if r['ok'] else '失败':<6}{''.join(cells)}{r['seconds']:>9.2f}s")
+    total = sum(r["seconds"] for r in results)
+    failed = [r["variant"] for r in results if not r["ok"]]
+    print(f"\n共 {len(results)} 套，墙钟 {wall_seconds:.2f}s，逐套耗时合计 {total:.2f}s"
+          f"（并行加速 {total / wall_seconds if wall_seconds else 0:.1f}x）")
+    if failed:
+        print(f"❌ 编译失败：{', '.join(failed)}（日志见 logs/）", file=sys.stderr)
+    return not failed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="多套试卷并行编译")
+    parser.add_argument("json_path", nargs="?", default="master_quiz_data.json")
+    parser.add_argument("--variants", type=int, default=10, help="生成的试卷套数")
+    parser.add_argument("--seed", default="0", help="随机种子，相同种子生成相同的变体")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count(), help="并行进程数")
+    parser.add_argument("--out-dir", default="build_farm_out")
+    parser.add_argument("--engine", default=LATEX_ENGINE)
+    parser.add_argument("--max-runs", type=int, default=MAX_RUNS, help="每份文档最多运行 LaTeX 的次数")
+    parser.add_argument("--no-shuffle-questions", action="store_true", help="保持题目顺序")
+    parser.add_argument("--no-shuffle-choices", action="store_true", help="保持选项顺序")
+    parser.add_argument("--layout", choices=sorted(LAYOUTS), default="mvp", help="版式")
+    parser.add_argument("--sections", action="store_true", help="按题型分节")
+    parser.add_argument("--answer-sheet", action="store_true", help="试卷末尾附答题卡页")
+    parser.add_argument("--tex-only", action="store_true", help="只生成 .tex，不编译")
+    parser.add_argument("--no-lint", action="store_true", help="编译前不做 LaTeX 静态检查")
+    args = parser.parse_args()
+
+    if not args.tex_only and shutil.which(args.engine) is None:
+        sys.exit(f"FATAL ERROR: 找不到 {args.engine}，请安装 TeX 发行版或使用 --tex-only。")
+
+    with open(args.json_path, "r", encoding="utf-8") as f:
+        quiz_list = json.load(f)["quiz_list"]
+    if not args.no_lint and not check_before_build(quiz_list, args.layout, args.jobs):
+        sys.exit(1)
+
+    variants = make_variants(quiz_list, args.variants, args.seed,
+                             shuffle_questions=not args.no_shuffle_questions,
+                             shuffle_options=not args.no_shuffle_choices)
+    t0 = time.perf_counter()
+    results = run_farm(variants, args.out_dir, args.jobs, args.engine, args.max_runs, args.tex_only,
+                       {"layout": args.layout, "sections": args.sections, "answer_sheet_page": args.answer_sheet})
+    wall = time.perf_counter() - t0
+    manifest_path = write_manifest(variants, results, args.out_dir)
+    ok = report(results, wall)
+    print(f"输出目录：{args.out_dir}（pdf/、logs/、tex/、{manifest_path.name}）")
+    sys.exit(0 if ok else 1)
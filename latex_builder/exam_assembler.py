@@ -0,0 +1,405 @@
+"""自动组卷：按组卷条件从题库中选题，生成试卷与答案 .tex。
+
+组卷条件（JSON，示例见 fixtures/assembly_spec.json）：
+  types             各题型的题数（必须满足），如 {"single_choice": 12, "fill_blank": 6}
+  difficulty        整卷的难度分布，比例或题数均可，如 {"2": 0.3, "3": 0.4, "4": 0.3}
+  knowledge_points  必须覆盖的知识点 ID，每个至少一道题
+  min_quality       质量下限（quality >= min_quality）
+  recent_days       排除最近若干天内已组入试卷（exam_papers）的题目
+  course / grade / chapters   选题范围
+
+1. 候选题：每个题型一条查询，走 idx_questions_assembly（课程 + 题型 + 质量，INCLUDE 难度）；
+   知识点只查组卷条件中列出的那些（question_knowledge_points 的 (point_id, question_id) 索引）；
+   最近用过的题目由 exam_papers 按时间取出后在内存中排除。
+2. 求解（PaperAssembler）：先按 “最稀缺的知识点优先” 贪心选题覆盖知识点，再逐个名额按难度缺口
+   填满各题型，最后做换题的局部搜索，把超出目标的难度换成不足的难度，换题不会丢掉知识点覆盖。
+   同质量的候选题随机排序，不同的 --seed 得到不同的试卷。
+题型名额不足、知识点无题可选、难度无法凑齐时照常组卷，并在报告中列出。
+
+migrations/008_exam_papers.sql 建立 exam_papers 表和候选题索引；--save 把组好的试卷记入 exam_papers，
+之后组卷时不再选用这些题（recent_days 内）。试卷文件由 exam_from_db.generate_exam_from_db 按选定顺序生成。
+
+用法:
+  python exam_assembler.py fixtures/assembly_spec.json --schema exam_fixture --seed 3
+  python exam_assembler.py midterm_spec.json --name midterm --save --layout compact --sections
+"""
+import argparse
+import json
+import random
+import sys
+import time
+from collections import Counter, defaultdict, namedtuple
+
+from psycopg2 import sql
+
+import exam_from_db
+from exam_from_db import db
+from latex_templates import LAYOUTS
+
+Candidate = namedtuple("Candidate", "id type difficulty quality kps")
+
+TIME_LIMIT = 0.5          # 局部搜索的时间上限（秒）
+KP_WEIGHT = 10            # 未覆盖一个知识点相当于难度偏差多少道题
+
+
+# ----------------------------------------------------
+# 组卷条件
+# ----------------------------------------------------
+
+def load_spec(path):
+    with open(path, "r", encoding="utf-8") as f:
+        spec = json.load(f)
+    types = spec.get("types") or {}
+    if not types or any(not isinstance(n, int) or n < 0 for n in types.values()):
+        raise ValueError(f"{path}: types 必须是 {{题型: 题数}}，题数为非负整数")
+    spec.setdefault("difficulty", {})
+    spec.setdefault("knowledge_points", [])
+    spec.setdefault("recent_days", 0)
+    return spec
+
+
+def difficulty_targets(distribution, total):
+    """难度分布（比例或题数）-> {难度: 题数}，按最大余数法取整，合计等于 total。"""
+    weights = {int(d): float(w) for d, w in (distribution or {}).items() if float(w) > 0}
+    weight_sum = sum(weights.values())
+    if not weight_sum:
+        return {}
+    exact = {d: total * w / weight_sum for d, w in weights.items()}
+    counts = {d: int(x) for d, x in exact.items()}
+    for d in sorted(exact, key=lambda d: counts[d] - exact[d])[:total - sum(counts.values())]:
+        counts[d] += 1
+    return counts
+
+
+# ----------------------------------------------------
+# 候选题查询
+# ----------------------------------------------------
+
+def recent_question_ids(conn, days):
+    if not days:
+        return set()
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT DISTINCT pq.question_id
+            FROM exam_papers p JOIN exam_paper_questions pq ON pq.paper_id = p.id
+            WHERE p.created_at >= now() - make_interval(days => %s)
+        """, (days,))
+        return {row[0] for row in cur.fetchall()}
+
+
+def fetch_candidates(conn, spec):
+    """返回 ([Candidate], 因最近用过而排除的题数)。"""
+    conditions, params = ["q.question_type = %(q_type)s"], {}
+    for column, key in (("course_id", "course"), ("grade_id", "grade")):
+        if spec.get(key) is not None:
+            conditions.append(f"q.{column} = %({key})s")
+            params[key] = spec[key]
+    if spec.get("chapters"):
+        conditions.append("q.chapter_id = ANY(%(chapters)s)")
+        params["chapters"] = list(spec["chapters"])
+    if spec.get("min_quality") is not None:
+        conditions.append("q.quality >= %(min_quality)s")
+        params["min_quality"] = spec["min_quality"]
+    query = f"SELECT q.id, q.difficulty, q.quality FROM questions q WHERE {' AND '.join(conditions)}"
+
+    recent = recent_question_ids(conn, spec["recent_days"])
+    kps_of = defaultdict(set)
+    with conn.cursor() as cur:
+        if spec["knowledge_points"]:
+            cur.execute("SELECT question_id, point_id FROM question_knowledge_points WHERE point_id = ANY(%s)",
+                        (list(spec["knowledge_points"]),))
+            for question_id, point_id in cur:
+                kps_of[question_id].add(point_id)
+        candidates, excluded = [], 0
+        for q_type, count in spec["types"].items():
+            if not count:
+                continue
+            # 参数不带类型，questions.question_type 为枚举或文本时都能直接比较（同 exam_from_db）
+            cur.execute(query, dict(params, q_type=q_type))
+            for question_id, difficulty, quality in cur:
+                if question_id in recent:
+                    excluded += 1
+                    continue
+                candidates.append(Candidate(question_id, q_type, difficulty, quality or 0,
+                                            frozenset(kps_of.get(question_id, ()))))
+    conn.rollback()
+    return candidates, excluded
+
+
+# ----------------------------------------------------
+# 求解
+# ----------------------------------------------------
+
+class PaperAssembler:
+    """贪心覆盖知识点 + 按难度缺口填满题型 + 同题型换题的局部搜索。"""
+
+    def __init__(self, candidates, type_counts, diff_targets, required_kps, seed=0):
+        rng = random.Random(seed)
+        self.rng = rng
+        self.type_counts = dict(type_counts)
+        self.diff_targets = dict(diff_targets)
+        self.required = set(required_kps)
+        # (题型, 难度) -> [候选]：质量高的在前，同质量随机；next_index 记录各池下一个待取位置
+        self.pools = defaultdict(list)
+        self.kp_index = defaultdict(list)
+        for c in candidates:
+            self.pools[(c.type, c.difficulty)].append(c)
+            for kp in c.kps & self.required:
+                self.kp_index[kp].append(c)
+        for key, pool in self.pools.items():
+            order = {c.id: (-c.quality, rng.random()) for c in pool}
+            pool.sort(key=lambda c: order[c.id])
+        self.next_index = dict.fromkeys(self.pools, 0)
+        self.difficulties_of = defaultdict(set)
+        for q_type, difficulty in self.pools:
+            self.difficulties_of[q_type].add(difficulty)
+
+        self.selected = {}
+        self.type_used = Counter()
+        self.diff_used = Counter()
+        self.kp_cover = Counter()
+
+    def add(self, c):
+        self.selected[c.id] = c
+        self.type_used[c.type] += 1
+        self.diff_used[c.difficulty] += 1
+        for kp in c.kps:
+            self.kp_cover[kp] += 1
+
+    def remove(self, c):
+        del self.selected[c.id]
+        self.type_used[c.type] -= 1
+        self.diff_used[c.difficulty] -= 1
+        for kp in c.kps:
+            self.kp_cover[kp] -= 1
+
+    def deficit(self, difficulty):
+        return self.diff_targets.get(difficulty, 0) - self.diff_used[difficulty]
+
+    def uncovered(self):
+        return {kp for kp in self.required if not self.kp_cover[kp]}
+
+    def penalty(self):
+        difficulties = set(self.diff_targets) | set(self.diff_used)
+        deviation = sum(abs(self.deficit(d)) for d in difficulties) if self.diff_targets else 0
+        return deviation + KP_WEIGHT * len(self.uncovered())
+
+    def next_free(self, q_type, difficulty):
+        """(题型, 难度) 池中下一个未选的候选题，没有时返回 None。"""
+        key = (q_type, difficulty)
+        pool = self.pools.get(key, ())
+        i = self.next_index.get(key, 0)
+        while i < len(pool) and pool[i].id in self.selected:
+            i += 1
+        if key in self.next_index:
+            self.next_index[key] = i
+        return pool[i] if i < len(pool) else None
+
+    def cover_knowledge_points(self):
+        """最稀缺的知识点优先：每次选覆盖未覆盖知识点最多的题，其次选难度有缺口、质量高的题。"""
+        uncovered = self.uncovered()
+        while uncovered:
+            kp = min(uncovered, key=lambda k: len(self.kp_index[k]))
+            options = [c for c in self.kp_index[kp]
+                       if c.id not in self.selected and self.type_used[c.type] < self.type_counts[c.type]]
+            if not options:
+                uncovered.discard(kp)   # 无题可选，留在报告的未覆盖列表中
+                continue
+            best = max(options, key=lambda c: (len(c.kps & uncovered), self.deficit(c.difficulty) > 0, c.quality))
+            self.add(best)
+            uncovered -= best.kps
+
+    def fill(self):
+        """题型名额打乱顺序后逐个填：每个名额取该题型中难度缺口最大的池。"""
+        slots = [t for t, n in self.type_counts.items() for _ in range(n - self.type_used[t])]
+        self.rng.shuffle(slots)
+        for q_type in slots:
+            options = [(self.deficit(d), c.quality, self.rng.random(), c)
+                       for d in self.difficulties_of[q_type] for c in [self.next_free(q_type, d)] if c]
+            if options:
+                self.add(max(options, key=lambda o: o[:3])[3])
+
+    def improve(self, deadline):
+        """同题型换题：把难度超出目标的题换成难度不足的题，直到无法改进或超时。
+
+        换下的题独占某些知识点时，优先换成同样覆盖这些知识点的题，否则由 hand_over 让其他题接手。
+        """
+        if not self.diff_targets:
+            return 0
+        swaps = 0
+        improved = True
+        while improved and time.perf_counter() < deadline:
+            improved = False
+            chosen = list(self.selected.values())
+            self.rng.shuffle(chosen)
+            for c in chosen:
+                if self.deficit(c.difficulty) >= 0:
+                    continue
+                only_here = {kp for kp in c.kps & self.required if self.kp_cover[kp] == 1}
+                wanted = sorted((d for d in self.difficulties_of[c.type] if self.deficit(d) > 0),
+                                key=self.deficit, reverse=True)
+                for d in wanted:
+                    r = self.replacement(c.type, d, only_here)
+                    if r is not None:
+                        self.remove(c)
+                        self.add(r)
+                    elif only_here:
+                        # 同题型同难度里没有覆盖这些知识点的题：换成普通题，知识点交给其他题接手
+                        r = self.next_free(c.type, d)
+                        if r is None or not self.hand_over(c, r, only_here):
+                            continue
+                    else:
+                        continue
+                    swaps += 1
+                    improved = True
+                    break
+        return swaps
+
+    def hand_over(self, leaving, incoming, kps):
+        """用 incoming 换下 leaving，leaving 独占的知识点各由一次 “同题型同难度” 的换题接手；做不到时复原。"""
+        self.remove(leaving)
+        self.add(incoming)
+        done = []
+        for kp in kps:
+            if self.kp_cover[kp]:
+                continue
+            pair = self.cover_elsewhere(kp)
+            if pair is None:
+                for x, y in reversed(done):
+                    self.remove(y)
+                    self.add(x)
+                self.remove(incoming)
+                self.add(leaving)
+                return False
+            self.remove(pair[0])
+            self.add(pair[1])
+            done.append(pair)
+        return True
+
+    def cover_elsewhere(self, kp):
+        """找一对 (已选题 x, 未选题 y)：题型和难度相同，y 覆盖 kp，换掉 x 不会丢失其他知识点。"""
+        selected_by_slot = defaultdict(list)
+        for x in self.selected.values():
+            selected_by_slot[(x.type, x.difficulty)].append(x)
+        for y in self.kp_index[kp]:
+            if y.id in self.selected:
+                continue
+            for x in selected_by_slot.get((y.type, y.difficulty), ()):
+                if all(self.kp_cover[k] > 1 or k in y.kps for k in x.kps & self.required):
+                    return x, y
+        return None
+
+    def replacement(self, q_type, difficulty, must_cover):
+        if not must_cover:
+            return self.next_free(q_type, difficulty)
+        kp = next(iter(must_cover))
+        for c in self.kp_index[kp]:
+            if c.type == q_type and c.difficulty == difficulty and c.id not in self.selected and must_cover <= c.kps:
+                return c
+        return None
+
+    def solve(self, time_limit=TIME_LIMIT):
+        start = time.perf_counter()
+        self.cover_knowledge_points()
+        self.fill()
+        swaps = self.improve(start + time_limit)
+        return {
+            "ids": self.ordered_ids(),
+            "types": {t: (self.type_used[t], n) for t, n in self.type_counts.items()},
+            # questions.difficulty 可以为 NULL：未标难度的题排在最后
+            "difficulty": {d: (self.diff_used[d], self.diff_targets.get(d, 0))
+                           for d in sorted(set(self.diff_targets) | set(self.diff_used),
+                                           key=lambda d: (d is None, d or 0))},
+            "uncovered": sorted(self.uncovered()),
+            "penalty": self.penalty(),
+            "swaps": swaps,
+            "seconds": round(time.perf_counter() - start, 4),
+        }
+
+    def ordered_ids(self):
+        """按组卷条件中的题型顺序、同题型由易到难排列。"""
+        type_order = {t: i for i, t in enumerate(self.type_counts)}
+        return [c.id for c in sorted(self.selected.values(),
+                                     key=lambda c: (type_order[c.type], c.difficulty or 0, c.id))]
+
+
+def assemble(conn, spec, seed=0, time_limit=TIME_LIMIT):
+    """查询候选题并求解，返回结果字典（见 PaperAssembler.solve，另加 candidates、excluded、query_seconds）。"""
+    start = time.perf_counter()
+    candidates, excluded = fetch_candidates(conn, spec)
+    query_seconds = time.perf_counter() - start
+    total = sum(spec["types"].values())
+    assembler = PaperAssembler(candidates, spec["types"], difficulty_targets(spec["difficulty"], total),
+                               spec["knowledge_points"], seed)
+    result = assembler.solve(time_limit)
+    result.update(candidates=len(candidates), excluded=excluded, query_seconds=round(query_seconds, 4),
+                  total_seconds=round(time.perf_counter() - start, 4))
+    return result
+
+
+def record_paper(conn, name, spec, seed, ids):
+    """把组好的试卷记入 exam_papers，返回试卷 ID。"""
+    with conn.cursor() as cur:
+        cur.execute("INSERT INTO exam_papers (name, spec, seed) VALUES (%s, %s, %s) RETURNING id",
+                    (name, json.dumps(spec, ensure_ascii=False), seed))
+        paper_id = cur.fetchone()[0]
+        cur.executemany("INSERT INTO exam_paper_questions (paper_id, question_id, position) VALUES (%s, %s, %s)",
+                        [(paper_id, question_id, position) for position, question_id in enumerate(ids, 1)])
+    conn.commit()
+    return paper_id
+
+
+def print_report(result):
+    print("题型  " + "  ".join(f"{t} {used}/{want}" for t, (used, want) in result["types"].items()))
+    if result["difficulty"]:
+        print("难度  " + "  ".join(f"{'未标' if d is None else d}: {used}/{want}"
+                                   for d, (used, want) in result["difficulty"].items()))
+    if result["uncovered"]:
+        print(f"⚠️ 未覆盖的知识点：{', '.join(map(str, result['uncovered']))}")
+    print(f"候选 {result['candidates']} 道（排除最近用过 {result['excluded']} 道），查询 {result['query_seconds']:.3f}s，"
+          f"求解 {result['seconds']:.3f}s（换题 {result['swaps']} 次），偏差 {result['penalty']}")
+
+
+def is_complete(result):
+    return all(used == want for used, want in result["types"].values())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="按组卷条件自动选题并生成试卷")
+    parser.add_argument("spec_path", help="组卷条件 JSON")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子，不同种子得到不同的试卷")
+    parser.add_argument("--time-limit", type=float, default=TIME_LIMIT, help="局部搜索的时间上限（秒）")
+    parser.add_argument("--name", default="exam_auto", help="输出文件名前缀，也是 exam_papers 中的名称")
+    parser.add_argument("--out-dir", default=".")
+    parser.add_argument("--layout", choices=sorted(LAYOUTS), default="mvp", help="版式")
+    parser.add_argument("--sections", action="store_true", help="按题型分节")
+    parser.add_argument("--answer-sheet", action="store_true", help="试卷末尾附答题卡页")
+    parser.add_argument("--save", action="store_true", help="记入 exam_papers，之后组卷时避开这些题")
+    parser.add_argument("--schema", help="先在该 schema 中查找表（如 exam_fixture）")
+    args = parser.parse_args()
+
+    try:
+        spec = load_spec(args.spec_path)
+    except (OSError, ValueError) as e:
+        sys.exit(f"FATAL ERROR: {e}")
+
+    conn = db.connect()
+    try:
+        if args.schema:
+            with conn.cursor() as cur:
+                cur.execute(sql.SQL("SET search_path TO {}, public").format(sql.Identifier(args.schema)))
+            conn.commit()  # 查询候选题后会回滚只读事务，search_path 要先提交
+        result = assemble(conn, spec, args.seed, args.time_limit)
+        print_report(result)
+        if not result["ids"]:
+            sys.exit("FATAL ERROR: 没有符合条件的题目。")
+        exam_path, solution_path, count = exam_from_db.generate_exam_from_db(
+            conn, args.out_dir, args.name, args.layout, args.sections, args.answer_sheet, ids=result["ids"])
+        if args.save:
+            paper_id = record_paper(conn, args.name, spec, args.seed, result["ids"])
+            print(f"已记入 exam_papers（ID {paper_id}）")
+    finally:
+        conn.close()
+
+    print(f"{'✅' if is_complete(result) else '⚠️'} 共 {count} 道题：{exam_path}，{solution_path}")
+    sys.exit(0 if is_complete(result) else 1)
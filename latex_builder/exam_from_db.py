@@ -0,0 +1,171 @@
+"""从题库（PostgreSQL questions 表）直接生成试卷与答案的 .tex 文件。
+
+按 ID 列表或过滤条件选题，一条查询取回；结果通过服务端游标分批读取，每读到一道题就同时
+写入试卷和答案两个文件，内存占用与题目数量无关，几千道题的题库也可以直接生成。
+题目片段使用 latex_templates.py 中的 mvp 版式，与 JSON 路径生成的文件格式一致。
+
+数据库连接配置见 convert_handler/db.py（环境变量 EXAM_DB_* 或 db.toml）。
+题干、答案、解析的 LaTeX 由 convert_handler/materialize_latex.py 预先生成并存在 questions 表中
+（需要 migrations/007_question_latex_renditions.sql），这里只读取，不调用 pandoc。
+
+用法:
+  python exam_from_db.py --ids 12,7,33 --name midterm           # 按给定顺序
+  python exam_from_db.py --course 1 --type single_choice --difficulty 2-4 --kp 3,5 --limit 40
+  python exam_from_db.py --seed-fixture                          # 载入 fixtures/exam_fixture.sql
+  python exam_from_db.py --schema exam_fixture --course 2        # 在测试数据上生成
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+from psycopg2 import sql
+
+from latex_templates import LAYOUTS, write_paper
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "convert_handler"))
+import db  # noqa: E402
+
+FETCH_SIZE = 500
+FIXTURE_SQL = Path(__file__).resolve().parent / "fixtures" / "exam_fixture.sql"
+
+# 答案与解析优先使用后台任务预先转换的 LaTeX（convert_handler/materialize_latex.py），尚未转换时用原文
+QUESTION_COLUMNS = ("q.id, q.question_type::text, q.content_latex, coalesce(q.answer_latex, q.answer), "
+                    "coalesce(q.analysis_latex, q.analysis)")
+
+
+# ----------------------------------------------------
+# 选题查询
+# ----------------------------------------------------
+
+def build_query(ids=None, course=None, grade=None, chapter=None, q_type=None, difficulty=None, kps=None,
+                limit=None, by_type=False):
+    """返回 (SQL, 参数)。按 ID 选题时保持给定顺序，否则按 ID 升序；by_type=True 时先按题型排序（分节用）。"""
+    type_order = "q.question_type, " if by_type else ""
+    if ids:
+        query = (f"SELECT {QUESTION_COLUMNS} FROM questions q "
+                 f"WHERE q.id = ANY(%(ids)s) ORDER BY {type_order}array_position(%(ids)s, q.id)")
+        return query, {"ids": list(ids)}
+
+    conditions, params = [], {}
+    for column, value in (("course_id", course), ("grade_id", grade), ("chapter_id", chapter)):
+        if value is not None:
+            conditions.append(f"q.{column} = %({column})s")
+            params[column] = value
+    if q_type:
+        # 参数不带类型，questions.question_type 为枚举或文本时都能直接比较
+        conditions.append("q.question_type = %(q_type)s")
+        params["q_type"] = q_type
+    if difficulty:
+        conditions.append("q.difficulty BETWEEN %(diff_lo)s AND %(diff_hi)s")
+        params["diff_lo"], params["diff_hi"] = difficulty
+    if kps:
+        conditions.append("q.id IN (SELECT question_id FROM question_knowledge_points WHERE point_id = ANY(%(kps)s))")
+        params["kps"] = list(kps)
+
+    query = f"SELECT {QUESTION_COLUMNS} FROM questions q"
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += f" ORDER BY {type_order}q.id"
+    if limit:
+        query += " LIMIT %(limit)s"
+        params["limit"] = limit
+    return query, params
+
+
+def iter_questions(conn, query, params, fetch_size=FETCH_SIZE):
+    """服务端游标逐批读取题目，每次只在内存中保留 fetch_size 行。"""
+    with conn.cursor(name="exam_questions") as cur:
+        cur.itersize = fetch_size
+        cur.execute(query, params)
+        yield from cur
+
+
+# ----------------------------------------------------
+# 流式写入
+# ----------------------------------------------------
+
+def rows_to_quizzes(rows):
+    """数据库行 -> latex_templates 使用的题目字典；缺少答案/解析时留空。"""
+    for question_id, q_type, content_latex, answer, analysis in rows:
+        yield {
+            "quiz_id": question_id,
+            "question_type": q_type,
+            "question_latex": content_latex or "",
+            "answer": answer or "",
+            "solution_latex": analysis or "",
+        }
+
+
+def generate_exam_from_db(conn, out_dir=".", name="exam_db", layout="mvp", sections=False, answer_sheet_page=False,
+                          **selection):
+    """边读边写试卷与答案（latex_templates.write_paper），返回 (试卷路径, 答案路径, 题目数)。"""
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    exam_path = out_dir / f"{name}_exam.tex"
+    solution_path = out_dir / f"{name}_solution.tex"
+    query, params = build_query(by_type=sections, **selection)
+    quizzes = rows_to_quizzes(iter_questions(conn, query, params))
+    count = write_paper(quizzes, exam_path, solution_path, layout, sections, answer_sheet_page)
+    conn.rollback()  # 只读事务，结束服务端游标
+    return exam_path, solution_path, count
+
+
+def seed_fixture(conn):
+    with conn.cursor() as cur:
+        cur.execute(FIXTURE_SQL.read_text(encoding="utf-8"))
+    conn.commit()
+
+
+# ----------------------------------------------------
+# 命令行
+# ----------------------------------------------------
+
+def int_list(text):
+    return [int(x) for x in text.split(",") if x.strip()]
+
+
+def int_range(text):
+    lo, _, hi = text.partition("-")
+    return int(lo), int(hi or lo)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="从题库生成试卷与答案 .tex")
+    parser.add_argument("--ids", type=int_list, help="题目 ID 列表（逗号分隔），按给定顺序出题")
+    parser.add_argument("--course", type=int)
+    parser.add_argument("--grade", type=int)
+    parser.add_argument("--chapter", type=int)
+    parser.add_argument("--type", dest="q_type")
+    parser.add_argument("--difficulty", type=int_range, help="难度范围，如 2-4")
+    parser.add_argument("--kp", dest="kps", type=int_list, help="知识点 ID（包含任一）")
+    parser.add_argument("--limit", type=int)
+    parser.add_argument("--name", default="exam_db", help="输出文件名前缀")
+    parser.add_argument("--out-dir", default=".")
+    parser.add_argument("--layout", choices=sorted(LAYOUTS), default="mvp", help="版式")
+    parser.add_argument("--sections", action="store_true", help="按题型分节")
+    parser.add_argument("--answer-sheet", action="store_true", help="试卷末尾附答题卡页")
+    parser.add_argument("--schema", help="先在该 schema 中查找表（如 exam_fixture）")
+    parser.add_argument("--seed-fixture", action="store_true", help="载入 fixtures/exam_fixture.sql 后退出")
+    args = parser.parse_args()
+
+    conn = db.connect()
+    try:
+        if args.seed_fixture:
+            seed_fixture(conn)
+            print("✅ 已载入测试数据（schema exam_fixture）。")
+            sys.exit(0)
+        if args.schema:
+            with conn.cursor() as cur:
+                cur.execute(sql.SQL("SET search_path TO {}, public").format(sql.Identifier(args.schema)))
+        t0 = time.perf_counter()
+        exam_path, solution_path, count = generate_exam_from_db(
+            conn, args.out_dir, args.name, args.layout, args.sections, args.answer_sheet, ids=args.ids, course=args.course, grade=args.grade,
+            chapter=args.chapter, q_type=args.q_type, difficulty=args.difficulty, kps=args.kps, limit=args.limit,
+        )
+    finally:
+        conn.close()
+
+    if count == 0:
+        print("⚠️ 没有符合条件的题目，已生成空试卷。", file=sys.stderr)
+    print(f"✅ 共 {count} 道题，用时 {time.perf_counter() - t0:.2f}s：{exam_path}，{solution_path}")
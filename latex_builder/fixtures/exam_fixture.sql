@@ -0,0 +1,85 @@
+-- exam_from_db.py 的测试数据：建在独立的 exam_fixture schema 中，不影响正式题库。
+-- 加载：python exam_from_db.py --seed-fixture（或 make fixture-test）
+-- 表结构只包含生成试卷用到的列，与 questions / question_knowledge_points 同名同义。
+
+DROP SCHEMA IF EXISTS exam_fixture CASCADE;
+CREATE SCHEMA exam_fixture;
+
+CREATE TABLE exam_fixture.questions (
+    id            integer PRIMARY KEY,
+    title         text,
+    content_latex text,
+    answer        text,
+    analysis      text,
+    course_id     integer,
+    grade_id      integer,
+    chapter_id    integer,
+    question_type text,
+    difficulty    integer,
+    quality       smallint,
+    -- 后台任务预先转换的 LaTeX（convert_handler/migrations/007_question_latex_renditions.sql），这里为空
+    answer_latex   text,
+    analysis_latex text
+);
+
+CREATE TABLE exam_fixture.question_knowledge_points (
+    question_id integer REFERENCES exam_fixture.questions (id) ON DELETE CASCADE,
+    point_id    integer,
+    PRIMARY KEY (question_id, point_id)
+);
+
+-- 已组好的试卷（exam_assembler.py --save；与 migrations/008_exam_papers.sql 相同）
+CREATE TABLE exam_fixture.exam_papers (
+    id         serial PRIMARY KEY,
+    name       text NOT NULL,
+    spec       jsonb NOT NULL DEFAULT '{}',
+    seed       integer,
+    created_at timestamp NOT NULL DEFAULT now()
+);
+
+CREATE TABLE exam_fixture.exam_paper_questions (
+    paper_id    integer NOT NULL REFERENCES exam_fixture.exam_papers (id) ON DELETE CASCADE,
+    question_id integer NOT NULL REFERENCES exam_fixture.questions (id) ON DELETE CASCADE,
+    position    integer NOT NULL,
+    PRIMARY KEY (paper_id, question_id)
+);
+
+-- 手写的几道题：覆盖中文、行内/行间公式、\% 与空答案
+INSERT INTO exam_fixture.questions VALUES
+(1, '导数', 'Find the derivative of $f(x)=x^2+1$ at $x=2$.', '$4$',
+    '$f''(x) = 2x$，故 $f''(2) = 4$。', 1, 1, 1, 'fill_blank', 2, 5),
+(2, '圆的面积', 'Given the radius of a circle $r=5$, find its area.', '$25\pi$',
+    '$$A = \pi r^2 = 25\pi$$', 1, 1, 2, 'fill_blank', 1, 4),
+(3, '概率', '某事件发生的概率为 50\%，独立重复 2 次，求两次都发生的概率。', '$25\%$',
+    '$0.5 \times 0.5 = 0.25$。', 1, 2, 3, 'single_choice', 3, 4),
+(4, '无答案的题', '证明：$\sqrt{2}$ 是无理数。', NULL, NULL, 1, 2, 3, 'short_answer', 4, 3);
+
+INSERT INTO exam_fixture.question_knowledge_points VALUES (1, 10), (2, 20), (3, 30), (3, 10);
+
+-- 大题库：5000 道合成题，用于验证流式生成（课程 2）
+INSERT INTO exam_fixture.questions
+SELECT g, '合成题 ' || g,
+       '已知 $a_{' || g || '} = ' || g || 'n + 1$，求 $a_{' || g || '}$ 的前 $n$ 项和。' || repeat(' 题干填充文字。', 20),
+       '$S_n = ' || g || '\frac{n(n+1)}{2} + n$',
+       '由等差数列求和公式可得。' || repeat(' 解析填充文字。', 20),
+       2, 1 + g % 3, 1 + g % 10,
+       (ARRAY['single_choice', 'fill_blank', 'short_answer'])[1 + g % 3],
+       1 + g % 5, 1 + g % 5
+FROM generate_series(1001, 6000) AS g;
+
+INSERT INTO exam_fixture.question_knowledge_points
+SELECT g, 100 + g % 7 FROM generate_series(1001, 6000) AS g;
+
+-- 课程 3：60 道题，每三道有一道未标难度（difficulty 为 NULL），用于验证组卷
+INSERT INTO exam_fixture.questions
+SELECT g, '课程 3 合成题 ' || g, '求 $x_{' || g || '}$ 的值。', '$' || g || '$', NULL,
+       3, 1, 1, (ARRAY['single_choice', 'fill_blank', 'short_answer'])[1 + g % 3],
+       CASE WHEN g % 3 = 0 THEN NULL ELSE 1 + g % 5 END, 3
+FROM generate_series(7001, 7060) AS g;
+
+CREATE INDEX ON exam_fixture.exam_papers (created_at);
+CREATE INDEX ON exam_fixture.question_knowledge_points (point_id, question_id);
+CREATE INDEX ON exam_fixture.questions (course_id, question_type, quality) INCLUDE (difficulty);
+
+ANALYZE exam_fixture.questions;
+ANALYZE exam_fixture.question_knowledge_points;
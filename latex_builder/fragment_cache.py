@@ -0,0 +1,198 @@
+"""增量编译试卷：每道题单独排版成 PDF 片段并按内容哈希缓存，整卷只引用片段。
+
+1. 每道题的题干（含选项）套进片段模板（fragment_template）：导言区取自所选版式的页眉（字号、宏包、
+   页面与分栏设置、中文字体都相同），用 preview 宏包把题干裁成单独的一页；版式题干放在 \\hbox 中时片段也用
+   \\hbox，否则放进与版式行宽相同的 minipage。以 “引擎 + 片段模板 + 题干” 的 SHA-256 作为键，
+   编译结果保存为 <cache-dir>/<键>.pdf；
+2. 缓存中已有的片段直接复用，只有新增或修改过的题目才编译（多个片段用进程池并行）；
+3. 试卷中题干位置换成 \\includegraphics{<键>}，最后只对这份组装好的试卷做一次整卷编译。
+   整卷里已经没有公式需要排版，编译很快；改动一道题只需重编这一道题的片段和组装这一步。
+
+答案文件照常生成（latex_templates.write_paper），加 --with-solution 时用 latex_driver 整体编译。
+命令行构建前先用 latex_lint.py 检查全部题目，有错误时列出题目 ID 并停止（--no-lint 跳过）。
+
+用法:
+  python fragment_cache.py master_quiz_data.json --out-dir incremental_out
+  python fragment_cache.py master_quiz_data.json --jobs 8 --layout compact --answer-sheet --with-solution
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from latex_driver import LATEX_ENGINE, compile_tex
+from latex_format import FORMAT_MARKER, FORMATS, ensure_format
+from latex_lint import check_before_build, layout_uses_hbox
+from latex_templates import LAYOUTS, LatexTemplate, group_by_type, question_body, write_paper
+
+FRAGMENT_CACHE_DIR = ".fragment_cache"
+
+# 版式导言区之后追加：preview 把每个 preview 环境单独输出为一页并裁到内容大小
+FRAGMENT_PREAMBLE = r"""\usepackage[active,tightpage]{preview}
+\setlength\PreviewBorder{0pt}
+\begin{document}
+"""
+FRAGMENT_HBOX = r"""\begin{preview}\hbox{
+<<body>>
+}\end{preview}
+\end{document}
+"""
+FRAGMENT_PARAGRAPH = r"""\begin{preview}\begin{minipage}{\linewidth}
+<<body>>
+\end{minipage}\end{preview}
+\end{document}
+"""
+
+
+def fragment_template(layout="mvp"):
+    """版式对应的片段模板源码。导言区与试卷相同，版式或模板变化时键随之变化，旧片段自然失效。"""
+    layout = LAYOUTS[layout] if isinstance(layout, str) else layout
+    preamble = layout.header[:layout.header.index("\\begin{document}")]
+    body = FRAGMENT_HBOX if layout_uses_hbox(layout) else FRAGMENT_PARAGRAPH
+    return preamble + FRAGMENT_PREAMBLE + body
+
+
+def fragment_key(body, template, engine=LATEX_ENGINE):
+    digest = hashlib.sha256()
+    for part in (engine, template, body):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+# ----------------------------------------------------
+# 片段编译（在子进程中执行）
+# ----------------------------------------------------
+
+def compile_fragment(key, body, template, cache_dir, engine=LATEX_ENGINE):
+    """在临时目录中编译一个片段，成功后放入缓存；失败时把日志保存为 <键>.log。返回 (键, 是否成功, 秒数)。
+
+    template 是 fragment_template() 返回的源码（LatexTemplate 不能传给子进程）。
+    """
+    cache_dir = Path(cache_dir)
+    with tempfile.TemporaryDirectory(prefix="fragment_") as workdir:
+        tex_path = Path(workdir) / f"{key}.tex"
+        tex_path.write_text(LatexTemplate(template).render(body=body), encoding="utf-8")
+        result = compile_tex(tex_path, engine, cache_dir=None)
+        pdf_path = tex_path.with_suffix(".pdf")
+        if result["ok"] and pdf_path.exists():
+            # 先复制成临时名再改名，并行构建时其他进程不会读到写了一半的片段
+            partial = cache_dir / f"{key}.pdf.{os.getpid()}"
+            shutil.copy2(pdf_path, partial)
+            os.replace(partial, cache_dir / f"{key}.pdf")
+            return key, True, result["seconds"]
+        log_path = tex_path.with_suffix(".log")
+        if log_path.exists():
+            shutil.copy2(log_path, cache_dir / f"{key}.log")
+        return key, False, result["seconds"]
+
+
+def build_fragments(bodies, layout="mvp", cache_dir=FRAGMENT_CACHE_DIR, engine=LATEX_ENGINE, jobs=None):
+    """确保 bodies 中每个题干都有该版式的缓存片段，返回 ({题干: 键}, 统计)。"""
+    cache_dir = Path(cache_dir).resolve()
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    template = fragment_template(layout)
+    keys = {body: fragment_key(body, template, engine) for body in bodies}
+    missing = {key: body for body, key in keys.items() if not (cache_dir / f"{key}.pdf").exists()}
+
+    start = time.perf_counter()
+    # 版式带预编译格式时（cjk）先在这里生成，免得每个子进程各生成一遍
+    fmt_name = FORMAT_MARKER.search(template[:512])
+    if missing and fmt_name and fmt_name.group(1) in FORMATS:
+        ensure_format(fmt_name.group(1), engine)
+    if len(missing) > 1 and jobs != 1:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            futures = [pool.submit(compile_fragment, key, body, template, cache_dir, engine)
+                       for key, body in missing.items()]
+            results = [f.result() for f in futures]
+    else:
+        results = [compile_fragment(key, body, template, cache_dir, engine) for key, body in missing.items()]
+
+    failed = [key for key, ok, _ in results if not ok]
+    stats = {
+        "fragments": len(keys),
+        "hits": len(keys) - len(missing),
+        "compiled": len(missing) - len(failed),
+        "failed": failed,
+        "seconds": round(time.perf_counter() - start, 3),
+    }
+    return keys, stats
+
+
+# ----------------------------------------------------
+# 组装与整卷编译
+# ----------------------------------------------------
+
+def build_incremental(quizzes, out_dir, name="exam", layout="mvp", sections=False, answer_sheet_page=False,
+                      cache_dir=FRAGMENT_CACHE_DIR, engine=LATEX_ENGINE, jobs=None, with_solution=False):
+    """编译缺失的片段、组装试卷并整卷编译一次，返回统计字典。"""
+    quizzes = list(quizzes)
+    if sections:
+        quizzes = [quiz for group in group_by_type(quizzes).values() for quiz in group]
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    cache_dir = Path(cache_dir).resolve()
+
+    base = LAYOUTS[layout] if isinstance(layout, str) else layout
+    bodies = [question_body(quiz) for quiz in quizzes]
+    keys, stats = build_fragments(bodies, base, cache_dir, engine, jobs)
+    if stats["failed"]:
+        stats["ok"] = False
+        return stats
+
+    # 题目顺序与 quizzes 一致，按顺序取出对应片段
+    fragment_of = iter([keys[body] for body in bodies])
+    # 整卷在 out_dir 中编译，用相对路径并 \\detokenize，路径中有空格或特殊字符也能找到片段
+    cache_path = Path(os.path.relpath(cache_dir, out_dir.resolve())).as_posix()
+    assembled = base.with_preamble(
+        "\\usepackage{graphicx}\n\\graphicspath{{\\detokenize{" + cache_path + "/}}}\n")
+    exam_path = out_dir / f"{name}_exam.tex"
+    solution_path = out_dir / f"{name}_solution.tex"
+    write_paper(quizzes, exam_path, solution_path, assembled, sections, answer_sheet_page,
+                body=lambda quiz: "\\includegraphics{" + next(fragment_of) + ".pdf}")
+
+    exam_build = compile_tex(exam_path, engine)
+    stats.update(ok=exam_build["ok"], assemble_seconds=exam_build["seconds"], assemble_runs=exam_build["runs"])
+    if with_solution:
+        solution_build = compile_tex(solution_path, engine)
+        stats.update(ok=stats["ok"] and solution_build["ok"], solution_seconds=solution_build["seconds"])
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="按题缓存片段的增量试卷编译")
+    parser.add_argument("json_path", nargs="?", default="master_quiz_data.json")
+    parser.add_argument("--out-dir", default="incremental_out")
+    parser.add_argument("--name", default="exam")
+    parser.add_argument("--cache-dir", default=FRAGMENT_CACHE_DIR)
+    parser.add_argument("--engine", default=LATEX_ENGINE)
+    parser.add_argument("--jobs", type=int, default=os.cpu_count(), help="并行编译片段的进程数")
+    parser.add_argument("--layout", choices=sorted(LAYOUTS), default="mvp", help="版式")
+    parser.add_argument("--sections", action="store_true", help="按题型分节")
+    parser.add_argument("--answer-sheet", action="store_true", help="试卷末尾附答题卡页")
+    parser.add_argument("--with-solution", action="store_true", help="同时编译答案")
+    parser.add_argument("--no-lint", action="store_true", help="编译前不做 LaTeX 静态检查")
+    args = parser.parse_args()
+
+    if shutil.which(args.engine) is None:
+        sys.exit(f"FATAL ERROR: 找不到 {args.engine}，请安装 TeX 发行版。")
+    with open(args.json_path, "r", encoding="utf-8") as f:
+        quiz_list = json.load(f)["quiz_list"]
+    if not args.no_lint and not check_before_build(quiz_list, args.layout, args.jobs):
+        sys.exit(1)
+
+    stats = build_incremental(quiz_list, args.out_dir, args.name, args.layout, args.sections, args.answer_sheet,
+                              args.cache_dir, args.engine, args.jobs, args.with_solution)
+    print(f"片段 {stats['fragments']} 个：命中 {stats['hits']}，新编译 {stats['compiled']}，"
+          f"失败 {len(stats['failed'])}（{stats['seconds']:.2f}s）")
+    if stats["failed"]:
+        print(f"❌ 片段编译失败，日志见 {args.cache_dir}/<键>.log：{', '.join(stats['failed'])}", file=sys.stderr)
+        sys.exit(1)
+    print(f"{'✅' if stats['ok'] else '❌'} 整卷组装编译 {stats['assemble_runs']} 次，{stats['assemble_seconds']:.2f}s")
+    sys.exit(0 if stats["ok"] else 1)
@@ -1,117 +1,61 @@
+import argparse
 import json
 import os
 import sys
 
+from latex_templates import LAYOUTS, group_by_type, write_paper
+
+# optional libs
+try:
+    import ijson
+except Exception:
+    ijson = None
+
 # ----------------------------------------------------
-# 阶段 I: LaTeX 模板定义 (使用最简 \hbox 隔离)
+# 阶段 I/II: 模板与片段渲染见 latex_templates.py（预编译模板，多种版式）
 # ----------------------------------------------------
 
-# 纯英文基础模板
-LATEX_HEADER = r"""
-\documentclass[12pt, a4paper]{article}
-\usepackage{amsmath, amssymb}
-\usepackage{geometry}
-\geometry{a4paper, margin=1in}
-
-\pagestyle{empty}
-\begin{document}
-\begin{center}
-    \textbf{\Large Automated Exam (MVP English Version)} 
-\end{center}
-\vspace{0.5cm}
-"""
-
-LATEX_FOOTER = r"""
-\end{document}
-"""
-
-# 使用 \hbox{} 代替 \parbox，并手动格式化
-QUIZ_TEMPLATE_RAW = r"""
-\vspace{0.5cm}
-\noindent\textbf{\large Question. %s} (ID: %s)\par 
-\noindent
-\hbox{
-%s
-}
-\vspace{0.5cm}
-"""
-
-SOLUTION_TEMPLATE_RAW = r"""
-\vspace{0.5cm}
-\noindent\textbf{\large Solution. %s} (ID: %s)
-\par
-\textbf{Answer:} %s \\ 
-\textbf{Explanation:} %s
-\vspace{0.5cm}
-"""
+def iter_quizzes(json_file_path):
+    """逐题读取 quiz_list。安装了 ijson 时边解析边产出，不把整个 JSON 读进内存。"""
+    with open(json_file_path, 'rb') as f:
+        if ijson is not None:
+            yield from ijson.items(f, 'quiz_list.item', use_float=True)
+        else:
+            yield from json.load(f)['quiz_list']
+
 
 # ----------------------------------------------------
-# 阶段 II: 核心生成函数 (最简字符串拼接，无正则，无 $ 替换)
+# 阶段 III: 文件写入 (流式，UTF-8)
 # ----------------------------------------------------
 
-def generate_latex_from_json(json_file_path):
-    """读取 JSON 并生成 LaTeX 文件的核心函数。"""
-    
-    data = None 
-    
+def generate_latex_from_json(json_file_path, layout="mvp", sections=False, answer_sheet_page=False,
+                             exam_path='exam_mvp.tex', solution_path='solution_mvp.tex'):
+    """读取 JSON 并生成 LaTeX 文件的核心函数。
+
+    一次遍历题目，试卷和答案的每道题渲染后立即写入（UTF-8），内存占用与题目数量无关；
+    按题型分节时需要先把题目分组，此时会读入全部题目。
+    先写到临时文件，全部成功后再替换，JSON 出错时不会留下写了一半的 .tex。
+    """
+    quizzes = iter_quizzes(json_file_path)
+    exam_tmp, solution_tmp = exam_path + '.tmp', solution_path + '.tmp'
+
     try:
-        with open(json_file_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        if sections:
+            quizzes = [quiz for group in group_by_type(quizzes).values() for quiz in group]
+        # 模板字段一次替换，不经过 % 格式化，题目中的 % 原样保留
+        # （LaTeX 源码中的 \% 若被改成 \%% 会把后半行变成注释）
+        count = write_paper(quizzes, exam_tmp, solution_tmp, layout, sections, answer_sheet_page)
     except Exception as e:
+        for tmp in (exam_tmp, solution_tmp):
+            if os.path.exists(tmp):
+                os.remove(tmp)
         print(f"FATAL ERROR: File read or JSON parsing failed. Details: {e}", file=sys.stderr)
         return
 
-    if data is None:
-        return
-
-    exam_content = []
-    solution_content = []
-    
-    for i, quiz in enumerate(data['quiz_list']):
-        quiz_id = quiz['quiz_id']
-        question_num = str(i + 1) 
-        
-        question_latex = quiz['question_latex']
-        solution_latex = quiz['solution_latex']
-        answer = quiz['answer']
-        
-        # 1. 确保 % 符号被转义 (这是唯一的 Python 修复)
-        question_latex = question_latex.replace('%', '%%') 
-        solution_latex = solution_latex.replace('%', '%%')
-
-        # 2. 使用 .replace() 替换 %s 占位符 (最简单的字符串操作)
-        
-        # QUIZ 模板的拼接逻辑：(Question Num, ID, Content)
-        quiz_template = QUIZ_TEMPLATE_RAW
-        quiz_template = quiz_template.replace('%s', question_num, 1)
-        quiz_template = quiz_template.replace('%s', quiz_id, 1)
-        quiz_template = quiz_template.replace('%s', question_latex, 1)
-        exam_content.append(quiz_template)
-        
-        # SOLUTION 模板的拼接逻辑：(Question Num, ID, Answer, Solution)
-        solution_template = SOLUTION_TEMPLATE_RAW
-        solution_template = solution_template.replace('%s', question_num, 1)
-        solution_template = solution_template.replace('%s', quiz_id, 1)
-        solution_template = solution_template.replace('%s', answer, 1)
-        solution_template = solution_template.replace('%s', solution_latex, 1)
-        solution_content.append(solution_template)
-
+    os.replace(exam_tmp, exam_path)
+    os.replace(solution_tmp, solution_path)
 
-# ----------------------------------------------------
-# 阶段 III: 文件写入 (移除 UTF-8 编码参数)
-# ----------------------------------------------------
-    
-    final_latex_exam = LATEX_HEADER + "\n".join(exam_content) + LATEX_FOOTER
-    final_latex_solution = LATEX_HEADER + "\n".join(solution_content) + LATEX_FOOTER
-    
-    # 【核心修正】移除 encoding='utf-8'，使用默认的 ASCII 兼容编码
-    with open('exam_mvp.tex', 'w') as f:
-        f.write(final_latex_exam)
-        
-    with open('solution_mvp.tex', 'w') as f:
-        f.write(final_latex_solution)
-
-    success_message = "✅ Successfully generated exam_mvp.tex and solution_mvp.tex (Pure ASCII Test)."
+    success_message = f"✅ Successfully generated {exam_path} and {solution_path} ({count} questions, UTF-8)."
     sys.stdout.buffer.write(success_message.encode('utf-8'))
     sys.stdout.buffer.write(b'\n')
 
@@ -123,28 +67,38 @@ def generate_latex_from_json(json_file_path):
 
 JSON_PATH = 'master_quiz_data.json'
 
-if __name__ == "__main__":
-    quiz_data = {
-      "test_id": "EXAM_MVP_2025",
-      "quiz_list": [
-        {
-          "quiz_id": "Q_CALC001",
-          "question_type": "CALCULUS",
-          "question_latex": "Find the derivative of $f(x)=x^2+1$ at $x=2$. (Weight: 0.8)",
-          "solution_latex": "$$\\text{Sol: } f'(x) = 2x$$$$\\text{At } x=2 \\text{, } f'(2) = 4$$",
-          "answer": "$$4$$"
-        },
-        {
-          "quiz_id": "Q_GEO002",
-          "question_type": "GEOMETRY",
-          "question_latex": "Given the radius of a circle $r=5$, find its area.",
-          "solution_latex": "$$\\text{Sol: } A = \\pi r^2 = 25\\pi$$",
-          "answer": "$$25\\pi$$"
-        }
-      ]
+SAMPLE_QUIZ_DATA = {
+  "test_id": "EXAM_MVP_2025",
+  "quiz_list": [
+    {
+      "quiz_id": "Q_CALC001",
+      "question_type": "CALCULUS",
+      "question_latex": "Find the derivative of $f(x)=x^2+1$ at $x=2$. (Weight: 0.8)",
+      "solution_latex": "$$\\text{Sol: } f'(x) = 2x$$$$\\text{At } x=2 \\text{, } f'(2) = 4$$",
+      "answer": "$$4$$"
+    },
+    {
+      "quiz_id": "Q_GEO002",
+      "question_type": "GEOMETRY",
+      "question_latex": "Given the radius of a circle $r=5$, find its area.",
+      "solution_latex": "$$\\text{Sol: } A = \\pi r^2 = 25\\pi$$",
+      "answer": "$$25\\pi$$"
     }
-    
-    with open(JSON_PATH, 'w', encoding='utf-8') as f:
-        json.dump(quiz_data, f, ensure_ascii=False, indent=2)
+  ]
+}
 
-    generate_latex_from_json(JSON_PATH)
\ No newline at end of file
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="由 JSON 题目数据生成试卷与答案 .tex")
+    parser.add_argument("json_path", nargs="?", default=JSON_PATH)
+    parser.add_argument("--layout", choices=sorted(LAYOUTS), default="mvp", help="版式")
+    parser.add_argument("--sections", action="store_true", help="按题型分节")
+    parser.add_argument("--answer-sheet", action="store_true", help="试卷末尾附答题卡页")
+    args = parser.parse_args()
+    json_path = args.json_path
+
+    # 只在数据文件不存在时写入示例数据，不覆盖已有题目
+    if not os.path.exists(json_path):
+        with open(json_path, 'w', encoding='utf-8') as f:
+            json.dump(SAMPLE_QUIZ_DATA, f, ensure_ascii=False, indent=2)
+
+    generate_latex_from_json(json_path, args.layout, args.sections, args.answer_sheet)
@@ -0,0 +1,133 @@
+"""LaTeX 编译驱动（latexmk 的简化版）：只在需要时才再跑一遍。
+
+每次运行后比较 .aux 的有效内容（忽略 \\relax 与页数记录），并检查日志里的
+“Rerun to get ...”/“Label(s) may have changed” 等明确要求重跑的提示；两者都没有变化就停止。
+没有标签、引用和目录的试卷一遍即可，不再固定跑两遍。未定义的引用重跑也不会消失，不触发重跑，
+编译结束后作为警告列出（结果中的 "undefined_refs"）。
+
+文档第一行带 “% exam-format: <名称>” 时（中文版式），自动使用 latex_format.py 生成的预编译格式，
+省去每次加载 xeCJK/fontspec 等宏包的时间。
+
+上一次成功编译的 .aux 保存在缓存目录中（默认 .aux_cache/），下次编译前放回原处：
+文档结构不变时第一遍的 .aux 就与缓存一致，有交叉引用的文档也只需跑一遍。
+
+用法:
+  python latex_driver.py exam_mvp.tex solution_mvp.tex
+  python latex_driver.py exam_mvp.tex --engine xelatex --max-runs 4 --cache-dir .aux_cache
+"""
+import argparse
+import hashlib
+import re
+import shutil
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from latex_format import detect_format, ensure_format, format_options
+
+LATEX_ENGINE = "xelatex"
+LATEX_ARGS = ["-interaction=nonstopmode", "-halt-on-error"]
+MAX_RUNS = 4
+AUX_CACHE_DIR = ".aux_cache"
+
+# 日志中要求重新编译的提示（LaTeX 内核、hyperref、natbib、longtable、rerunfilecheck 等）
+RERUN_PATTERN = re.compile(
+    r"(Rerun to get|Label\(s\) may have changed|Please rerun LaTeX|Rerun LaTeX|"
+    r"Table widths have changed\. Rerun)"
+)
+# 未定义的引用：.aux 稳定后仍然存在说明标签确实不存在，只报告不重跑
+UNDEFINED_PATTERN = re.compile(r"(?:Reference|Citation) `([^']*)' on page \d+ undefined")
+# 不影响排版结果的 .aux 行：空文档也会写入，不能据此判断需要重跑
+IGNORED_AUX_LINES = re.compile(r"^\\relax$|^\\gdef ?\\@abspage@last\{\d+\}$")
+
+
+def aux_digest(aux_path):
+    """.aux 有效内容的摘要；文件不存在时与只含 \\relax 的 .aux 相同。"""
+    lines = []
+    if aux_path.exists():
+        text = aux_path.read_text(encoding="utf-8", errors="replace")
+        lines = [line for line in text.splitlines() if line.strip() and not IGNORED_AUX_LINES.match(line.strip())]
+    return hashlib.sha1("\n".join(lines).encode("utf-8")).hexdigest()
+
+
+def log_requests_rerun(log_path):
+    if not log_path.exists():
+        return False
+    return bool(RERUN_PATTERN.search(log_path.read_text(encoding="utf-8", errors="replace")))
+
+
+def undefined_references(log_path):
+    """日志中未定义的引用 / 文献标签（去重，按出现顺序）。"""
+    if not log_path.exists():
+        return []
+    return list(dict.fromkeys(UNDEFINED_PATTERN.findall(log_path.read_text(encoding="utf-8", errors="replace"))))
+
+
+def compile_tex(tex_path, engine=LATEX_ENGINE, max_runs=MAX_RUNS, cache_dir=AUX_CACHE_DIR, args=None,
+                use_format=True):
+    """编译到 .aux 稳定为止，返回 {"ok", "runs", "seconds", "format", "undefined_refs"}。
+
+    cache_dir 为 None 时不使用 .aux 缓存；相对路径相对于 .tex 所在目录。
+    use_format=False 时忽略文档中的格式标记，按普通方式编译。
+    """
+    tex_path = Path(tex_path).resolve()
+    workdir = tex_path.parent
+    aux_path = tex_path.with_suffix(".aux")
+    log_path = tex_path.with_suffix(".log")
+    cached_aux = None
+    if cache_dir is not None:
+        cached_aux = (workdir / cache_dir / aux_path.name).resolve()
+        if cached_aux.exists() and not aux_path.exists():
+            shutil.copy2(cached_aux, aux_path)
+
+    fmt_args, env, fmt_path = [], None, None
+    if use_format:
+        fmt_name = detect_format(tex_path)
+        fmt_path = ensure_format(fmt_name, engine) if fmt_name else None
+        if fmt_path:
+            fmt_args, env = format_options(fmt_path)
+
+    cmd = [engine, *fmt_args, *(LATEX_ARGS if args is None else args), tex_path.name]
+    start = time.perf_counter()
+    runs, ok = 0, True
+    while runs < max_runs:
+        before = aux_digest(aux_path)
+        result = subprocess.run(cmd, cwd=workdir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        runs += 1
+        if result.returncode != 0:
+            ok = False
+            break
+        if aux_digest(aux_path) == before and not log_requests_rerun(log_path):
+            break
+    else:
+        print(f"⚠️ {tex_path.name}: 运行 {max_runs} 次后 .aux 仍在变化", file=sys.stderr)
+
+    undefined = undefined_references(log_path) if ok else []
+    if undefined:
+        print(f"⚠️ {tex_path.name}: 未定义的引用 {', '.join(undefined)}", file=sys.stderr)
+    if ok and cached_aux is not None and aux_path.exists():
+        cached_aux.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copy2(aux_path, cached_aux)
+    return {"ok": ok, "runs": runs, "seconds": round(time.perf_counter() - start, 3),
+            "format": fmt_path.stem if fmt_path else None, "undefined_refs": undefined}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="按需重跑的 LaTeX 编译驱动")
+    parser.add_argument("tex_files", nargs="+")
+    parser.add_argument("--engine", default=LATEX_ENGINE)
+    parser.add_argument("--max-runs", type=int, default=MAX_RUNS)
+    parser.add_argument("--cache-dir", default=AUX_CACHE_DIR, help="保存 .aux 的目录（相对 .tex 所在目录）")
+    parser.add_argument("--no-cache", action="store_true", help="不读写 .aux 缓存")
+    parser.add_argument("--no-format", action="store_true", help="不使用预编译格式")
+    args = parser.parse_args()
+
+    failed = False
+    for tex_file in args.tex_files:
+        result = compile_tex(tex_file, args.engine, args.max_runs, None if args.no_cache else args.cache_dir,
+                             use_format=not args.no_format)
+        failed = failed or not result["ok"]
+        fmt_note = f"，格式 {result['format']}" if result["format"] else ""
+        print(f"{'✅' if result['ok'] else '❌'} {tex_file}: {result['runs']} 次，{result['seconds']:.2f}s{fmt_note}")
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,113 @@
+"""预编译 LaTeX 格式（.fmt）：把中文试卷导言区中加载宏包的部分转储下来，编译时直接载入。
+
+xeCJK/fontspec 等宏包每次编译都要重新读入和初始化，是中文试卷启动慢的主要原因。
+这里用 mylatexformat 把版式页眉中 \\csname endofdump\\endcsname 之前的部分转储为格式文件
+（formats/<名称>.fmt）；编译时加 -fmt=<名称>，mylatexformat 会跳过文档中已转储的导言区，
+从 endofdump 之后继续（字体设置在其后，XeTeX 不能把已加载的字体存进格式）。
+不使用格式时 \\csname endofdump\\endcsname 只是 \\relax，同一份 .tex 两种方式都能编译。
+
+格式文件与 TeX 引擎版本绑定，不能随仓库分发：第一次使用时自动生成，导言区或引擎版本变化后自动重建
+（比较 formats/<名称>.stamp 中的摘要）。latex_driver.compile_tex 读到文档第一行的
+“% exam-format: <名称>” 时自动调用 ensure_format()。
+
+用法:
+  python latex_format.py                  # 生成/更新全部格式
+  python latex_format.py exam_cjk --force
+"""
+import argparse
+import hashlib
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+from functools import lru_cache
+from pathlib import Path
+
+from latex_templates import LAYOUTS
+
+FORMAT_DIR = Path(__file__).resolve().parent / "formats"
+FORMAT_MARKER = re.compile(r"^% exam-format: (\w+)\s*$", re.M)
+# 格式名 -> 导言区取自哪个版式
+FORMATS = {"exam_cjk": "cjk"}
+
+
+def preamble_source(name):
+    """用于转储的文档：版式页眉中 \\begin{document} 之前的部分 + 空正文。"""
+    header = LAYOUTS[FORMATS[name]].header
+    return header[:header.index("\\begin{document}")] + "\\begin{document}\n\\end{document}\n"
+
+
+@lru_cache(maxsize=None)
+def engine_version(engine):
+    result = subprocess.run([engine, "--version"], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    return result.stdout.splitlines()[0] if result.stdout else ""
+
+
+def detect_format(tex_path):
+    """读取 .tex 开头的 “% exam-format: 名称” 标记，没有时返回 None。"""
+    with open(tex_path, "r", encoding="utf-8", errors="replace") as f:
+        match = FORMAT_MARKER.search(f.read(512))
+    return match.group(1) if match and match.group(1) in FORMATS else None
+
+
+def ensure_format(name, engine="xelatex", format_dir=FORMAT_DIR, force=False):
+    """返回可用的格式文件路径，过期或不存在时重新生成；生成失败返回 None（调用方照常不带格式编译）。"""
+    format_dir = Path(format_dir)
+    fmt_path = format_dir / f"{name}.fmt"
+    stamp_path = format_dir / f"{name}.stamp"
+    source = preamble_source(name)
+    stamp = hashlib.sha256(f"{engine_version(engine)}\0{source}".encode("utf-8")).hexdigest()
+    if not force and fmt_path.exists() and stamp_path.exists() and stamp_path.read_text() == stamp:
+        return fmt_path
+
+    format_dir.mkdir(parents=True, exist_ok=True)
+    with tempfile.TemporaryDirectory(prefix="latex_format_") as workdir:
+        workdir = Path(workdir)
+        (workdir / f"{name}.tex").write_text(source, encoding="utf-8")
+        cmd = [engine, "-ini", "-interaction=nonstopmode", f"-jobname={name}",
+               f"&{Path(engine).stem}", "mylatexformat.ltx", f"{name}.tex"]
+        subprocess.run(cmd, cwd=workdir, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        built = workdir / f"{name}.fmt"
+        if not built.exists():
+            log_path = format_dir / f"{name}.log"
+            if (workdir / f"{name}.log").exists():
+                shutil.copy2(workdir / f"{name}.log", log_path)
+            print(f"⚠️ 生成格式 {name} 失败（日志见 {log_path}），本次不使用预编译格式。", file=sys.stderr)
+            return None
+        # 先复制成临时名再改名，并行编译的其他进程不会读到写了一半的格式文件
+        partial = format_dir / f"{name}.fmt.{os.getpid()}"
+        shutil.copy2(built, partial)
+        os.replace(partial, fmt_path)
+    stamp_path.write_text(stamp)
+    return fmt_path
+
+
+def format_options(fmt_path):
+    """使用格式文件所需的命令行参数与环境变量：-fmt=<名称>，TEXFORMATS 中加入格式目录。"""
+    env = dict(os.environ)
+    # 末尾的分隔符表示在其后追加 kpathsea 的默认搜索路径
+    env["TEXFORMATS"] = f"{fmt_path.parent}{os.pathsep}{env.get('TEXFORMATS', '')}"
+    return [f"-fmt={fmt_path.stem}"], env
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="生成预编译的 LaTeX 格式")
+    parser.add_argument("names", nargs="*", help=f"格式名（默认全部：{', '.join(sorted(FORMATS))}）")
+    parser.add_argument("--engine", default="xelatex")
+    parser.add_argument("--force", action="store_true", help="即使未过期也重新生成")
+    args = parser.parse_args()
+
+    if shutil.which(args.engine) is None:
+        sys.exit(f"FATAL ERROR: 找不到 {args.engine}，请安装 TeX 发行版。")
+    unknown = [name for name in args.names if name not in FORMATS]
+    if unknown:
+        sys.exit(f"FATAL ERROR: 未知的格式 {', '.join(unknown)}")
+    failed = False
+    for name in args.names or sorted(FORMATS):
+        fmt_path = ensure_format(name, args.engine, force=args.force)
+        failed = failed or fmt_path is None
+        if fmt_path:
+            print(f"✅ {name}: {fmt_path}")
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,114 @@
+"""编译前的 LaTeX 静态检查：在调用 xelatex 之前找出会让编译失败（或悄悄吞掉内容）的题目。
+
+逐题检查题干、答案和解析，检查项（E101~E107、E201）见 convert_handler/latex_checks.py，题库编辑页面保存前
+也用它检查。题干是否按放进 \\hbox 检查由版式决定（layout_uses_hbox）。发现任何问题都以非零状态退出。
+
+用法:
+  python latex_lint.py master_quiz_data.json [--layout mvp] [--jobs 8]
+  python latex_lint.py --db [--schema exam_fixture] [--jobs 8]     # 检查题库（questions 表）
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from latex_templates import LAYOUTS
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "convert_handler"))
+from latex_checks import lint_latex  # noqa: E402
+
+LINT_CHUNK_SIZE = 200
+
+
+def lint_quiz(quiz, in_hbox=False):
+    """检查一道题的题干、答案和解析，返回 (题目 ID, [Issue])。"""
+    issues = lint_latex(quiz.get("question_latex"), "question_latex", in_hbox)
+    issues += lint_latex(quiz.get("answer"), "answer")
+    issues += lint_latex(quiz.get("solution_latex"), "solution_latex")
+    return quiz.get("quiz_id"), issues
+
+
+def _lint_chunk(quizzes, in_hbox):
+    return [result for result in (lint_quiz(quiz, in_hbox) for quiz in quizzes) if result[1]]
+
+
+def layout_uses_hbox(layout):
+    layout = LAYOUTS[layout] if isinstance(layout, str) else layout
+    return "\\hbox{" in layout.question.source
+
+
+def lint_bank(quizzes, layout="mvp", jobs=None, chunk_size=LINT_CHUNK_SIZE):
+    """并行检查整批题目（可以是生成器），返回 [(题目 ID, [Issue])]，只包含有问题的题。"""
+    in_hbox = layout_uses_hbox(layout)
+    if jobs == 1:
+        return _lint_chunk(quizzes, in_hbox)
+    results = []
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures, chunk = [], []
+        for quiz in quizzes:
+            chunk.append(quiz)
+            if len(chunk) >= chunk_size:
+                futures.append(pool.submit(_lint_chunk, chunk, in_hbox))
+                chunk = []
+        if chunk:
+            futures.append(pool.submit(_lint_chunk, chunk, in_hbox))
+        for future in futures:
+            results.extend(future.result())
+    return results
+
+
+def print_report(results, file=sys.stderr):
+    for quiz_id, issues in results:
+        for issue in issues:
+            print(f"❌ {quiz_id}  {issue.field} 第 {issue.line} 行  {issue.code} {issue.message}", file=file)
+
+
+def check_before_build(quizzes, layout="mvp", jobs=None):
+    """编译前调用：有错误时打印报告并返回 False。"""
+    results = lint_bank(quizzes, layout, jobs)
+    if results:
+        print_report(results)
+        print(f"❌ {len(results)} 道题的 LaTeX 有错误，已停止编译（可用 --no-lint 跳过检查）。", file=sys.stderr)
+        return False
+    return True
+
+
+def iter_db_quizzes(schema=None):
+    """逐批读取题库中的题目（exam_from_db 的服务端游标）。"""
+    import exam_from_db
+    from psycopg2 import sql
+
+    conn = exam_from_db.db.connect()
+    try:
+        if schema:
+            with conn.cursor() as cur:
+                cur.execute(sql.SQL("SET search_path TO {}, public").format(sql.Identifier(schema)))
+        query, params = exam_from_db.build_query()
+        yield from exam_from_db.rows_to_quizzes(exam_from_db.iter_questions(conn, query, params))
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="LaTeX 静态检查")
+    parser.add_argument("json_path", nargs="?", default="master_quiz_data.json")
+    parser.add_argument("--db", action="store_true", help="检查数据库中的题库而不是 JSON 文件")
+    parser.add_argument("--schema", help="与 --db 一起使用，先在该 schema 中查找表")
+    parser.add_argument("--layout", choices=sorted(LAYOUTS), default="mvp", help="按该版式检查（是否放在 \\hbox 中）")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count(), help="并行进程数")
+    args = parser.parse_args()
+
+    if args.db:
+        quizzes = iter_db_quizzes(args.schema)
+    else:
+        with open(args.json_path, "r", encoding="utf-8") as f:
+            quizzes = json.load(f)["quiz_list"]
+
+    t0 = time.perf_counter()
+    results = lint_bank(quizzes, args.layout, args.jobs)
+    print_report(results, file=sys.stdout)
+    print(f"{'❌' if results else '✅'} {len(results)} 道题有问题，用时 {time.perf_counter() - t0:.2f}s")
+    sys.exit(1 if results else 0)
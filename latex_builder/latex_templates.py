@@ -0,0 +1,353 @@
+"""试卷/答案的 LaTeX 模板层：预编译模板 + 多种版式。
+
+模板中用 <<name>> 表示字段（$、{}、% 在 LaTeX 中都有含义，不能当占位符）。LatexTemplate 在构造时
+把模板编译成一个 Python 函数（与 Jinja2 把模板编译成 Python 代码的做法相同），函数体是一个 f-string：
+模板的文字部分作为常量，字段按位置拼接。渲染一道题只做一次字符串拼接，填入的题目内容不会再被扫描，
+题干里出现 %s、<<x>> 或花括号都原样保留。
+
+版式（LAYOUTS）：
+  mvp      原有的单栏版式，输出与之前的 latex_compiler.py 逐字节一致
+  compact  双栏、窄页边距，题目之间间距更小
+  cjk      中文试卷：与预览（streamlit_run_bak9.latex_full_document_body）相同的 xeCJK + SimSun 导言区，
+           中文题号、节标题和答题卡；导言区可预编译成格式文件，见 latex_format.py
+各版式都支持按题型分节（sections=True，节标题见 SECTION_TITLES）和答题卡页（answer_sheet_page=True）。
+
+render_paper() 返回整套试卷的字符串；write_paper() 一次遍历题目，把试卷和答案边渲染边写入文件。
+"""
+import re
+import string
+
+FIELD_PATTERN = re.compile(r"<<([A-Za-z_]\w*)>>")
+
+
+class LatexTemplate:
+    """预编译的模板，render(**values) 一次完成替换（缺少字段时抛出 TypeError）。"""
+
+    def __init__(self, source):
+        self.source = source
+        parts = FIELD_PATTERN.split(source)
+        self.fields = tuple(dict.fromkeys(parts[1::2]))
+        namespace = {f"_l{i}": literal for i, literal in enumerate(parts[0::2])}
+        body = "".join(f"{{_l{i // 2}}}" if i % 2 == 0 else f"{{{part}}}" for i, part in enumerate(parts))
+        code = f"def render(*, {', '.join(self.fields)}):\n    return f'{body}'\n" if self.fields else \
+            f"def render():\n    return f'{body}'\n"
+        exec(code, namespace)
+        self.render = namespace["render"]
+
+
+# ----------------------------------------------------
+# 模板定义
+# ----------------------------------------------------
+
+# 纯英文基础模板
+LATEX_HEADER = r"""
+\documentclass[12pt, a4paper]{article}
+\usepackage{amsmath, amssymb}
+\usepackage{geometry}
+\geometry{a4paper, margin=1in}
+
+\pagestyle{empty}
+\begin{document}
+\begin{center}
+    \textbf{\Large Automated Exam (MVP English Version)} 
+\end{center}
+\vspace{0.5cm}
+"""
+
+LATEX_FOOTER = r"""
+\end{document}
+"""
+
+# 使用 \hbox{} 代替 \parbox，并手动格式化
+QUIZ_TEMPLATE_RAW = r"""
+\vspace{0.5cm}
+\noindent\textbf{\large Question. <<num>>} (ID: <<quiz_id>>)\par 
+\noindent
+\hbox{
+<<question>>
+}
+\vspace{0.5cm}
+"""
+
+SOLUTION_TEMPLATE_RAW = r"""
+\vspace{0.5cm}
+\noindent\textbf{\large Solution. <<num>>} (ID: <<quiz_id>>)
+\par
+\textbf{Answer:} <<answer>> \\ 
+\textbf{Explanation:} <<solution>>
+\vspace{0.5cm}
+"""
+
+COMPACT_HEADER = r"""
+\documentclass[10pt, a4paper, twocolumn]{article}
+\usepackage{amsmath, amssymb}
+\usepackage{geometry}
+\geometry{a4paper, margin=0.6in}
+
+\pagestyle{empty}
+\begin{document}
+\begin{center}
+    \textbf{\large Automated Exam}
+\end{center}
+"""
+
+COMPACT_QUIZ_TEMPLATE = r"""
+\noindent\textbf{<<num>>.} {\scriptsize (ID: <<quiz_id>>)} <<question>>
+\par\medskip
+"""
+
+COMPACT_SOLUTION_TEMPLATE = r"""
+\noindent\textbf{<<num>>.} {\scriptsize (ID: <<quiz_id>>)} \textbf{Answer:} <<answer>>
+\par <<solution>>
+\par\medskip
+"""
+
+# 中文版式。导言区与题库预览一致；\csname endofdump\endcsname 之前的部分可以转储进格式文件
+# （latex_format.py）。XeTeX 不能把已加载的字体存进格式，字体设置必须放在它之后，每次编译时执行。
+# 第一行的 “% exam-format:” 标记告诉 latex_driver.py 使用哪个预编译格式。
+CJK_HEADER = r"""% exam-format: exam_cjk
+\documentclass[12pt, a4paper]{article}
+\usepackage{amsmath,amssymb}
+\usepackage{graphicx}
+\usepackage{geometry}
+\geometry{a4paper, margin=1in}
+\usepackage{fontspec}
+\usepackage{xeCJK}
+\csname endofdump\endcsname
+\setCJKmainfont{SimSun}
+\pagestyle{empty}
+\parindent=0pt
+\begin{document}
+\begin{center}
+    \textbf{\Large 试卷}
+\end{center}
+\vspace{0.5cm}
+"""
+
+CJK_QUIZ_TEMPLATE = r"""
+\vspace{0.3cm}
+\textbf{第 <<num>> 题} {\small (ID: <<quiz_id>>)}\par
+<<question>>
+\par\vspace{0.3cm}
+"""
+
+CJK_SOLUTION_TEMPLATE = r"""
+\vspace{0.3cm}
+\textbf{第 <<num>> 题} {\small (ID: <<quiz_id>>)}\par
+\textbf{答案：}<<answer>>\par
+\textbf{解析：}<<solution>>
+\par\vspace{0.3cm}
+"""
+
+CJK_ANSWER_SHEET_HEADER = r"""
+\newpage
+\begin{center}
+    \textbf{\Large 答题卡}
+\end{center}
+姓名：\underline{\hspace{5cm}} \hfill 考号：\underline{\hspace{4cm}}
+\par\bigskip
+"""
+
+SUBTITLE_TEMPLATE = r"""\begin{center}<<subtitle>>\end{center}
+"""
+
+SECTION_TEMPLATE = r"""
+\section*{<<title>>}
+"""
+
+ANSWER_SHEET_HEADER = r"""
+\newpage
+\begin{center}
+    \textbf{\Large Answer Sheet}
+\end{center}
+\noindent Name: \underline{\hspace{5cm}} \hfill ID: \underline{\hspace{4cm}}
+\par\bigskip
+"""
+
+ANSWER_SHEET_CHOICE_ROW = r"""\noindent <<num>>. \quad <<bubbles>>\par\medskip
+"""
+
+ANSWER_SHEET_BLANK_ROW = r"""\noindent <<num>>. \quad \underline{\hspace{10cm}}\par\medskip
+"""
+
+# 题型 -> 节标题，未列出的题型直接用题型名
+CJK_SECTION_TITLES = {
+    "single_choice": "一、单选题",
+    "multiple_choice": "二、多选题",
+    "fill_blank": "三、填空题",
+    "short_answer": "四、解答题",
+}
+
+SECTION_TITLES = {
+    "single_choice": "Single Choice",
+    "multiple_choice": "Multiple Choice",
+    "fill_blank": "Fill in the Blanks",
+    "short_answer": "Short Answer",
+    "CALCULUS": "Calculus",
+    "GEOMETRY": "Geometry",
+}
+
+
+class Layout:
+    """一种版式：页眉页脚与各片段模板（均已预编译）。"""
+
+    def __init__(self, header, footer, question, solution, subtitle=SUBTITLE_TEMPLATE, section=SECTION_TEMPLATE,
+                 sheet_header=ANSWER_SHEET_HEADER, sheet_choice=ANSWER_SHEET_CHOICE_ROW,
+                 sheet_blank=ANSWER_SHEET_BLANK_ROW, section_titles=None):
+        self.header = header
+        self.footer = footer
+        self.question = LatexTemplate(question)
+        self.solution = LatexTemplate(solution)
+        self.subtitle = LatexTemplate(subtitle)
+        self.section = LatexTemplate(section)
+        self.sheet_header = sheet_header
+        self.sheet_choice = LatexTemplate(sheet_choice)
+        self.sheet_blank = LatexTemplate(sheet_blank)
+        self.section_titles = SECTION_TITLES if section_titles is None else section_titles
+
+    def with_preamble(self, extra):
+        """返回在 \\begin{document} 前插入 extra（如 \\usepackage{...}）的同款版式。"""
+        header = self.header.replace("\\begin{document}", extra + "\\begin{document}", 1)
+        return Layout(header, self.footer, self.question.source, self.solution.source, self.subtitle.source,
+                      self.section.source, self.sheet_header, self.sheet_choice.source, self.sheet_blank.source,
+                      self.section_titles)
+
+
+LAYOUTS = {
+    "mvp": Layout(LATEX_HEADER, LATEX_FOOTER, QUIZ_TEMPLATE_RAW, SOLUTION_TEMPLATE_RAW),
+    "compact": Layout(COMPACT_HEADER, LATEX_FOOTER, COMPACT_QUIZ_TEMPLATE, COMPACT_SOLUTION_TEMPLATE),
+    "cjk": Layout(CJK_HEADER, LATEX_FOOTER, CJK_QUIZ_TEMPLATE, CJK_SOLUTION_TEMPLATE,
+                  sheet_header=CJK_ANSWER_SHEET_HEADER, section_titles=CJK_SECTION_TITLES),
+}
+
+DEFAULT_LAYOUT = LAYOUTS["mvp"]
+
+
+# ----------------------------------------------------
+# 渲染
+# ----------------------------------------------------
+
+def render_question(question_num, quiz_id, question_latex, layout=DEFAULT_LAYOUT):
+    """单道题的试卷片段：(题号, ID, 题干)。"""
+    return layout.question.render(num=question_num, quiz_id=quiz_id, question=question_latex)
+
+
+def render_solution(question_num, quiz_id, answer, solution_latex, layout=DEFAULT_LAYOUT):
+    """单道题的答案片段：(题号, ID, 答案, 解析)。"""
+    return layout.solution.render(num=question_num, quiz_id=quiz_id, answer=answer, solution=solution_latex)
+
+
+def question_body(quiz):
+    """题干 + 选项（有 choices 时排成一行，\\hbox 中不能用列表环境）。"""
+    choices = quiz.get("choices")
+    if not choices:
+        return quiz["question_latex"]
+    options = r" \quad ".join(f"({string.ascii_uppercase[i]}) {text}" for i, text in enumerate(choices))
+    return quiz["question_latex"] + r" \quad " + options
+
+
+def group_by_type(quizzes):
+    """按题型分组，组的顺序为题型首次出现的顺序，组内保持原顺序。"""
+    groups = {}
+    for quiz in quizzes:
+        groups.setdefault(quiz.get("question_type") or "", []).append(quiz)
+    return groups
+
+
+def answer_sheet_rows(choice_counts, layout=DEFAULT_LAYOUT):
+    """答题卡页。choice_counts 为每道题的选项数（0 表示非选择题，留横线作答）。"""
+    rows = [layout.sheet_header]
+    for i, n_choices in enumerate(choice_counts):
+        if n_choices:
+            bubbles = r" \quad ".join(f"$\\bigcirc$ {string.ascii_uppercase[k]}" for k in range(n_choices))
+            rows.append(layout.sheet_choice.render(num=i + 1, bubbles=bubbles))
+        else:
+            rows.append(layout.sheet_blank.render(num=i + 1))
+    return "".join(rows)
+
+
+class PaperWriter:
+    """边产生边输出试卷与答案：begin() 写页眉，add(quiz) 写一道题，end() 写答题卡和页脚。
+
+    exam_write / solution_write 是接收字符串的函数（文件的 write 或列表的 append）。
+    一次遍历题目即可同时得到两份文档，除答题卡需要的每题选项数外不保留题目内容。
+    sections=True 时在题型变化处插入节标题，调用方需按题型排好顺序（render_paper 会先分组）。
+    body(quiz) 返回试卷中题干位置的 LaTeX，默认为题干 + 选项（fragment_cache.py 换成预编译的题目片段）。
+    """
+
+    def __init__(self, exam_write, solution_write, layout="mvp", sections=False, answer_sheet_page=False,
+                 subtitle=None, body=question_body):
+        self.exam_write = exam_write
+        self.solution_write = solution_write
+        self.layout = LAYOUTS[layout] if isinstance(layout, str) else layout
+        self.sections = sections
+        self.answer_sheet_page = answer_sheet_page
+        self.subtitle = subtitle
+        self.count = 0
+        self._section = None
+        self._choice_counts = []
+        self._render_question = self.layout.question.render
+        self._body = body
+        self._render_solution = self.layout.solution.render
+
+    def begin(self):
+        layout = self.layout
+        self.exam_write(layout.header)
+        self.solution_write(layout.header)
+        if self.subtitle:
+            self.exam_write(layout.subtitle.render(subtitle=self.subtitle))
+            self.solution_write(layout.subtitle.render(subtitle=self.subtitle))
+        return self
+
+    def add(self, quiz):
+        if self.sections and (self.count == 0 or (quiz.get("question_type") or "") != self._section):
+            q_type = self._section = quiz.get("question_type") or ""
+            heading = self.layout.section.render(title=self.layout.section_titles.get(q_type, q_type or "Other"))
+            self.exam_write(heading)
+            self.solution_write(heading)
+        elif self.count:
+            self.exam_write("\n")
+            self.solution_write("\n")
+        self.count += 1
+        num = self.count
+        self.exam_write(self._render_question(num=num, quiz_id=quiz["quiz_id"], question=self._body(quiz)))
+        self.solution_write(self._render_solution(num=num, quiz_id=quiz["quiz_id"], answer=quiz["answer"],
+                                                  solution=quiz["solution_latex"]))
+        if self.answer_sheet_page:
+            self._choice_counts.append(len(quiz.get("choices") or ()))
+
+    def end(self):
+        if self.answer_sheet_page:
+            self.exam_write(answer_sheet_rows(self._choice_counts, self.layout))
+        self.exam_write(self.layout.footer)
+        self.solution_write(self.layout.footer)
+        return self.count
+
+
+def render_paper(quizzes, layout="mvp", sections=False, answer_sheet_page=False, subtitle=None):
+    """渲染整套试卷，返回 (试卷 .tex, 答案 .tex)。
+
+    sections=True 时按题型分节（题号连续编排）；answer_sheet_page=True 时在试卷末尾加答题卡页。
+    """
+    if sections:
+        quizzes = [quiz for group in group_by_type(quizzes).values() for quiz in group]
+    # 所有片段收集到一个列表里，最后只 join 一次（题目内容只复制一次）
+    exam, solution = [], []
+    writer = PaperWriter(exam.append, solution.append, layout, sections, answer_sheet_page, subtitle).begin()
+    for quiz in quizzes:
+        writer.add(quiz)
+    writer.end()
+    return "".join(exam), "".join(solution)
+
+
+def write_paper(quizzes, exam_path, solution_path, layout="mvp", sections=False, answer_sheet_page=False,
+                subtitle=None, body=question_body):
+    """流式写入试卷与答案（UTF-8），一次遍历 quizzes（可以是生成器），返回题目数。
+
+    每道题渲染后立即写入文件，内存占用与题目数量无关。按题型分节时 quizzes 需已按题型排序。
+    """
+    with open(exam_path, "w", encoding="utf-8") as exam, open(solution_path, "w", encoding="utf-8") as solution:
+        writer = PaperWriter(exam.write, solution.write, layout, sections, answer_sheet_page, subtitle, body).begin()
+        for quiz in quizzes:
+            writer.add(quiz)
+        return writer.end()